@@ -0,0 +1,26 @@
+import multiprocessing
+import os
+
+# Запуск: gunicorn -c gunicorn.conf.py market_api_service.wsgi
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# не больше DB_POOL_OPTIONS['max_size']: поток держит соединение на время запроса
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+timeout = 30
+
+# Приложение загружается один раз в мастере, воркеры получают загруженные
+# модули через fork и запускаются за миллисекунды. Соединения с БД и Redis
+# открываются лениво, уже в воркере.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def post_worker_init(worker):
+    # Первый запрос воркера открывает соединения и заполняет ленивые кеши
+    # DRF и Django; он выполняется до того, как воркер начнет принимать запросы
+    paths = [path for path in os.getenv('GUNICORN_WARMUP_PATHS', '/api/v1/products/').split(',') if path]
+    if not paths:
+        return
+    from market_app.warmup import warm
+
+    for path, status, elapsed in warm(paths):
+        worker.log.info('Прогрев %s: %s за %.1f мс', path, status, elapsed)
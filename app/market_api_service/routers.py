@@ -0,0 +1,69 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+STICKY_CACHE_KEY = 'replica_sticky:{}'
+
+
+def choose_replica():
+    replicas = settings.REPLICA_DATABASES
+    return random.choice(replicas) if replicas else None
+
+
+def set_replica_reads(enabled):
+    return _read_from_replica.set(enabled)
+
+
+def reset_replica_reads(token):
+    _read_from_replica.reset(token)
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Чтения внутри блока направляются на реплики, если они настроены."""
+    token = _read_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def stick_to_primary(user):
+    """После записи пользователь REPLICA_STICKY_SECONDS секунд читает с основной БД."""
+    if settings.REPLICA_DATABASES and user.is_authenticated:
+        cache.set(STICKY_CACHE_KEY.format(user.pk), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_sticky(user):
+    return bool(
+        settings.REPLICA_DATABASES and user.is_authenticated
+        and cache.get(STICKY_CACHE_KEY.format(user.pk))
+    )
+
+
+class ReplicaRouter:
+    """
+    Чтения идут на реплики только внутри use_replica(): его включают
+    вью и админка для запросов только на чтение. Все остальное, включая
+    записи и задачи Celery, работает с основной БД.
+    Миграции применяются только к основной БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get():
+            return choose_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,41 @@
+import threading
+import time
+
+
+class AdaptiveTracesSampler:
+    """
+    traces_sampler для Sentry: базовая доля трассировок снижается при росте
+    нагрузки так, чтобы процесс отправлял не больше target_per_second
+    трассировок в секунду. Служебные эндпоинты не трассируются.
+    """
+
+    def __init__(self, base_rate, target_per_second, window=60, ignored_paths=()):
+        self.base_rate = base_rate
+        self.target_per_second = target_per_second
+        self.window = window
+        self.ignored_paths = tuple(ignored_paths)
+        self._lock = threading.Lock()
+        self._window_started = time.monotonic()
+        self._count = 0
+        self._rate = base_rate
+
+    def observe(self):
+        with self._lock:
+            self._count += 1
+            now = time.monotonic()
+            elapsed = now - self._window_started
+            if elapsed >= self.window:
+                throughput = self._count / elapsed
+                self._rate = min(self.base_rate, self.target_per_second / throughput)
+                self._window_started = now
+                self._count = 0
+            return self._rate
+
+    def __call__(self, sampling_context):
+        parent_sampled = sampling_context.get('parent_sampled')
+        if parent_sampled is not None:
+            return float(parent_sampled)
+        environ = sampling_context.get('wsgi_environ') or {}
+        if environ.get('PATH_INFO', '').startswith(self.ignored_paths):
+            return 0.0
+        return self.observe()
@@ -12,8 +12,11 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
-import sentry_sdk
+from kombu import Queue
+
+from .sentry import AdaptiveTracesSampler
 
 load_dotenv()
 
@@ -54,6 +57,13 @@ INSTALLED_APPS = [
     'cachalot',
 ]
 
+# Процессы, которые обслуживают только API (API_ONLY=true), не загружают
+# админку, jet и Swagger UI: это ускоряет запуск воркера gunicorn.
+# Схема OpenAPI при этом отдается из OPENAPI_SCHEMA_FILE.
+API_ONLY = os.getenv('API_ONLY', 'false').lower() == 'true'
+if API_ONLY:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ('jet', 'django.contrib.admin')]
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -63,6 +73,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'social_django.middleware.SocialAuthExceptionMiddleware',
+    'market_app.middleware.PerformanceMetricsMiddleware',
+    'market_app.profiling.QueryInspectorMiddleware',
 ]
 
 ROOT_URLCONF = 'market_api_service.urls'
@@ -106,6 +118,57 @@ DATABASES = {
     }
 }
 
+# Соединения с БД настраиваются отдельно для веб-процессов (gunicorn) и
+# воркеров Celery: DB_PROCESS_ROLE=web|worker. С psycopg 3 используется
+# пул соединений Django, иначе - постоянные соединения с проверкой перед
+# повторным использованием.
+DB_PROCESS_ROLE = os.getenv('DB_PROCESS_ROLE', 'web')
+DB_ROLE_POOL_OPTIONS = {
+    # поток gunicorn держит соединение на время запроса
+    'web': {'min_size': 2, 'max_size': 8, 'timeout': 10, 'max_idle': 300},
+    # процесс воркера выполняет одну задачу за раз
+    'worker': {'min_size': 1, 'max_size': 2, 'timeout': 30, 'max_idle': 60},
+}
+if DB_PROCESS_ROLE not in DB_ROLE_POOL_OPTIONS:
+    raise ImproperlyConfigured(
+        f'DB_PROCESS_ROLE={DB_PROCESS_ROLE!r}, допустимые значения: {", ".join(DB_ROLE_POOL_OPTIONS)}'
+    )
+DB_POOL_OPTIONS = dict(DB_ROLE_POOL_OPTIONS[DB_PROCESS_ROLE])
+# пул не может быть меньше min_size
+DB_POOL_OPTIONS['max_size'] = max(
+    int(os.getenv('DB_POOL_MAX_SIZE', DB_POOL_OPTIONS['max_size'])), DB_POOL_OPTIONS['min_size']
+)
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+if ConnectionPool is not None and os.getenv('DB_POOL', 'true').lower() == 'true':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {**DB_POOL_OPTIONS, 'check': ConnectionPool.check_connection},
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.getenv('DB_CONN_MAX_AGE', {'web': 60, 'worker': 600}[DB_PROCESS_ROLE])
+    )
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Реплики для чтения: POSTGRES_REPLICA_HOSTS=host1:5432,host2
+REPLICA_DATABASES = []
+for index, replica in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(','))):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'], 'HOST': host, 'PORT': port or POSTGRES_PORT,
+        'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {})),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica_{index}')
+DATABASE_ROUTERS = ['market_api_service.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной БД
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+# cachalot кеширует только основную БД: таблицы инвалидируются по алиасу БД,
+# в которую шла запись, и закешированные чтения с реплик не сбрасывались бы.
+CACHALOT_DATABASES = ['default']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -154,18 +217,32 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'market_app.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'market_app.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+        'market_app.throttling.RedisUserRateThrottle',
+        'market_app.throttling.RedisAnonRateThrottle',
+        'market_app.throttling.RedisScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'user': '100/minute',
         'anon': '10/minute',
+        'cart': '30/minute',
+        'import': '10/hour',
+        'export': '30/hour',
+        'login': '10/minute',
     },
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -175,6 +252,14 @@ AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
 )
 
+# Login settings
+# Одновременных проверок пароля в одном процессе gunicorn. По умолчанию
+# gunicorn запускает 2 × ядер + 1 процессов, поэтому всего по серверу
+# проверок не больше числа процессов
+LOGIN_HASHING_WORKERS = int(os.getenv('LOGIN_HASHING_WORKERS', 1))
+LOGIN_HASHING_TIMEOUT = float(os.getenv('LOGIN_HASHING_TIMEOUT', 5))
+LOGIN_TOKEN_CACHE_TIMEOUT = 60 * 60
+
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 
 EMAIL_HOST = "smtp.yandex.ru"
@@ -191,6 +276,117 @@ EMAIL_ADMIN = EMAIL_HOST_USER
 CELERY_BROKER_URL = "redis://localhost:6379"
 CELERY_RESULT_BACKEND = "redis://localhost:6379"
 
+# Очереди разделены, чтобы импорт прайс-листов и генерация миниатюр не
+# задерживали письма пользователям. Воркеры запускаются на каждую очередь
+# отдельно со своей конкурентностью, см. README.
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_QUEUES = (
+    Queue('notifications'),
+    Queue('default'),
+    Queue('media'),
+    Queue('imports'),
+)
+# В Redis приоритет 0 - наивысший; действует внутри очереди
+CELERY_TASK_ROUTES = {
+    'market_app.tasks.send_email': {'queue': 'notifications', 'priority': 0},
+    'market_app.tasks.notify_order_transitions': {'queue': 'notifications', 'priority': 3},
+    'market_app.tasks.generate_thumbnails': {'queue': 'media', 'priority': 6},
+    'market_app.tasks.update_products_from_data': {'queue': 'imports', 'priority': 6},
+    'market_app.tasks.release_expired_reservations': {'queue': 'default', 'priority': 0},
+    'market_app.tasks.refresh_catalogue_stats': {'queue': 'default', 'priority': 6},
+    'market_app.tasks.maintain_price_history_partitions': {'queue': 'default', 'priority': 9},
+    'market_app.tasks.build_recommendations': {'queue': 'default', 'priority': 9},
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': [0, 3, 6, 9],
+    # воркер, слушающий несколько очередей, выбирает их в порядке перечисления в -Q
+    'queue_order_strategy': 'priority',
+    # больше максимального time_limit, иначе долгий импорт будет выдан повторно
+    'visibility_timeout': 2 * 60 * 60,
+}
+# Длинные задачи не должны простаивать в буфере занятого процесса;
+# воркер уведомлений переопределяет значение ключом --prefetch-multiplier
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TASK_SOFT_TIME_LIMIT = 5 * 60
+CELERY_TASK_TIME_LIMIT = 6 * 60
+CELERY_TASK_ANNOTATIONS = {
+    'market_app.tasks.send_email': {'soft_time_limit': 30, 'time_limit': 60},
+    'market_app.tasks.notify_order_transitions': {'soft_time_limit': 2 * 60, 'time_limit': 3 * 60},
+    'market_app.tasks.generate_thumbnails': {'soft_time_limit': 2 * 60, 'time_limit': 3 * 60},
+    'market_app.tasks.update_products_from_data': {'soft_time_limit': 30 * 60, 'time_limit': 35 * 60},
+    'market_app.tasks.build_recommendations': {'soft_time_limit': 10 * 60, 'time_limit': 12 * 60},
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'release-expired-reservations': {
+        'task': 'market_app.tasks.release_expired_reservations',
+        'schedule': 60.0,
+    },
+    'refresh-catalogue-stats': {
+        'task': 'market_app.tasks.refresh_catalogue_stats',
+        'schedule': 15 * 60.0,
+    },
+    'maintain-price-history-partitions': {
+        'task': 'market_app.tasks.maintain_price_history_partitions',
+        'schedule': 24 * 60 * 60.0,
+    },
+    'build-recommendations': {
+        'task': 'market_app.tasks.build_recommendations',
+        'schedule': 6 * 60 * 60.0,
+    },
+}
+
+# Резерв товара в корзине, секунд (0 - без резервирования)
+CART_RESERVATION_TTL = int(os.getenv('CART_RESERVATION_TTL', 15 * 60))
+
+# История цен: сколько месячных секций создавать заранее и период ряда по умолчанию, дней
+PRICE_HISTORY_PARTITIONS_AHEAD = 2
+PRICE_HISTORY_DEFAULT_DAYS = 365
+
+# Импорт прайс-листов: окно, в течение которого повторная загрузка того же
+# файла не запускает импорт, секунд; пауза перед повтором, если у магазина
+# уже выполняется импорт; время, после которого импорт считается оборванным
+PRICE_LIST_DEDUP_SECONDS = 60 * 60
+PRICE_LIST_IMPORT_RETRY_DELAY = 30
+PRICE_LIST_IMPORT_TIMEOUT = 35 * 60
+# Сколько ошибок проверки прайс-листа возвращать в ответе
+PRICE_LIST_MAX_ERRORS = 200
+# Товаров в одном upsert при импорте прайс-листа
+IMPORT_CHUNK_SIZE = 1000
+# Словари параметров и категорий импорта общие для импортов процесса
+IMPORT_DICTIONARY_CACHE = True
+# Парсеры прайс-листов по расширению файла: функция принимает бинарный файл
+# и возвращает словарь с categories и goods
+PRICE_LIST_PARSERS = {
+    '.yml': 'market_app.pricelist.parse_yaml',
+    '.yaml': 'market_app.pricelist.parse_yaml',
+    '.jsonl': 'market_app.pricelist.parse_jsonl',
+    '.csv': 'market_app.pricelist.parse_csv',
+}
+
+# Рекомендации «покупают вместе»: соседей на товар, минимум общих заказов
+# и глубина истории заказов, дней
+RECOMMENDATIONS_TOP_K = 20
+RECOMMENDATIONS_MIN_SUPPORT = 2
+RECOMMENDATIONS_DAYS = 365
+
+# Схема OpenAPI, собранная при сборке образа командой
+#   python manage.py spectacular --format openapi-json --file openapi.json
+# Без файла схема генерируется при первом запросе к /api/v1/schema/
+OPENAPI_SCHEMA_FILE = os.getenv('OPENAPI_SCHEMA_FILE', os.path.join(BASE_DIR, 'openapi.json'))
+
+# Прогрев кеша после развертывания (warm_cache): страниц списка товаров
+# и самых крупных категорий, для которых прогреваются первые страницы
+WARM_CACHE_PAGES = 3
+WARM_CACHE_CATEGORIES = 10
+
+# Размер пачки товаров при потоковой выгрузке каталога
+CATALOGUE_EXPORT_CHUNK_SIZE = 2000
+
+# Смена статусов заказов магазином
+ORDER_TRANSITION_MAX_BATCH = 1000
+ORDER_EVENTS_BATCH_SIZE = 100
+
 # Social auth
 SOCIAL_AUTH_JSONFIELD_ENABLED = True
 
@@ -217,13 +413,28 @@ THUMBNAIL_ALIASES = {
 THUMBNAIL_BASEDIR = 'thumbnails'
 
 # Sentry settings
-sentry_sdk.init(
-    dsn=os.getenv('SENTRY_DSN'),
-    traces_sample_rate=1.0,
-    _experiments={
-        "continuous_profiling_auto_start": True,
-    },
-)
+# Доля трассировок задается через SENTRY_TRACES_SAMPLE_RATE и автоматически
+# снижается, если процесс превышает SENTRY_TRACES_PER_SECOND трассировок в секунду
+SENTRY_TRACES_SAMPLE_RATE = float(os.getenv('SENTRY_TRACES_SAMPLE_RATE', 0.1))
+SENTRY_TRACES_PER_SECOND = float(os.getenv('SENTRY_TRACES_PER_SECOND', 1))
+
+# Без DSN события никуда не отправляются, поэтому SDK и его интеграции
+# не загружаются, чтобы не замедлять запуск процессов
+SENTRY_DSN = os.getenv('SENTRY_DSN')
+if SENTRY_DSN:
+    import sentry_sdk
+
+    sentry_sdk.init(
+        dsn=SENTRY_DSN,
+        traces_sampler=AdaptiveTracesSampler(
+            base_rate=SENTRY_TRACES_SAMPLE_RATE,
+            target_per_second=SENTRY_TRACES_PER_SECOND,
+            ignored_paths=('/metrics/', '/static/'),
+        ),
+        _experiments={
+            "continuous_profiling_auto_start": True,
+        },
+    )
 
 # Cache settings
 CACHES = {
@@ -231,7 +442,25 @@ CACHES = {
         'BACKEND': 'django_redis.cache.RedisCache',
         'LOCATION': 'redis://127.0.0.1:6379/1',
         'OPTIONS': {
-            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CLIENT_CLASS': 'market_app.metrics.InstrumentedRedisClient',
         }
     }
 }
+
+# Admin settings
+# Начиная с этого количества строк админка показывает оценку вместо точного COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Metrics settings
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+# Адреса обратных прокси: для запросов с них адрес клиента берется из
+# последнего элемента X-Forwarded-For, который добавил сам прокси
+METRICS_TRUSTED_PROXIES = tuple(filter(None, os.getenv('METRICS_TRUSTED_PROXIES', '').split(',')))
+# Как часто процесс переносит накопленные метрики запросов в Redis, секунд
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+# Детектор N+1 и медленных запросов (в разработке пишет предупреждения в лог)
+QUERY_INSPECTOR_ENABLED = DEBUG
+QUERY_INSPECTOR_REPEAT_THRESHOLD = 3
+QUERY_INSPECTOR_MAX_QUERIES = 30
+QUERY_INSPECTOR_SLOW_MS = 100
@@ -0,0 +1,77 @@
+"""
+Настройки для локального профилирования (python manage.py perf_harness).
+
+Внешние сервисы заменены локальными: Redis - fakeredis в памяти процесса,
+Celery выполняет задачи сразу в вызывающем процессе, письма уходят на
+локальный SMTP-сервер, БД - файл SQLite (PERF_DB=postgres оставляет
+PostgreSQL из переменных POSTGRES_*, например встроенный локальный сервер).
+
+    DJANGO_SETTINGS_MODULE=market_api_service.settings_local python manage.py migrate
+    DJANGO_SETTINGS_MODULE=market_api_service.settings_local python manage.py perf_harness
+"""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+# Разрешает запуск perf_harness: он создает пользователей, магазины и заказы
+PERF_HARNESS = True
+
+# БД, загруженные файлы и результаты профилирования
+PERF_DIR = os.getenv('PERF_DIR', os.path.join(tempfile.gettempdir(), 'market_perf'))
+os.makedirs(PERF_DIR, exist_ok=True)
+MEDIA_ROOT = os.path.join(PERF_DIR, 'media')
+
+if os.getenv('PERF_DB', 'sqlite') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(PERF_DIR, 'db.sqlite3'),
+        }
+    }
+else:
+    DATABASES = {'default': DATABASES['default']}
+REPLICA_DATABASES = []
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+# Один сервер fakeredis на процесс: кеш, cachalot, троттлинг и метрики задач
+# работают с ним так же, как с Redis, включая Lua-скрипты (fakeredis[lua]).
+# Без fakeredis используется кеш в памяти, троттлинг - стандартный DRF.
+if fakeredis is not None:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': 'redis://fakeredis:6379/1',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'market_app.metrics.InstrumentedRedisClient',
+                'CONNECTION_POOL_KWARGS': {
+                    'connection_class': fakeredis.FakeConnection,
+                    'server': fakeredis.FakeServer(),
+                },
+            },
+        }
+    }
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+CELERY_TASK_ALWAYS_EAGER = True
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_BROKER_URL = 'memory://'
+CELERY_RESULT_BACKEND = 'cache+memory://'
+
+# perf_harness поднимает SMTP-сервер на свободном порту и подставляет его
+EMAIL_HOST = '127.0.0.1'
+EMAIL_PORT = int(os.getenv('PERF_SMTP_PORT', 1025))
+EMAIL_USE_SSL = False
+EMAIL_HOST_USER = ''
+EMAIL_HOST_PASSWORD = ''
+DEFAULT_FROM_EMAIL = 'shop@localhost'
+
+ALLOWED_HOSTS = ['localhost', '127.0.0.1']
+# Стенд сам считает запросы к БД по этапам
+QUERY_INSPECTOR_ENABLED = False
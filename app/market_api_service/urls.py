@@ -14,14 +14,14 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 from market_app.views import (
     PriceListUploadView, ProductList, CreateUser, ContactList, user_login, 
-    OrderViewSet, UserRetrieveUpdate
+    OrderViewSet, UserRetrieveUpdate, ShopOrderViewSet, CatalogueExportView, CategoryStatsViewSet,
+    ShopStatsViewSet, OpenAPISchemaView, metrics_view, health_view
 )
 
 
@@ -29,20 +29,34 @@ router = DefaultRouter()
 router.register('products', ProductList)
 router.register('contacts', ContactList)
 router.register('orders', OrderViewSet)
+router.register('shop/orders', ShopOrderViewSet, basename='shop-orders')
+router.register('stats/categories', CategoryStatsViewSet)
+router.register('stats/shops', ShopStatsViewSet)
 
 def trigger_error(request):
     division_by_zero = 1 / 0
 
 urlpatterns = [
-    path(r'jet/', include('jet.urls', 'jet')),
-    path('admin/', admin.site.urls),
     path('api/v1/upload-pricelist/', PriceListUploadView.as_view(), name='upload-pricelist'),
+    path('api/v1/export-pricelist/', CatalogueExportView.as_view(), name='export-pricelist'),
     path('api/v1/register/', CreateUser.as_view(), name='register'),
     path('api/v1/login/', user_login, name='login'),
     path('api/v1/user/<int:pk>/', UserRetrieveUpdate.as_view(), name='user'),
     path('api/v1/', include(router.urls)),
-    path('api/v1/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/v1/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='docs'),
+    path('api/v1/schema/', OpenAPISchemaView.as_view(), name='schema'),
     path('api/v1/', include('social_django.urls', namespace='social')),
-    path('sentry-debug/', trigger_error),
+    path('metrics/', metrics_view, name='metrics'),
+    path('health/', health_view, name='health'),
 ]
+
+# админка, jet и Swagger UI подключаются только там, где они нужны, см. API_ONLY
+if not settings.API_ONLY:
+    from django.contrib import admin
+    from drf_spectacular.views import SpectacularSwaggerView
+
+    urlpatterns += [
+        path(r'jet/', include('jet.urls', 'jet')),
+        path('admin/', admin.site.urls),
+        path('api/v1/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='docs'),
+        path('sentry-debug/', trigger_error),
+    ]
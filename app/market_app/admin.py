@@ -1,15 +1,66 @@
 from django.contrib import admin
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
 
-from .models import User, Product, Order, Contact, Category, Shop
+from .models import User, Product, Order, Contact, Category, Shop, PriceListImport
+from .pagination import EstimatedCountPaginator
+from market_api_service.routers import is_sticky, stick_to_primary, use_replica
+
+
+class ReplicaReadAdminMixin:
+    """
+    GET-запросы списка и формы объекта читают с реплик БД. После сохранения
+    пользователь на REPLICA_STICKY_SECONDS закрепляется за основной БД.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        return self._replica_view(super().changelist_view, request, extra_context=extra_context)
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        return self._replica_view(super().change_view, request, object_id, form_url, extra_context)
+
+    def _replica_view(self, view, request, *args, **kwargs):
+        if request.method != 'GET' or is_sticky(request.user):
+            response = view(request, *args, **kwargs)
+            if request.method == 'POST':
+                stick_to_primary(request.user)
+            return response
+        with use_replica():
+            response = view(request, *args, **kwargs)
+            # запросы списка выполняются при рендеринге шаблона
+            if hasattr(response, 'render'):
+                response.render()
+            return response
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('id', 'external_id', 'name', 'model', 'category', 'shop', 'price', 'price_rrc', 'quantity')
+class ProductAdmin(ReplicaReadAdminMixin, admin.ModelAdmin):
+    list_display = (
+        'id', 'external_id', 'name', 'model', 'category', 'shop', 'price', 'price_rrc', 'quantity', 'is_active'
+    )
     list_display_links = ('id', 'external_id', 'name')
+    list_select_related = ('category', 'shop')
     list_per_page = 20
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
     search_fields = ('name', 'model', 'category__name', 'shop__name')
-    list_filter = ('category__name', 'shop__name')
+    list_filter = ('is_active', 'category', 'shop')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо OR по четырем колонкам через JOIN: название и модель ищутся
+        # по триграммным индексам, категории и магазины - подзапросами
+        # по небольшим таблицам, что дает индексный BitmapOr по товарам.
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            queryset = queryset.filter(
+                Q(name__icontains=bit)
+                | Q(model__icontains=bit)
+                | Q(category__in=Category.objects.filter(name__icontains=bit).values('id'))
+                | Q(shop__in=Shop.objects.filter(name__icontains=bit).values('id'))
+            )
+        return queryset, False
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -18,10 +69,14 @@ class UserAdmin(admin.ModelAdmin):
     list_per_page = 20
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ReplicaReadAdminMixin, admin.ModelAdmin):
     list_display = ('info', 'user', 'created_at', 'status')
     list_display_links = ('info', )
+    list_select_related = ('user',)
     list_per_page = 20
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-id',)
 
     def info(self, order: Order):
         return order
@@ -30,10 +85,20 @@ class OrderAdmin(admin.ModelAdmin):
 class ContactAdmin(admin.ModelAdmin):
     list_display = ('id', 'address', 'user__id', 'user__email')
     list_display_links = ('id', 'user__id', 'user__email')
+    list_select_related = ('user',)
     list_per_page = 20
 
     def address(self, contact: Contact):
         return contact
 
+@admin.register(PriceListImport)
+class PriceListImportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'shop', 'status', 'full', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status', 'full')
+    list_select_related = ('shop',)
+    list_per_page = 20
+    ordering = ('-id',)
+    readonly_fields = ('shop', 'content_hash', 'full', 'status', 'created_at', 'started_at', 'finished_at')
+
 admin.site.register(Category)
 admin.site.register(Shop)
@@ -7,3 +7,4 @@ class MarketAppConfig(AppConfig):
 
     def ready(self):
         import market_app.signals
+        import market_app.taskmetrics
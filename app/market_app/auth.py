@@ -0,0 +1,63 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import verify_password
+from django.core.cache import cache
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from rest_framework.authtoken.models import Token
+
+from .models import User
+
+
+TOKEN_CACHE_KEY = 'auth_token:{}'
+
+
+class LoginOverloaded(Exception):
+    """Проверки пароля в процессе заняты дольше LOGIN_HASHING_TIMEOUT."""
+
+
+# Хеширование паролей (PBKDF2) выполняется в потоке запроса, но одновременно
+# в процессе не больше LOGIN_HASHING_WORKERS проверок. Лимит действует в
+# пределах процесса: всего по серверу их не больше числа процессов gunicorn
+# (GUNICORN_WORKERS), умноженного на LOGIN_HASHING_WORKERS.
+_hashing_slots = threading.BoundedSemaphore(settings.LOGIN_HASHING_WORKERS)
+
+
+@receiver(setting_changed)
+def _resize_hashing_slots(setting, value, **kwargs):
+    global _hashing_slots
+    if setting == 'LOGIN_HASHING_WORKERS':
+        _hashing_slots = threading.BoundedSemaphore(value)
+
+
+def check_password(user, password):
+    if not _hashing_slots.acquire(timeout=settings.LOGIN_HASHING_TIMEOUT):
+        raise LoginOverloaded
+    try:
+        is_correct, must_update = verify_password(password, user.password)
+    finally:
+        _hashing_slots.release()
+    # Перехеширование бывает один раз после смены алгоритма и выполняется вне лимита
+    if is_correct and must_update:
+        user.set_password(password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def get_token(user):
+    key = TOKEN_CACHE_KEY.format(user.pk)
+    token_key = cache.get(key)
+    if token_key is None:
+        token_key = Token.objects.get_or_create(user=user)[0].key
+        cache.set(key, token_key, settings.LOGIN_TOKEN_CACHE_TIMEOUT)
+    return token_key
+
+
+def authenticate_for_token(email, password):
+    if not email or not password:
+        return None
+    user = User.objects.filter(email=email).only('id', 'password').first()
+    if user is None or not check_password(user, password):
+        return None
+    return get_token(user)
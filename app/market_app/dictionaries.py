@@ -0,0 +1,120 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Category, Parameter, ShopCategory
+
+VERSION_KEY = 'import_dictionaries:version'
+
+# Словари процесса, общие для импортов (IMPORT_DICTIONARY_CACHE): сбрасываются,
+# когда другой процесс меняет версию в кеше (переименование или удаление записей)
+_process = {'version': None, 'parameters': {}, 'categories': {}, 'shop_categories': set()}
+_lock = threading.Lock()
+
+
+def invalidate():
+    """Сбрасывает словари во всех процессах."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+    clear()
+
+
+def clear():
+    with _lock:
+        _process.update(version=None, parameters={}, categories={}, shop_categories=set())
+
+
+def _publish(parameters, categories, shop_categories):
+    with _lock:
+        _process['parameters'].update(parameters)
+        _process['categories'].update(categories)
+        _process['shop_categories'].update(shop_categories)
+
+
+class ImportDictionaries:
+    """
+    Словари одного импорта: id параметров по названию и id категорий по
+    названию, плюс известные связи категорий с магазином. Недостающие записи
+    создаются пачкой, поэтому число запросов не зависит от числа товаров.
+
+    С IMPORT_DICTIONARY_CACHE словари начинаются с копии словарей процесса и
+    пополняют их, если импорт выполняется вне транзакции: записи, созданные
+    в откатившейся транзакции, не должны попасть в кеш.
+    """
+
+    def __init__(self):
+        self.parameters = {}
+        self.categories = {}
+        self.shop_categories = set()
+        self._shared = settings.IMPORT_DICTIONARY_CACHE
+        if self._shared:
+            version = cache.get(VERSION_KEY, 0)
+            with _lock:
+                if _process['version'] != version:
+                    _process.update(version=version, parameters={}, categories={}, shop_categories=set())
+                self.parameters.update(_process['parameters'])
+                self.categories.update(_process['categories'])
+                self.shop_categories.update(_process['shop_categories'])
+
+    def _commit(self):
+        # внутри транзакции записи могут откатиться, поэтому словари процесса
+        # пополняются только в режиме автокоммита, в котором работают задачи
+        if self._shared and not transaction.get_connection().in_atomic_block:
+            _publish(self.parameters, self.categories, self.shop_categories)
+
+    def parameter_ids(self, names):
+        """{название: id} параметров, недостающие создаются одним запросом."""
+        missing = set(names) - self.parameters.keys()
+        if missing:
+            self.parameters.update(Parameter.objects.filter(name__in=missing).values_list('name', 'id'))
+            new = missing - self.parameters.keys()
+            if new:
+                # параллельный импорт мог создать те же параметры
+                Parameter.objects.bulk_create([Parameter(name=name) for name in new], ignore_conflicts=True)
+                self.parameters.update(Parameter.objects.filter(name__in=new).values_list('name', 'id'))
+            self._commit()
+        return self.parameters
+
+    def shop_category_ids(self, shop_id, categories):
+        """
+        {внешний id: id категории} для категорий прайс-листа магазина.
+        Категории ищутся по названию; недостающие категории и связи с
+        магазином создаются пачкой.
+        """
+        names = {category['name'] for category in categories}
+        missing = names - self.categories.keys()
+        if missing:
+            # названия категорий не уникальны, берется первая созданная
+            for name, category_id in Category.objects.filter(name__in=missing).order_by('-id').values_list(
+                'name', 'id'
+            ):
+                self.categories[name] = category_id
+            new = [Category(name=name) for name in missing - self.categories.keys()]
+            if new:
+                self.categories.update(
+                    (category.name, category.id) for category in Category.objects.bulk_create(new)
+                )
+
+        mapping = {category['id']: self.categories[category['name']] for category in categories}
+        links = {(shop_id, external_id, category_id) for external_id, category_id in mapping.items()}
+        unknown = links - self.shop_categories
+        if unknown:
+            self.shop_categories.update(
+                (shop_id, external_id, category_id)
+                for external_id, category_id in ShopCategory.objects.filter(
+                    shop_id=shop_id, external_id__in=[external_id for _, external_id, _ in unknown]
+                ).values_list('external_id', 'category_id')
+            )
+            new = unknown - self.shop_categories
+            ShopCategory.objects.bulk_create([
+                ShopCategory(shop_id=shop_id, external_id=external_id, category_id=category_id)
+                for _, external_id, category_id in new
+            ])
+            self.shop_categories.update(new)
+        if missing or unknown:
+            self._commit()
+        return mapping
@@ -0,0 +1,118 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+import yaml
+from django.conf import settings
+
+from .models import Category, Product, ProductParameter, ShopCategory
+
+# C-реализация дампера в несколько раз быстрее, если PyYAML собран с libyaml
+YamlDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+CSV_COLUMNS = ('id', 'category', 'category_name', 'name', 'model', 'price', 'price_rrc', 'quantity', 'parameters')
+
+
+class Echo:
+    """Псевдофайл для csv.writer: write() возвращает строку, а не пишет ее."""
+    def write(self, value):
+        return value
+
+
+def shop_categories(shop):
+    """Категории каталога магазина: {id категории: (внешний id, название)}."""
+    categories = {
+        category_id: (external_id, name)
+        for category_id, external_id, name in ShopCategory.objects.filter(shop=shop).values_list(
+            'category_id', 'external_id', 'category__name'
+        )
+    }
+    # товары могут ссылаться на категории без внешнего id магазина
+    for category_id, name in Category.objects.filter(products__shop=shop).exclude(
+        id__in=categories
+    ).distinct().values_list('id', 'name'):
+        categories[category_id] = (category_id, name)
+    return categories
+
+
+def iter_products(shop, chunk_size=None):
+    """
+    Товары магазина пачками через серверный курсор: в памяти находится не
+    больше chunk_size товаров, параметры пачки подгружаются одним запросом.
+    Строки читаются через values_list, без создания экземпляров моделей.
+    Отдает кортежи (external_id, category_id, name, model, price, price_rrc,
+    quantity, parameters).
+    """
+    chunk_size = chunk_size or settings.CATALOGUE_EXPORT_CHUNK_SIZE
+    rows = Product.objects.filter(shop=shop, is_active=True).order_by('id').values_list(
+        'id', 'external_id', 'category_id', 'name', 'model', 'price', 'price_rrc', 'quantity'
+    ).iterator(chunk_size=chunk_size)
+    for chunk in iter(lambda: list(islice(rows, chunk_size)), []):
+        parameters = defaultdict(dict)
+        for product_id, name, value in ProductParameter.objects.filter(
+            product_id__in=[row[0] for row in chunk]
+        ).values_list('product_id', 'parameter__name', 'value'):
+            parameters[product_id][name] = value
+        for product_id, *fields in chunk:
+            yield (*fields, parameters.get(product_id, {}))
+
+
+def export_yaml(shop, chunk_size=None):
+    """
+    Каталог в формате прайс-листа, который принимает update_products_from_data.
+    Товары выгружаются пачками, каждая пачка сериализуется отдельно.
+    """
+    chunk_size = chunk_size or settings.CATALOGUE_EXPORT_CHUNK_SIZE
+    categories = shop_categories(shop)
+
+    def dump(data):
+        return yaml.dump(data, Dumper=YamlDumper, allow_unicode=True, sort_keys=False)
+
+    yield dump({'shop': shop.name})
+    yield dump({'categories': [{'id': external_id, 'name': name} for external_id, name in categories.values()]})
+    goods = []
+    header = 'goods:\n'
+    for external_id, category_id, name, model, price, price_rrc, quantity, parameters in iter_products(
+        shop, chunk_size
+    ):
+        goods.append({
+            'id': external_id,
+            'category': categories[category_id][0],
+            'model': model or '',
+            'name': name,
+            'price': float(price),
+            'price_rrc': float(price_rrc),
+            'quantity': quantity,
+            'parameters': parameters,
+        })
+        if len(goods) == chunk_size:
+            yield header + dump(goods)
+            goods, header = [], ''
+    if goods:
+        yield header + dump(goods)
+    elif header:
+        yield 'goods: []\n'
+
+
+def export_csv(shop, chunk_size=None):
+    """
+    Каталог в CSV, который принимает загрузка прайс-листа: параметры товара
+    записываются в колонку parameters в виде JSON.
+    """
+    categories = shop_categories(shop)
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for external_id, category_id, name, model, price, price_rrc, quantity, parameters in iter_products(
+        shop, chunk_size
+    ):
+        yield writer.writerow((
+            external_id, *categories[category_id], name, model or '', price, price_rrc, quantity,
+            json.dumps(parameters, ensure_ascii=False),
+        ))
+
+
+EXPORT_FORMATS = {
+    'yaml': (export_yaml, 'application/x-yaml; charset=utf-8', 'yaml'),
+    'csv': (export_csv, 'text/csv; charset=utf-8', 'csv'),
+}
@@ -1,6 +1,6 @@
 from django_filters import rest_framework as filters
 
-from .models import Product
+from .models import Product, Order
 
 
 class ProductFilter(filters.FilterSet):
@@ -11,4 +11,13 @@ class ProductFilter(filters.FilterSet):
 
     class Meta:
         model = Product
-        fields = ['name', 'min_price', 'max_price', 'category']
\ No newline at end of file
+        fields = ['name', 'min_price', 'max_price', 'category']
+
+
+class ShopOrderFilter(filters.FilterSet):
+    since = filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+    status = filters.ChoiceFilter(choices=Order.STATUS_CHOICES[1:])
+
+    class Meta:
+        model = Order
+        fields = ['since', 'status']
\ No newline at end of file
@@ -0,0 +1,333 @@
+import io
+import itertools
+import json
+import random
+import re
+import secrets
+import socketserver
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import yaml
+from celery.signals import task_postrun, task_prerun
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.test.client import MULTIPART_CONTENT, encode_multipart, BOUNDARY
+from PIL import Image
+
+from .models import Category, Product, Shop
+from .profiling import QueryInspector
+from .throttling import INTERNAL_REQUEST
+from .warmup import request_host
+
+
+# Сценарий -> доля в смеси по умолчанию
+DEFAULT_MIX = {'browse': 70, 'checkout': 25, 'import': 5}
+HARNESS_SHOP = 'Магазин нагрузочного стенда'
+RECORD_ROLES = (None, 'client', 'shop')
+# id в пути записанного запроса: /api/v1/products/15/ -> /api/v1/products/{id}/
+RECORD_ID = re.compile(r'/\d+(?=/|$)')
+
+
+def load_requests(file):
+    """
+    Записанный трафик в JSON Lines, по запросу в строке: method, path и
+    необязательные body (JSON-тело, для GET - параметры строки запроса),
+    role (client или shop: запрос от пользователя стенда с этой ролью) и
+    status (ожидаемый код ответа).
+    """
+    records = []
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise ValueError(f'строка {number}: {exc}')
+        if not isinstance(record, dict) or not all(
+            isinstance(record.get(field), str) for field in ('method', 'path')
+        ):
+            raise ValueError(f'строка {number}: обязательны строковые поля method и path')
+        if record.get('role') not in RECORD_ROLES:
+            raise ValueError(f'строка {number}: role должна быть client или shop')
+        records.append(record)
+    return records
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost ESMTP sink')
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 localhost')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                for data in self.rfile:
+                    if data == b'.\r\n':
+                        break
+                    size += len(data)
+                self.server.sink.received(size)
+                self.reply('250 OK')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+
+class SMTPSink:
+    """
+    Локальный SMTP-сервер в отдельном потоке: принимает письма и только
+    считает их, поэтому отправка писем проходит через настоящий SMTP-бэкенд.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.server = socketserver.ThreadingTCPServer((host, port), _SMTPHandler)
+        self.server.daemon_threads = True
+        self.server.sink = self
+        self.host, self.port = self.server.server_address
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def received(self, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, name='smtp-sink', daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Harness:
+    """
+    Проигрывает смесь сценариев через весь стек Django в одном процессе и
+    собирает время этапов: каждого HTTP-запроса и каждой задачи Celery.
+    Задачи выполняются сразу (CELERY_TASK_ALWAYS_EAGER), поэтому время задачи
+    входит и во время запроса, который ее поставил.
+    """
+
+    def __init__(self, seed=0, catalogue_size=200, import_size=200):
+        self.random = random.Random(seed)
+        self.catalogue_size = catalogue_size
+        self.import_size = import_size
+        # этап -> [(мс, запросов к БД или None), ...]
+        self.timings = defaultdict(list)
+        self.errors = Counter()
+        self.run_id = secrets.token_hex(4)
+        self._sequence = itertools.count()
+        self._tasks = {}
+        self._image = None
+        self.product_ids = []
+        self.categories = []
+
+    # Этапы
+
+    def record(self, stage, elapsed, queries=None):
+        self.timings[stage].append((elapsed * 1000, queries))
+
+    def request(self, stage, client, method, path, data=None, expected=(200, 201), **kwargs):
+        started = time.perf_counter()
+        with QueryInspector() as inspector:
+            response = getattr(client, method)(path, data, **kwargs)
+        self.record(stage, time.perf_counter() - started, inspector.count)
+        if response.status_code not in expected:
+            self.errors[f'{stage}: {response.status_code}'] += 1
+        return response
+
+    def _task_started(self, task_id=None, task=None, **kwargs):
+        self._tasks[task_id] = time.perf_counter()
+
+    def _task_finished(self, task_id=None, task=None, **kwargs):
+        started = self._tasks.pop(task_id, None)
+        if started is not None:
+            self.record(f'задача {task.name.rsplit(".", 1)[-1]}', time.perf_counter() - started)
+
+    # Данные
+
+    def unique(self, prefix):
+        return f'{prefix}-{self.run_id}-{next(self._sequence)}'
+
+    @staticmethod
+    def client(**headers):
+        # Нагрузка идет с одного адреса, лимиты частоты запросов ее бы отклонили
+        return Client(HTTP_HOST=request_host(), **{INTERNAL_REQUEST: True}, **headers)
+
+    def user_client(self, stage, role='client'):
+        """Регистрирует пользователя и возвращает (клиент с его токеном, имя пользователя)."""
+        name = self.unique(role)
+        data = {'email': f'{name}@example.com', 'username': name, 'password': secrets.token_hex(8)}
+        if role == 'shop':
+            data.update(role='shop', shop={'name': name})
+        client = self.client()
+        self.request(
+            f'{stage}: регистрация', client, 'post', '/api/v1/register/', data, content_type='application/json'
+        )
+        response = self.request(
+            f'{stage}: вход', client, 'post', '/api/v1/login/',
+            {'email': data['email'], 'password': data['password']}, content_type='application/json'
+        )
+        token = response.json().get('token') if response.status_code == 200 else None
+        return self.client(HTTP_AUTHORIZATION=f'Token {token}'), name
+
+    def pricelist(self, size):
+        categories = [{'id': i, 'name': f'Категория {i}'} for i in range(5)]
+        goods = [
+            {
+                'id': i, 'category': i % len(categories), 'model': f'model/{i}', 'name': f'Товар {i}',
+                # новые цены - новый файл, иначе загрузка будет отклонена как повтор
+                'price': self.random.randint(100, 100000), 'price_rrc': 100000,
+                'quantity': 1000000, 'parameters': {'Цвет': self.random.choice(['черный', 'белый'])},
+            }
+            for i in range(size)
+        ]
+        content = yaml.safe_dump({'categories': categories, 'goods': goods}, allow_unicode=True)
+        return SimpleUploadedFile('pricelist.yaml', content.encode())
+
+    def image(self):
+        if self._image is None:
+            buffer = io.BytesIO()
+            Image.new('RGB', (1600, 1200), (200, 120, 40)).save(buffer, 'JPEG')
+            self._image = buffer.getvalue()
+        return SimpleUploadedFile('product.jpg', self._image, content_type='image/jpeg')
+
+    def prepare(self):
+        """Создает каталог стенда загрузкой прайс-листа, если его еще нет."""
+        shop = Shop.objects.filter(name=HARNESS_SHOP).first()
+        if shop is None:
+            client, username = self.user_client('подготовка', role='shop')
+            Shop.objects.filter(user__username=username).update(name=HARNESS_SHOP)
+            self.request(
+                'подготовка: прайс-лист', client, 'post', '/api/v1/upload-pricelist/',
+                {'file': self.pricelist(self.catalogue_size)}
+            )
+            shop = Shop.objects.get(name=HARNESS_SHOP)
+        products = Product.objects.filter(shop=shop, is_active=True)
+        self.product_ids = list(products.values_list('id', flat=True))
+        self.categories = list(
+            Category.objects.filter(products__in=products).distinct().values_list('name', flat=True)
+        )
+
+    # Сценарии
+
+    def browse(self):
+        client = self.client()
+        product_id = self.random.choice(self.product_ids)
+        page = self.random.randint(1, max(len(self.product_ids) // 10, 1))
+        self.request('каталог: список', client, 'get', '/api/v1/products/', {'page': page})
+        self.request('каталог: категория', client, 'get', '/api/v1/products/', {
+            'category': self.random.choice(self.categories)
+        })
+        self.request('каталог: товар', client, 'get', f'/api/v1/products/{product_id}/')
+        self.request('каталог: рекомендации', client, 'get', f'/api/v1/products/{product_id}/recommendations/')
+
+    def checkout(self):
+        client, _ = self.user_client('покупка')
+        contact = self.request('покупка: адрес', client, 'post', '/api/v1/contacts/', {
+            'city': 'Москва', 'street': 'Тверская', 'house': '1', 'phone': '+70000000000',
+        }, content_type='application/json')
+        for product_id in self.random.sample(self.product_ids, min(3, len(self.product_ids))):
+            self.request(
+                'покупка: в корзину', client, 'post', f'/api/v1/products/{product_id}/add_to_cart/',
+                {'quantity': self.random.randint(1, 3)}, content_type='application/json'
+            )
+        self.request('покупка: корзина', client, 'get', '/api/v1/orders/show_cart/')
+        self.request(
+            'покупка: подтверждение', client, 'post', '/api/v1/orders/confirm_order/',
+            {'address_id': contact.json().get('id')}, content_type='application/json'
+        )
+
+    def import_(self):
+        client, username = self.user_client('импорт', role='shop')
+        self.request(
+            'импорт: загрузка прайс-листа', client, 'post', '/api/v1/upload-pricelist/',
+            {'file': self.pricelist(self.import_size)}
+        )
+        product = Product.objects.filter(shop__user__username=username).first()
+        if product is None:
+            self.errors['импорт: товары не созданы'] += 1
+            return
+        # изображение товара запускает generate_thumbnails
+        self.request(
+            'импорт: изображение товара', client, 'patch', f'/api/v1/products/{product.id}/',
+            encode_multipart(BOUNDARY, {'image': self.image()}), content_type=MULTIPART_CONTENT
+        )
+
+    SCENARIOS = {'browse': browse, 'checkout': checkout, 'import': import_}
+
+    @contextmanager
+    def recording(self):
+        """Засекает время задач Celery и готовит каталог стенда."""
+        task_prerun.connect(self._task_started)
+        task_postrun.connect(self._task_finished)
+        try:
+            self.prepare()
+            yield
+        finally:
+            task_prerun.disconnect(self._task_started)
+            task_postrun.disconnect(self._task_finished)
+
+    def run(self, mix, iterations):
+        """Выполняет iterations сценариев, выбирая их по долям из mix."""
+        unknown = set(mix) - self.SCENARIOS.keys()
+        if unknown:
+            raise ValueError(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+        names = self.random.choices(list(mix), weights=list(mix.values()), k=iterations)
+        with self.recording():
+            for name in names:
+                started = time.perf_counter()
+                self.SCENARIOS[name](self)
+                self.record(f'сценарий {name}', time.perf_counter() - started)
+        return Counter(names)
+
+    def replay(self, records, iterations=1):
+        """
+        Проигрывает записанный трафик (см. load_requests) iterations раз по
+        порядку записи. Запросы с role выполняются от пользователей стенда,
+        по одному на роль; id в путях должны существовать в БД стенда.
+        Время запросов группируется по пути с id, замененными на {id}.
+        """
+        clients = {}
+        with self.recording():
+            for record in itertools.chain.from_iterable(itertools.repeat(records, iterations)):
+                role = record.get('role')
+                if role not in clients:
+                    clients[role] = self.user_client('запись', role)[0] if role else self.client()
+                method = record['method'].lower()
+                path = record['path']
+                stage = f'запись: {method.upper()} {RECORD_ID.sub("/{id}", path.split("?")[0])}'
+                kwargs = {} if method == 'get' else {'content_type': 'application/json'}
+                expected = (record['status'],) if 'status' in record else (200, 201)
+                self.request(stage, clients[role], method, path, record.get('body'), expected, **kwargs)
+        return Counter({'запись': len(records) * iterations})
+
+    def report(self):
+        """
+        Строки отчета по этапам: число, среднее, p50, p95, сумма, мс; запросов
+        к БД в среднем (только для HTTP-запросов).
+        """
+        lines = [f'{"этап":<40} {"n":>5} {"среднее":>9} {"p50":>9} {"p95":>9} {"всего":>10} {"SQL":>6}']
+        for stage, samples in sorted(self.timings.items()):
+            elapsed = sorted(ms for ms, _ in samples)
+            queries = [count for _, count in samples if count is not None]
+            sql = f'{statistics.fmean(queries):.1f}' if queries else '-'
+            lines.append(
+                f'{stage:<40} {len(elapsed):>5} {statistics.fmean(elapsed):>9.1f} '
+                f'{elapsed[len(elapsed) // 2]:>9.1f} {elapsed[int(len(elapsed) * 0.95)]:>9.1f} '
+                f'{sum(elapsed):>10.1f} {sql:>6}'
+            )
+        return lines
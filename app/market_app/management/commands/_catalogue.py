@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+from market_app.models import User, Shop, Category, Product, Parameter, ProductParameter
+
+
+def create_catalogue(size, parameters=5):
+    """Создает синтетический каталог для бенчмарков и возвращает список id товаров."""
+    user = User.objects.create_user(
+        email='bench-shop@example.com', username='bench-shop', password=None, role='shop'
+    )
+    shop = Shop.objects.create(user=user, name='Бенчмарк')
+    category = Category.objects.create(name='Смартфоны')
+    params = Parameter.objects.bulk_create(
+        [Parameter(name=f'Бенчмарк-параметр {i}') for i in range(parameters)]
+    )
+    Product.objects.bulk_create([
+        Product(
+            external_id=900000000 + i,
+            name=f'Смартфон {i}',
+            model=f'model/{i}',
+            price=Decimal('1000.50') + i,
+            price_rrc=Decimal('1200.00') + i,
+            category=category,
+            shop=shop,
+            quantity=i % 50,
+        )
+        for i in range(size)
+    ])
+    ids = list(
+        Product.objects.filter(shop=shop).order_by('id').values_list('id', flat=True)
+    )
+    ProductParameter.objects.bulk_create([
+        ProductParameter(product_id=product_id, parameter=param, value=f'значение {i}')
+        for product_id in ids for i, param in enumerate(params)
+    ])
+    return ids
@@ -0,0 +1,82 @@
+import statistics
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.authtoken.models import Token
+from rest_framework.views import APIView
+
+from market_app.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку запросов к API при новом соединении с БД на каждый запрос, '
+        'постоянном соединении и пуле соединений (только PostgreSQL + psycopg 3)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument('--path', default='/api/v1/products/')
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        original = {
+            'CONN_MAX_AGE': settings_dict['CONN_MAX_AGE'],
+            'CONN_HEALTH_CHECKS': settings_dict['CONN_HEALTH_CHECKS'],
+            'OPTIONS': dict(settings_dict['OPTIONS']),
+        }
+        pool_options = original['OPTIONS'].pop('pool', None)
+        modes = {
+            'per-request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': original['OPTIONS']},
+            'persistent': {'CONN_MAX_AGE': None, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': original['OPTIONS']},
+        }
+        if connection.vendor == 'postgresql':
+            modes['pool'] = {
+                'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+                'OPTIONS': {**original['OPTIONS'], 'pool': pool_options or True},
+            }
+        else:
+            self.stdout.write(f'{connection.vendor}: пул соединений недоступен, сравниваются два режима')
+
+        user = User.objects.create_user(email='bench-connections@example.com', username='bench-connections')
+        client = Client(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}')
+        # Client вызывает сигналы request_started/request_finished, как gunicorn,
+        # поэтому соединения закрываются и возвращаются в пул по тем же правилам.
+        setup_test_environment()
+        # Лимиты частоты запросов не должны попадать в замер
+        throttling = mock.patch.object(APIView, 'get_throttles', return_value=[])
+        throttling.start()
+        try:
+            for name, mode in modes.items():
+                connection.close()
+                if hasattr(connection, 'close_pool'):
+                    connection.close_pool()
+                settings_dict.update(mode)
+                if client.get(options['path']).status_code != 200:
+                    raise CommandError(f'{options["path"]}: ответ не 200')
+                timings = []
+                for _ in range(options['requests']):
+                    started = time.perf_counter()
+                    client.get(options['path'])
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                self.stdout.write(
+                    f'{name:>11}: среднее {statistics.fmean(timings):7.2f} мс, '
+                    f'p50 {timings[len(timings) // 2]:7.2f} мс, '
+                    f'p95 {timings[int(len(timings) * 0.95)]:7.2f} мс'
+                )
+        finally:
+            throttling.stop()
+            teardown_test_environment()
+            connection.close()
+            if hasattr(connection, 'close_pool'):
+                connection.close_pool()
+            settings_dict.update(original)
+            if pool_options is not None:
+                settings_dict['OPTIONS']['pool'] = pool_options
+            # Токен удаляется каскадно вместе с пользователем
+            user.delete()
@@ -0,0 +1,37 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from market_app.export import EXPORT_FORMATS
+from market_app.models import Shop
+from ._catalogue import create_catalogue
+
+
+class Command(BaseCommand):
+    help = 'Измеряет время и пиковый расход памяти потоковой выгрузки каталога'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=20000)
+        parser.add_argument('--parameters', type=int, default=5)
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        # Тестовые данные создаются в транзакции и откатываются по завершении
+        with transaction.atomic():
+            create_catalogue(options['size'], options['parameters'])
+            shop = Shop.objects.get(user__email='bench-shop@example.com')
+            for name, (export, _, _) in EXPORT_FORMATS.items():
+                # прогрев: первый проход заполняет кеши импорта и соединения
+                sum(len(chunk) for chunk in export(shop, options['chunk_size']))
+                tracemalloc.start()
+                started = time.perf_counter()
+                written = sum(len(chunk) for chunk in export(shop, options['chunk_size']))
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                self.stdout.write(
+                    f'{name:>5}: {options["size"]} товаров за {elapsed:.2f} с, '
+                    f'{written / 2 ** 20:.1f} МБ, пик памяти {peak / 2 ** 20:.1f} МБ'
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,51 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+
+from market_app.auth import authenticate_for_token
+from market_app.models import User
+
+
+def legacy_login(email, password):
+    # Прежняя реализация user_login: хеширование в потоке запроса
+    # и get_or_create токена на каждый вызов.
+    user = User.objects.filter(email=email).first()
+    if user is not None and user.check_password(password):
+        token, _ = Token.objects.get_or_create(user=user)
+        return token.key
+    return None
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность логина (логинов/с на ядро) до и после оптимизации'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        threads = options['threads']
+        cores = min(threads, os.cpu_count() or 1)
+        email, password = 'bench-login@example.com', 'bench-password-123'
+
+        user = User.objects.create_user(email=email, username='bench', password=password)
+        try:
+            for name, login in (('legacy', legacy_login), ('fast', authenticate_for_token)):
+                login(email, password)
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    results = list(pool.map(lambda _: login(email, password), range(total)))
+                elapsed = time.perf_counter() - started
+                assert all(results), f'{name}: не все логины прошли успешно'
+                rate = total / elapsed
+                self.stdout.write(
+                    f'{name:>6}: {rate:8.1f} логинов/с, {rate / cores:8.1f} логинов/с на ядро '
+                    f'({total} запросов, {threads} потоков)'
+                )
+        finally:
+            # Токен удаляется каскадно вместе с пользователем
+            user.delete()
@@ -0,0 +1,55 @@
+import json
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from market_app import pricelist
+from market_app.export import export_csv, export_yaml, iter_products, shop_categories
+from market_app.models import Shop
+from ._catalogue import create_catalogue
+
+
+def export_jsonl(shop):
+    categories = shop_categories(shop)
+    for external_id, category_id, name, model, price, price_rrc, quantity, parameters in iter_products(shop):
+        yield json.dumps({
+            'id': external_id, 'category': categories[category_id][0],
+            'category_name': categories[category_id][1], 'name': name, 'model': model or '',
+            'price': float(price), 'price_rrc': float(price_rrc), 'quantity': quantity,
+            'parameters': parameters,
+        }, ensure_ascii=False) + '\n'
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость разбора и проверки прайс-листа (товаров/с) в YAML, JSON Lines и CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=20000)
+        parser.add_argument('--parameters', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        # Каталог создается в транзакции и откатывается, прайс-листы - его выгрузки
+        with transaction.atomic():
+            create_catalogue(options['size'], options['parameters'])
+            shop = Shop.objects.get(user__email='bench-shop@example.com')
+            files = {
+                'shop.yaml': ''.join(export_yaml(shop)).encode(),
+                'shop.jsonl': ''.join(export_jsonl(shop)).encode(),
+                'shop.csv': ''.join(export_csv(shop)).encode(),
+            }
+            transaction.set_rollback(True)
+
+        for name, content in files.items():
+            best = None
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                data = pricelist.parse(SimpleUploadedFile(name, content))
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            rows = len(data['goods'])
+            self.stdout.write(
+                f'{name:>10}: {rows / best:10.0f} товаров/с ({rows} товаров за {best:.2f} с, '
+                f'{len(content) / 2 ** 20:.1f} МБ)'
+            )
@@ -0,0 +1,54 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from market_app.models import Product
+from market_app.parsers import ORJSONParser
+from market_app.renderers import ORJSONRenderer
+from market_app.serializers import FastProductSerializer
+from ._catalogue import create_catalogue
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает JSONRenderer/JSONParser и ORJSONRenderer/ORJSONParser на страницах списка товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def measure(self, func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) / repeat
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        # Тестовые данные создаются в транзакции и откатываются по завершении
+        with transaction.atomic():
+            ids = create_catalogue(max(options['sizes']))
+            for size in options['sizes']:
+                queryset = Product.objects.filter(id__in=ids[:size]).order_by('id')
+                page = {
+                    'count': size, 'next': None, 'previous': None,
+                    'results': FastProductSerializer(FastProductSerializer.prepare(queryset)).data,
+                }
+                body = JSONRenderer().render(page)
+                assert ORJSONRenderer().render(page) == body
+
+                render_std = self.measure(lambda: JSONRenderer().render(page), repeat)
+                render_fast = self.measure(lambda: ORJSONRenderer().render(page), repeat)
+                parse_std = self.measure(lambda: JSONParser().parse(io.BytesIO(body)), repeat)
+                parse_fast = self.measure(lambda: ORJSONParser().parse(io.BytesIO(body)), repeat)
+                self.stdout.write(
+                    f'{size:>6} товаров ({len(body) // 1024} КБ): '
+                    f'рендер {render_std * 1000:.2f} -> {render_fast * 1000:.2f} мс '
+                    f'(x{render_std / render_fast:.1f}), '
+                    f'парсинг {parse_std * 1000:.2f} -> {parse_fast * 1000:.2f} мс '
+                    f'(x{parse_std / parse_fast:.1f})'
+                )
+            transaction.set_rollback(True)
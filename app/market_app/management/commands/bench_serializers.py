@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from market_app.models import Product
+from market_app.serializers import ProductSerializer, FastProductSerializer
+from ._catalogue import create_catalogue
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость ProductSerializer и FastProductSerializer на страницах разного размера'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--parameters', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+        repeat = options['repeat']
+        # Тестовые данные создаются в транзакции и откатываются по завершении
+        with transaction.atomic():
+            ids = create_catalogue(max(sizes), options['parameters'])
+            queryset = Product.objects.filter(id__in=ids).select_related(
+                'category', 'shop'
+            ).prefetch_related('parameters__parameter').order_by('id')
+
+            for size in sizes:
+                page = queryset[:size]
+                drf = self.measure(lambda: ProductSerializer(list(page), many=True).data, repeat)
+                fast = self.measure(
+                    lambda: FastProductSerializer(FastProductSerializer.prepare(page)).data, repeat
+                )
+                self.stdout.write(
+                    f'{size:>6} товаров: DRF {size / drf:10.0f} объектов/с, '
+                    f'быстрый путь {size / fast:10.0f} объектов/с, ускорение x{drf / fast:.1f}'
+                )
+            transaction.set_rollback(True)
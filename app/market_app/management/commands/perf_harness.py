@@ -0,0 +1,85 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from market_app.harness import DEFAULT_MIX, Harness, SMTPSink, load_requests
+from market_app.profiling import SamplingProfiler
+
+
+class Command(BaseCommand):
+    help = (
+        'Локальный стенд производительности: проигрывает смесь сценариев (каталог, регистрация -> '
+        'корзина -> заказ -> письмо, загрузка прайс-листа -> импорт -> миниатюры) в одном процессе, '
+        'или записанный трафик (--replay), выводит время этапов и пишет стеки для flame graph. Запускается с '
+        'DJANGO_SETTINGS_MODULE=market_api_service.settings_local'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int,
+            help='Сколько сценариев выполнить (по умолчанию 100) или сколько раз проиграть запись (1)'
+        )
+        source = parser.add_mutually_exclusive_group()
+        source.add_argument(
+            '--mix', help='JSON-файл со смесью сценариев {"browse": 70, "checkout": 25, "import": 5}'
+        )
+        source.add_argument(
+            '--replay', help='JSON Lines с записанными запросами: method, path, body, role, status'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--catalogue-size', type=int, default=200, help='Товаров в каталоге стенда')
+        parser.add_argument('--import-size', type=int, default=200, help='Товаров в загружаемом прайс-листе')
+        parser.add_argument('--interval', type=float, default=0.005, help='Период снятия стека, секунд')
+        parser.add_argument(
+            '--flamegraph', help='Файл folded stacks, по умолчанию perf_harness.folded в PERF_DIR'
+        )
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'PERF_HARNESS', False):
+            raise CommandError(
+                'Стенд создает пользователей, магазины и заказы; запустите его с '
+                'DJANGO_SETTINGS_MODULE=market_api_service.settings_local'
+            )
+        mix = DEFAULT_MIX
+        if options['mix']:
+            with open(options['mix']) as file:
+                mix = json.load(file)
+        records = None
+        if options['replay']:
+            with open(options['replay']) as file:
+                try:
+                    records = load_requests(file)
+                except ValueError as exc:
+                    raise CommandError(f'{options["replay"]}: {exc}')
+        flamegraph = options['flamegraph'] or os.path.join(settings.PERF_DIR, 'perf_harness.folded')
+
+        harness = Harness(options['seed'], options['catalogue_size'], options['import_size'])
+        with SMTPSink() as sink, override_settings(EMAIL_HOST=sink.host, EMAIL_PORT=sink.port):
+            with SamplingProfiler(options['interval']) as profiler:
+                if records is not None:
+                    scenarios = harness.replay(records, options['iterations'] or 1)
+                else:
+                    try:
+                        scenarios = harness.run(mix, options['iterations'] or 100)
+                    except ValueError as exc:
+                        raise CommandError(str(exc))
+
+        self.stdout.write('Сценарии: ' + ', '.join(f'{name} {count}' for name, count in scenarios.items()))
+        self.stdout.write('Время этапов, мс:')
+        for line in harness.report():
+            self.stdout.write(f'  {line}')
+        self.stdout.write(f'Писем принято SMTP-сервером: {sink.messages} ({sink.bytes} байт)')
+        if harness.errors:
+            self.stdout.write(self.style.WARNING('Неожиданные ответы:'))
+            for stage, count in harness.errors.most_common():
+                self.stdout.write(f'  {stage}: {count}')
+
+        with open(flamegraph, 'w') as file:
+            profiler.write_folded(file)
+        self.stdout.write(
+            f'Стеки ({sum(profiler.stacks.values())} срезов): {flamegraph}\n'
+            f'  flamegraph.pl {flamegraph} > perf_harness.svg или откройте файл в speedscope.app'
+        )
@@ -0,0 +1,75 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from market_app.models import User, Contact, Product
+from market_app.views import ProductList, OrderViewSet
+from ._catalogue import create_catalogue
+
+
+class Command(BaseCommand):
+    help = (
+        'Моделирует распродажу: покупатели наполняют корзины одним товаром, затем оформляют '
+        'заказы. Сравнивает долю отказов при оформлении с резервированием и без него.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=200)
+        parser.add_argument('--stock', type=int, default=100)
+        parser.add_argument('--max-quantity', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for name, ttl in (('без резерва', 0), ('с резервом', 15 * 60)):
+            with override_settings(CART_RESERVATION_TTL=ttl):
+                stats = self.simulate(options)
+            attempts = stats['checkouts']
+            rate = stats['checkout_failures'] / attempts if attempts else 0.0
+            self.stdout.write(
+                f'{name:>12}: отказов при добавлении в корзину {stats["cart_rejections"]}, '
+                f'оформлений {attempts}, отказов при оформлении {stats["checkout_failures"]} '
+                f'({rate:.1%}), продано {stats["sold"]} из {options["stock"]}'
+            )
+
+    def simulate(self, options):
+        rng = random.Random(options['seed'])
+        factory = APIRequestFactory()
+        add_to_cart = ProductList.as_view({'post': 'add_to_cart'}, throttle_classes=[])
+        confirm_order = OrderViewSet.as_view({'post': 'confirm_order'}, throttle_classes=[])
+        stats = {'cart_rejections': 0, 'checkouts': 0, 'checkout_failures': 0, 'sold': 0}
+
+        # Все данные создаются в транзакции и откатываются по завершении
+        with transaction.atomic():
+            product_id = create_catalogue(1, parameters=0)[0]
+            Product.objects.filter(pk=product_id).update(quantity=options['stock'])
+
+            buyers = []
+            for i in range(options['buyers']):
+                user = User.objects.create_user(email=f'buyer{i}@example.com', username=f'buyer{i}')
+                contact = Contact.objects.create(user=user, city='Москва', street='Тверская', house='1', phone='1')
+                buyers.append((user, contact, rng.randint(1, options['max_quantity'])))
+
+            # Сначала все наполняют корзины, затем в случайном порядке оформляют заказы
+            in_cart = []
+            for user, contact, quantity in buyers:
+                request = factory.post('/', {'quantity': quantity}, format='json')
+                force_authenticate(request, user=user)
+                if add_to_cart(request, pk=product_id).status_code == 201:
+                    in_cart.append((user, contact, quantity))
+                else:
+                    stats['cart_rejections'] += 1
+
+            rng.shuffle(in_cart)
+            for user, contact, quantity in in_cart:
+                request = factory.post('/', {'address_id': contact.id}, format='json')
+                force_authenticate(request, user=user)
+                stats['checkouts'] += 1
+                if confirm_order(request).status_code == 200:
+                    stats['sold'] += quantity
+                else:
+                    stats['checkout_failures'] += 1
+            transaction.set_rollback(True)
+        return stats
@@ -0,0 +1,101 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+MARKER = 'STARTUP_PROFILE '
+
+# Запускается в отдельном интерпретаторе, чтобы модули загружались с нуля,
+# как в только что запущенном воркере gunicorn
+SCRIPT = '''
+import json, sys, time
+
+phases = []
+started = time.perf_counter()
+
+def mark(name):
+    global started
+    now = time.perf_counter()
+    phases.append((name, (now - started) * 1000))
+    started = now
+
+from django.conf import settings
+settings.INSTALLED_APPS
+mark('настройки')
+import django
+django.setup(set_prefix=False)
+mark('django.setup()')
+from django.core.handlers.wsgi import WSGIHandler
+application = WSGIHandler()
+mark('middleware')
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark('маршруты')
+from market_app.warmup import warm
+for path in sys.argv[1:]:
+    (_, status, _), = warm([path])
+    mark(f'GET {path} ({status})')
+print(%r + json.dumps(phases))
+''' % MARKER
+
+
+class Command(BaseCommand):
+    help = (
+        'Профиль запуска процесса: время этапов (настройки, приложения, middleware, маршруты, '
+        'первые запросы) и время импорта по пакетам (python -X importtime)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Запрос после запуска, можно указать несколько раз; по умолчанию список товаров '
+                 'дважды и схема OpenAPI'
+        )
+        parser.add_argument('--runs', type=int, default=3, help='Запусков, выводится медиана')
+        parser.add_argument('--top', type=int, default=15, help='Сколько пакетов показать')
+        parser.add_argument('--api-only', action='store_true', help='Запуск с API_ONLY=true')
+
+    def run_once(self, paths, env):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT, *paths],
+            env=env, capture_output=True, text=True
+        )
+        for line in result.stdout.splitlines():
+            if line.startswith(MARKER):
+                return json.loads(line[len(MARKER):]), result.stderr
+        raise CommandError(f'Процесс завершился с кодом {result.returncode}:\n{result.stderr[-2000:]}')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/api/v1/products/', '/api/v1/products/', '/api/v1/schema/']
+        env = dict(os.environ)
+        if options['api_only']:
+            env['API_ONLY'] = 'true'
+
+        runs = []
+        for _ in range(options['runs']):
+            phases, importtime = self.run_once(paths, env)
+            runs.append(phases)
+
+        self.stdout.write('Этапы запуска, медиана, мс:')
+        total = 0
+        for i, (name, _) in enumerate(runs[0]):
+            elapsed = statistics.median(run[i][1] for run in runs)
+            total += elapsed
+            self.stdout.write(f'  {name:<40} {elapsed:9.1f}')
+        self.stdout.write(f'  {"итого":<40} {total:9.1f}')
+
+        # собственное время модулей суммируется по пакету верхнего уровня
+        packages = Counter()
+        for line in importtime.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, _, module = line[len('import time:'):].split('|')
+            packages[module.strip().split('.')[0]] += int(self_us)
+        self.stdout.write(f'Импорт по пакетам (последний запуск), всего {sum(packages.values()) / 1000:.1f} мс:')
+        for package, self_us in packages.most_common(options['top']):
+            self.stdout.write(f'  {package:<40} {self_us / 1000:9.1f}')
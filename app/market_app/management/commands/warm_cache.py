@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from market_app.warmup import hot_paths, warm
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогревает кеш запросов после развертывания: запрашивает первые страницы списка товаров, '
+        'статистику и страницы самых крупных категорий'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, help='Страниц списка товаров, по умолчанию WARM_CACHE_PAGES')
+        parser.add_argument(
+            '--categories', type=int, help='Самых крупных категорий, по умолчанию WARM_CACHE_CATEGORIES'
+        )
+        parser.add_argument('paths', nargs='*', help='Пути вместо страниц по умолчанию')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or hot_paths(options['pages'], options['categories'])
+        failed = 0
+        for path, status, elapsed in warm(paths):
+            self.stdout.write(f'{status or "ошибка"!s:>6} {elapsed:8.1f} мс  {path}')
+            failed += status != 200
+        if failed:
+            raise CommandError(f'Не прогрето страниц: {failed}')
@@ -0,0 +1,264 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from django_redis.client import DefaultClient
+from redis.exceptions import RedisError
+
+
+logger = logging.getLogger(__name__)
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = ContextVar('request_metrics', default=None)
+_missing = object()
+
+
+class RequestMetrics:
+    __slots__ = (
+        'db_queries', 'db_time', 'cache_hits', 'cache_misses', 'serializer_time'
+    )
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Используется как execute_wrapper соединения с БД
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def serializer_timer():
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+
+
+class MetricsRegistry:
+    """
+    Метрики запросов в разрезе вью, действия и метода. Процесс копит приращения
+    и раз в METRICS_FLUSH_INTERVAL секунд прибавляет их к общему хешу в Redis,
+    поэтому /metrics/ любого процесса gunicorn отдает сумму по всем процессам.
+    Если кеш настроен не на Redis (например, в тестах), метрики остаются в процессе.
+    """
+    COUNTERS = ('db_queries', 'db_time', 'cache_hits', 'cache_misses', 'serializer_time')
+    REDIS_KEY = 'http:request_metrics'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # приращения с последней записи в Redis
+        self._pending = {}
+        # итоги процесса, если Redis не используется
+        self._series = {}
+        self._flushed = time.monotonic()
+
+    @classmethod
+    def _empty(cls):
+        return {
+            'count': 0,
+            'duration': 0.0,
+            'buckets': [0] * len(DURATION_BUCKETS),
+            **{name: 0 for name in cls.COUNTERS},
+        }
+
+    @classmethod
+    def _merge(cls, target, source):
+        for labels, values in source.items():
+            series = target.setdefault(labels, cls._empty())
+            for name in ('count', 'duration', *cls.COUNTERS):
+                series[name] += values[name]
+            for i, count in enumerate(values['buckets']):
+                series['buckets'][i] += count
+
+    def observe(self, labels, duration, metrics):
+        with self._lock:
+            series = self._pending.get(labels)
+            if series is None:
+                series = self._pending[labels] = self._empty()
+            series['count'] += 1
+            series['duration'] += duration
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    series['buckets'][i] += 1
+                    break
+            for name in self.COUNTERS:
+                series[name] += getattr(metrics, name)
+            due = time.monotonic() - self._flushed >= settings.METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Переносит накопленные приращения в Redis одним конвейером команд."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed = time.monotonic()
+        if not pending:
+            return
+        try:
+            client = get_redis_connection()
+        except NotImplementedError:
+            with self._lock:
+                self._merge(self._series, pending)
+            return
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for labels, values in pending.items():
+                prefix = '|'.join(labels)
+                for name in ('count', 'duration', *self.COUNTERS):
+                    if values[name]:
+                        pipeline.hincrbyfloat(self.REDIS_KEY, f'{prefix}|{name}', values[name])
+                for i, count in enumerate(values['buckets']):
+                    if count:
+                        pipeline.hincrby(self.REDIS_KEY, f'{prefix}|bucket_{i}', count)
+            pipeline.execute()
+        except RedisError:
+            # Метрики не должны влиять на запросы; приращения запишутся при следующей попытке
+            logger.warning('Не удалось записать метрики запросов', exc_info=True)
+            with self._lock:
+                self._merge(self._pending, pending)
+
+    def snapshot(self):
+        self.flush()
+        try:
+            client = get_redis_connection()
+        except NotImplementedError:
+            with self._lock:
+                return {
+                    labels: {**series, 'buckets': list(series['buckets'])}
+                    for labels, series in self._series.items()
+                }
+        try:
+            raw = client.hgetall(self.REDIS_KEY)
+        except RedisError:
+            logger.warning('Не удалось прочитать метрики запросов', exc_info=True)
+            return {}
+        snapshot = {}
+        for field, value in raw.items():
+            view, action, method, name = field.decode().split('|')
+            series = snapshot.setdefault((view, action, method), self._empty())
+            if name.startswith('bucket_'):
+                series['buckets'][int(name.rsplit('_', 1)[1])] = int(value)
+            elif name in ('count', 'cache_hits', 'cache_misses', 'db_queries'):
+                series[name] = int(float(value))
+            else:
+                series[name] = float(value)
+        return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._series.clear()
+        try:
+            get_redis_connection().delete(self.REDIS_KEY)
+        except NotImplementedError:
+            pass
+
+
+registry = MetricsRegistry()
+
+COUNTER_METRICS = (
+    ('db_queries', 'market_db_queries_total', 'Количество запросов к БД'),
+    ('db_time', 'market_db_query_duration_seconds_total', 'Суммарное время запросов к БД'),
+    ('cache_hits', 'market_cache_hits_total', 'Попадания в кеш'),
+    ('cache_misses', 'market_cache_misses_total', 'Промахи кеша'),
+    ('serializer_time', 'market_serializer_duration_seconds_total', 'Суммарное время сериализации'),
+)
+
+
+def _format_labels(labels, **extra):
+    view, action, method = labels
+    pairs = {'view': view, 'action': action, 'method': method, **extra}
+    return ','.join(f'{key}="{value}"' for key, value in pairs.items())
+
+
+def render_prometheus(snapshot=None):
+    """Текстовый формат экспозиции Prometheus (version 0.0.4)."""
+    if snapshot is None:
+        snapshot = registry.snapshot()
+    lines = [
+        '# HELP market_http_requests_total Количество обработанных запросов',
+        '# TYPE market_http_requests_total counter',
+    ]
+    for labels, series in snapshot.items():
+        lines.append(f'market_http_requests_total{{{_format_labels(labels)}}} {series["count"]}')
+
+    lines += [
+        '# HELP market_http_request_duration_seconds Длительность обработки запроса',
+        '# TYPE market_http_request_duration_seconds histogram',
+    ]
+    for labels, series in snapshot.items():
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS, series['buckets']):
+            cumulative += count
+            lines.append(
+                f'market_http_request_duration_seconds_bucket{{{_format_labels(labels, le=bound)}}} {cumulative}'
+            )
+        lines.append(
+            f'market_http_request_duration_seconds_bucket{{{_format_labels(labels, le="+Inf")}}} {series["count"]}'
+        )
+        lines.append(f'market_http_request_duration_seconds_sum{{{_format_labels(labels)}}} {series["duration"]}')
+        lines.append(f'market_http_request_duration_seconds_count{{{_format_labels(labels)}}} {series["count"]}')
+
+    for field, name, description in COUNTER_METRICS:
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        for labels, series in snapshot.items():
+            lines.append(f'{name}{{{_format_labels(labels)}}} {series[field]}')
+    return '\n'.join(lines) + '\n'
+
+
+class InstrumentedRedisClient(DefaultClient):
+    """Клиент django-redis, считающий попадания и промахи кеша в рамках запроса."""
+
+    def get(self, key, default=None, version=None, client=None):
+        value = super().get(key, default=_missing, version=version, client=client)
+        metrics = _current.get()
+        if value is _missing:
+            if metrics is not None:
+                metrics.cache_misses += 1
+            return default
+        if metrics is not None:
+            metrics.cache_hits += 1
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version, client=client)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(values)
+            metrics.cache_misses += len(keys) - len(values)
+        return values
@@ -0,0 +1,41 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+class PerformanceMetricsMiddleware:
+    """
+    Собирает метрики каждого запроса: длительность, количество и время
+    запросов к БД, попадания/промахи кеша и время сериализации.
+    Метрики агрегируются по вью и отдаются в формате Prometheus.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with metrics.collect() as request_metrics, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(request_metrics))
+            request.metrics_labels = None
+            response = self.get_response(request)
+        if request.metrics_labels is not None:
+            metrics.registry.observe(
+                request.metrics_labels, time.perf_counter() - started, request_metrics
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'skip_metrics', False):
+            return None
+        cls = getattr(view_func, 'cls', None)
+        name = cls.__name__ if cls is not None else view_func.__name__
+        # Для ViewSet имя действия берется из сопоставления метода с действием
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), '')
+        request.metrics_labels = (name, action, request.method)
+        return None
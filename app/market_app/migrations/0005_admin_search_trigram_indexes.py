@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+# Триграммные GIN-индексы для поиска icontains в админке. Django строит
+# для icontains выражение UPPER(col::text) LIKE UPPER(...), поэтому индексы
+# построены по тому же выражению. Создаются только на PostgreSQL.
+TRIGRAM_INDEXES = (
+    ('market_app_product_name_trgm', 'market_app_product', 'name'),
+    ('market_app_product_model_trgm', 'market_app_product', 'model'),
+    ('market_app_category_name_trgm', 'market_app_category', 'name'),
+    ('market_app_shop_name_trgm', 'market_app_shop', 'name'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('market_app', '0004_user_image_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
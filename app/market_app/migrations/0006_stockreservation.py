@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0005_admin_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Зарезервировано')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+                ('order_item', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservation', to='market_app.orderitem', verbose_name='Позиция заказа')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='market_app.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Резерв товара',
+                'verbose_name_plural': 'Резервы товаров',
+            },
+        ),
+    ]
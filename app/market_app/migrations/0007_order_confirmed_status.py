@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0006_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('basket', 'Корзина'), ('confirmed', 'Подтвержден'), ('in_progress', 'Собирается'), ('shipping', 'Передан в доставку'), ('completed', 'Завершен'), ('canceled', 'Отменен')], default='basket', max_length=20, verbose_name='Статус'),
+        ),
+    ]
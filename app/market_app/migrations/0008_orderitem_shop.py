@@ -0,0 +1,40 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_order_item_shop(apps, schema_editor):
+    OrderItem = apps.get_model('market_app', 'OrderItem')
+    Product = apps.get_model('market_app', 'Product')
+    OrderItem.objects.filter(shop__isnull=True).update(
+        shop_id=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('shop_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0007_order_confirmed_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='shop',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='market_app.shop', verbose_name='Магазин'),
+        ),
+        migrations.RunPython(fill_order_item_shop, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='shop',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='market_app.shop', verbose_name='Магазин'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['shop', 'order'], name='orderitem_shop_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at', 'id'], name='order_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# На PostgreSQL история цен хранится в таблице, секционированной по месяцам
+# changed_at. Первичный ключ секционированной таблицы должен включать ключ
+# секционирования, поэтому таблица создается вручную; состояние модели
+# для Django остается обычным (id - первичный ключ).
+CREATE_PARTITIONED_TABLE = (
+    '''
+    CREATE TABLE market_app_pricehistory (
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        product_id bigint NOT NULL
+            REFERENCES market_app_product (id) DEFERRABLE INITIALLY DEFERRED,
+        price numeric(10, 2) NOT NULL,
+        price_rrc numeric(10, 2) NOT NULL,
+        changed_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, changed_at)
+    ) PARTITION BY RANGE (changed_at)
+    ''',
+    'CREATE INDEX pricehistory_product_idx ON market_app_pricehistory (product_id, changed_at)',
+    'CREATE TABLE market_app_pricehistory_default PARTITION OF market_app_pricehistory DEFAULT',
+)
+
+
+def create_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(apps.get_model('market_app', 'PriceHistory'))
+        return
+    for statement in CREATE_PARTITIONED_TABLE:
+        schema_editor.execute(statement)
+    # секции на текущий и два следующих месяца, дальше их создает задача
+    # maintain_price_history_partitions
+    start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(3):
+        end = (start + timedelta(days=32)).replace(day=1)
+        schema_editor.execute(
+            f'CREATE TABLE market_app_pricehistory_y{start:%Y}m{start:%m} '
+            f'PARTITION OF market_app_pricehistory FOR VALUES FROM (%s) TO (%s)',
+            [start.isoformat(), end.isoformat()]
+        )
+        start = end
+
+
+def drop_table(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model('market_app', 'PriceHistory'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0008_orderitem_shop'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PriceHistory',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена')),
+                        ('price_rrc', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='РРЦ')),
+                        ('changed_at', models.DateTimeField(verbose_name='Изменена')),
+                        ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='market_app.product', verbose_name='Товар')),
+                    ],
+                    options={
+                        'verbose_name': 'Изменение цены',
+                        'verbose_name_plural': 'История цен',
+                        'indexes': [models.Index(fields=['product', 'changed_at'], name='pricehistory_product_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_table, drop_table),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0009_pricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('products_count', models.PositiveIntegerField(default=0, verbose_name='Товаров')),
+                ('total_quantity', models.BigIntegerField(default=0, verbose_name='Остаток')),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Стоимость остатка')),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Сумма цен')),
+                ('price_rrc_sum', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Сумма РРЦ')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='market_app.category', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Статистика категории',
+                'verbose_name_plural': 'Статистика категорий',
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopStats',
+            fields=[
+                ('products_count', models.PositiveIntegerField(default=0, verbose_name='Товаров')),
+                ('total_quantity', models.BigIntegerField(default=0, verbose_name='Остаток')),
+                ('stock_value', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Стоимость остатка')),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Сумма цен')),
+                ('price_rrc_sum', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Сумма РРЦ')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='market_app.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Статистика магазина',
+                'verbose_name_plural': 'Статистика магазинов',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0010_catalogue_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceListImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='SHA-256 файла')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('completed', 'Завершен'), ('failed', 'Ошибка'), ('superseded', 'Заменен новой загрузкой')], default='queued', max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Загружен')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начат')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершен')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_list_imports', to='market_app.shop', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Импорт прайс-листа',
+                'verbose_name_plural': 'Импорты прайс-листов',
+                'indexes': [models.Index(fields=['shop', 'content_hash'], name='pricelistimport_hash_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ('queued', 'running'))), fields=('shop', 'content_hash'), name='pricelistimport_in_flight_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0011_pricelistimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='В продаже'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='seen_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Был в прайс-листе'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['id'], name='product_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['shop', 'seen_at'], name='product_shop_seen_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_parameters(apps, schema_editor):
+    # update_or_create без уникального индекса мог создать дубли при параллельных импортах;
+    # остается последнее значение
+    ProductParameter = apps.get_model('market_app', 'ProductParameter')
+    keep = ProductParameter.objects.values('product_id', 'parameter_id').annotate(keep=Max('id')).values('keep')
+    ProductParameter.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0012_product_is_active'),
+    ]
+
+    operations = [
+        # составной индекс создается до удаления глобального, чтобы импорт
+        # ни в какой момент не работал без уникальности
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('shop', 'external_id'), name='product_shop_external_id_uniq'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='external_id',
+            field=models.PositiveIntegerField(verbose_name='Внешний идентификатор'),
+        ),
+        migrations.RunPython(drop_duplicate_parameters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productparameter',
+            constraint=models.UniqueConstraint(fields=('product', 'parameter'), name='productparameter_uniq'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0013_product_shop_identity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductRecommendations',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendations', serialize=False, to='market_app.product', verbose_name='Товар')),
+                ('neighbours', models.JSONField(default=list, verbose_name='Рекомендации')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Рекомендации товара',
+                'verbose_name_plural': 'Рекомендации товаров',
+            },
+        ),
+    ]
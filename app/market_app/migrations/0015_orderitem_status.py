@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0014_product_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='status',
+            field=models.CharField(blank=True, choices=[('basket', 'Корзина'), ('confirmed', 'Подтвержден'), ('in_progress', 'Собирается'), ('shipping', 'Передан в доставку'), ('completed', 'Завершен'), ('canceled', 'Отменен')], default='', max_length=20, verbose_name='Статус'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_app', '0015_orderitem_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricelistimport',
+            name='full',
+            field=models.BooleanField(default=True, verbose_name='Полный прайс-лист'),
+        ),
+    ]
@@ -68,7 +68,8 @@ class ShopCategory(models.Model):
     external_id = models.PositiveIntegerField(verbose_name='Внешний идентификатор')
     
 class Product(models.Model):
-    external_id = models.PositiveIntegerField(verbose_name='Внешний идентификатор', unique=True)
+    # идентификатор товара в прайс-листе поставщика, уникален в пределах магазина
+    external_id = models.PositiveIntegerField(verbose_name='Внешний идентификатор')
     name = models.CharField(verbose_name='Название', max_length=255)
     model = models.CharField(verbose_name='Модель', max_length=100, blank=True, null=True)
     price = models.DecimalField(
@@ -84,6 +85,9 @@ class Product(models.Model):
         Shop, verbose_name='Поставщик', on_delete=models.CASCADE, related_name='products'
     )
     quantity = models.PositiveIntegerField(verbose_name='Доступное количество')
+    # товары, которых нет в последнем полном прайс-листе магазина, снимаются с продажи
+    is_active = models.BooleanField(verbose_name='В продаже', default=True)
+    seen_at = models.DateTimeField(verbose_name='Был в прайс-листе', blank=True, null=True)
     image = ThumbnailerImageField(
         verbose_name='Изображение', upload_to='app/images/products/', blank=True, null=True,
         resize_source={
@@ -98,6 +102,16 @@ class Product(models.Model):
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = "Товары"
+        indexes = [
+            # каталог читает только товары в продаже, снятые с продажи не раздувают индекс
+            models.Index(fields=['id'], condition=models.Q(is_active=True), name='product_active_idx'),
+            models.Index(
+                fields=['shop', 'seen_at'], condition=models.Q(is_active=True), name='product_shop_seen_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'external_id'], name='product_shop_external_id_uniq'),
+        ]
 
 class Parameter(models.Model):
     name = models.CharField(verbose_name='Название параметра', max_length=255, unique=True)
@@ -124,15 +138,178 @@ class ProductParameter(models.Model):
     class Meta:
         verbose_name = 'Параметр продукта'
         verbose_name_plural = 'Параметры продуктов'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'parameter'], name='productparameter_uniq'),
+        ]
+
+class CatalogueStats(models.Model):
+    """
+    Предрассчитанные агрегаты каталога. Хранятся суммы, средние считаются
+    при чтении. Остаток учитывается вместе с зарезервированным в корзинах
+    товаром, поэтому меняется только при импорте, продаже и отмене заказа.
+    """
+    products_count = models.PositiveIntegerField(verbose_name='Товаров', default=0)
+    total_quantity = models.BigIntegerField(verbose_name='Остаток', default=0)
+    stock_value = models.DecimalField(
+        verbose_name='Стоимость остатка', max_digits=18, decimal_places=2, default=0
+    )
+    price_sum = models.DecimalField(verbose_name='Сумма цен', max_digits=18, decimal_places=2, default=0)
+    price_rrc_sum = models.DecimalField(verbose_name='Сумма РРЦ', max_digits=18, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(verbose_name='Обновлено', auto_now=True)
+
+    @property
+    def avg_price(self):
+        return self.price_sum / self.products_count if self.products_count else None
+
+    @property
+    def avg_price_rrc(self):
+        return self.price_rrc_sum / self.products_count if self.products_count else None
+
+    @property
+    def price_to_rrc(self):
+        # средняя цена относительно средней РРЦ
+        return self.price_sum / self.price_rrc_sum if self.price_rrc_sum else None
+
+    class Meta:
+        abstract = True
+
+class CategoryStats(CatalogueStats):
+    category = models.OneToOneField(
+        Category, verbose_name='Категория', on_delete=models.CASCADE, primary_key=True,
+        related_name='stats'
+    )
+
+    def __str__(self):
+        return f'{self.category}: {self.products_count}'
+
+    class Meta:
+        verbose_name = 'Статистика категории'
+        verbose_name_plural = 'Статистика категорий'
+
+class ShopStats(CatalogueStats):
+    shop = models.OneToOneField(
+        Shop, verbose_name='Магазин', on_delete=models.CASCADE, primary_key=True,
+        related_name='stats'
+    )
+
+    def __str__(self):
+        return f'{self.shop}: {self.products_count}'
+
+    class Meta:
+        verbose_name = 'Статистика магазина'
+        verbose_name_plural = 'Статистика магазинов'
+
+class ProductRecommendations(models.Model):
+    """
+    Товары, которые чаще всего покупают вместе с товаром: top-K соседей по
+    числу общих заказов. Пересчитываются периодической задачей (recommendations.py).
+    """
+    product = models.OneToOneField(
+        Product, verbose_name='Товар', on_delete=models.CASCADE, primary_key=True,
+        related_name='recommendations'
+    )
+    # [[id товара, число общих заказов], ...] по убыванию числа заказов
+    neighbours = models.JSONField(verbose_name='Рекомендации', default=list)
+    updated_at = models.DateTimeField(verbose_name='Обновлено', auto_now=True)
+
+    def __str__(self):
+        return f'{self.product_id}: {len(self.neighbours)}'
+
+    class Meta:
+        verbose_name = 'Рекомендации товара'
+        verbose_name_plural = 'Рекомендации товаров'
+
+class PriceHistory(models.Model):
+    """
+    Журнал изменений цен, только добавление. Запись создается при импорте,
+    если цена или РРЦ товара изменились. На PostgreSQL таблица секционирована
+    по месяцам changed_at (см. pricehistory.py).
+    """
+    product = models.ForeignKey(
+        Product, verbose_name='Товар', on_delete=models.CASCADE, related_name='price_history',
+        db_index=False
+    )
+    price = models.DecimalField(verbose_name='Цена', max_digits=10, decimal_places=2)
+    price_rrc = models.DecimalField(verbose_name='РРЦ', max_digits=10, decimal_places=2)
+    changed_at = models.DateTimeField(verbose_name='Изменена')
+
+    def __str__(self):
+        return f'{self.product_id}: {self.price} ({self.price_rrc}) с {self.changed_at.strftime("%d.%m.%Y %H:%M")}'
+
+    class Meta:
+        verbose_name = 'Изменение цены'
+        verbose_name_plural = 'История цен'
+        indexes = [
+            models.Index(fields=['product', 'changed_at'], name='pricehistory_product_idx'),
+        ]
+
+class PriceListImport(models.Model):
+    """
+    Загрузка прайс-листа магазином. Загрузки одного магазина с одинаковым
+    содержимым объединяются, новая полная загрузка заменяет еще не начатые
+    старые, частичная встает в очередь за ними.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('completed', 'Завершен'),
+        ('failed', 'Ошибка'),
+        ('superseded', 'Заменен новой загрузкой'),
+    )
+    IN_FLIGHT_STATUSES = ('queued', 'running')
+    shop = models.ForeignKey(
+        Shop, verbose_name='Магазин', on_delete=models.CASCADE, related_name='price_list_imports'
+    )
+    content_hash = models.CharField(verbose_name='SHA-256 файла', max_length=64)
+    # полный прайс-лист снимает с продажи товары магазина, которых в нем нет
+    full = models.BooleanField(verbose_name='Полный прайс-лист', default=True)
+    status = models.CharField(
+        verbose_name='Статус', max_length=20, choices=STATUS_CHOICES, default='queued'
+    )
+    created_at = models.DateTimeField(verbose_name='Загружен', auto_now_add=True)
+    started_at = models.DateTimeField(verbose_name='Начат', blank=True, null=True)
+    finished_at = models.DateTimeField(verbose_name='Завершен', blank=True, null=True)
+
+    def __str__(self):
+        return f'Импорт №{self.id} магазина {self.shop_id} - {self.status}'
+
+    class Meta:
+        verbose_name = 'Импорт прайс-листа'
+        verbose_name_plural = 'Импорты прайс-листов'
+        indexes = [
+            models.Index(fields=['shop', 'content_hash'], name='pricelistimport_hash_idx'),
+        ]
+        constraints = [
+            # одна и та же загрузка не может стоять в очереди или выполняться дважды
+            models.UniqueConstraint(
+                fields=['shop', 'content_hash'], condition=models.Q(status__in=('queued', 'running')),
+                name='pricelistimport_in_flight_uniq'
+            ),
+        ]
 
 class Order(models.Model):
     STATUS_CHOICES = (
         ('basket', 'Корзина'),
+        ('confirmed', 'Подтвержден'),
         ('in_progress', 'Собирается'),
         ('shipping', 'Передан в доставку'),
         ('completed', 'Завершен'),
         ('canceled', 'Отменен'),
     )
+    # Допустимые переходы статусов: из корзины заказ переводит покупатель,
+    # дальше заказ ведет магазин
+    TRANSITIONS = {
+        'basket': ('confirmed',),
+        'confirmed': ('in_progress', 'canceled'),
+        'in_progress': ('shipping', 'canceled'),
+        'shipping': ('completed',),
+        'completed': (),
+        'canceled': (),
+    }
+    SHOP_STATUSES = ('in_progress', 'shipping', 'completed', 'canceled')
+    # Порядок статусов выполнения: заказ из позиций нескольких магазинов
+    # находится в самом раннем статусе среди неотмененных позиций
+    PROGRESS = ('confirmed', 'in_progress', 'shipping', 'completed')
     user = models.ForeignKey(
         User, verbose_name='Пользователь', on_delete=models.CASCADE
     )
@@ -145,9 +322,18 @@ class Order(models.Model):
     def __str__(self):
         return f'Заказ №{self.id} от {self.created_at.strftime("%d.%m.%Y %H:%M")} - {self.status}'
 
+    @classmethod
+    def sources_for(cls, status):
+        """Статусы, из которых разрешен переход в status."""
+        return [source for source, targets in cls.TRANSITIONS.items() if status in targets]
+
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            # ленты заказов упорядочены по (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='order_updated_id_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(
@@ -157,6 +343,42 @@ class OrderItem(models.Model):
         Product, verbose_name='Товар', on_delete=models.CASCADE
     )
     quantity = models.PositiveIntegerField(verbose_name='Количество')
+    # магазин товара, денормализован для выборки заказов магазина без join с товарами
+    shop = models.ForeignKey(
+        Shop, verbose_name='Магазин', on_delete=models.CASCADE, related_name='order_items',
+        editable=False, db_index=False
+    )
+    # статус позиций, который ведет магазин; пустой - позиция следует статусу заказа
+    status = models.CharField(
+        verbose_name='Статус', max_length=20, choices=Order.STATUS_CHOICES, blank=True, default=''
+    )
+
+    def save(self, *args, **kwargs):
+        self.shop_id = self.product.shop_id
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shop', 'order'], name='orderitem_shop_order_idx'),
+        ]
+
+class StockReservation(models.Model):
+    order_item = models.OneToOneField(
+        OrderItem, verbose_name='Позиция заказа', on_delete=models.SET_NULL,
+        related_name='reservation', blank=True, null=True
+    )
+    product = models.ForeignKey(
+        Product, verbose_name='Товар', on_delete=models.CASCADE, related_name='reservations'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='Зарезервировано')
+    expires_at = models.DateTimeField(verbose_name='Действует до', db_index=True)
+
+    def __str__(self):
+        return f'{self.product}: {self.quantity} до {self.expires_at.strftime("%d.%m.%Y %H:%M")}'
+
+    class Meta:
+        verbose_name = 'Резерв товара'
+        verbose_name_plural = 'Резервы товаров'
 
 class Contact(models.Model):
     user = models.ForeignKey(
@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+from django.utils import timezone
+
+from .models import Order, OrderItem, Product
+from . import stats
+from .tasks import notify_order_transitions
+
+
+def shop_orders(shop):
+    """Заказы, в которых есть позиции магазина shop."""
+    return Order.objects.filter(Exists(OrderItem.objects.filter(order=OuterRef('pk'), shop=shop)))
+
+
+def order_statuses(order_ids):
+    """
+    Статусы заказов по статусам их позиций: самый ранний статус среди
+    неотмененных позиций, или canceled, если отменены все. Позиции без
+    своего статуса учитываются со статусом заказа.
+    """
+    statuses = defaultdict(set)
+    for order_id, item_status, order_status in OrderItem.objects.filter(order_id__in=order_ids).values_list(
+        'order_id', 'status', 'order__status'
+    ):
+        statuses[order_id].add(item_status or order_status)
+    result = {}
+    for order_id, values in statuses.items():
+        active = values - {'canceled'}
+        result[order_id] = min(active, key=Order.PROGRESS.index) if active else 'canceled'
+    return result
+
+
+def shop_feed(shop):
+    """
+    Заказы, содержащие товары магазина, кроме корзин. Позиции магазина
+    подгружаются в shop_items. Выборка идет по индексу (shop, order) позиций.
+    """
+    return Order.objects.filter(
+        id__in=OrderItem.objects.filter(shop=shop).values('order_id')
+    ).exclude(status='basket').select_related('user').prefetch_related(
+        Prefetch(
+            'order_items', queryset=OrderItem.objects.filter(shop=shop).select_related('product'),
+            to_attr='shop_items'
+        )
+    )
+
+
+def transition(shop, order_ids, status):
+    """
+    Переводит позиции магазина в заказах order_ids в статус status. Заказ из
+    позиций нескольких магазинов каждый магазин ведет отдельно, статус заказа
+    пересчитывается по позициям (order_statuses). Заказы, позиции магазина в
+    которых в статусе, из которого переход запрещен, пропускаются. Уведомления
+    покупателям отправляются пачками по ORDER_EVENTS_BATCH_SIZE. Возвращает
+    (переведенные, отклоненные) id.
+    """
+    sources = Order.sources_for(status)
+    with transaction.atomic():
+        locked = {
+            order_id: (order_status, email)
+            for order_id, order_status, email in shop_orders(shop).filter(id__in=order_ids)
+            .exclude(status__in=('basket', 'completed', 'canceled'))
+            .select_for_update(of=('self',)).values_list('id', 'status', 'user__email')
+        }
+        # позиции магазина в заказе переходят вместе, поэтому статус у них общий
+        shop_statuses = dict(
+            OrderItem.objects.filter(order_id__in=locked, shop=shop).values_list('order_id', 'status')
+        )
+        events = []
+        for order_id, (order_status, email) in locked.items():
+            source = shop_statuses[order_id] or order_status
+            if source in sources:
+                events.append([order_id, email, source, status])
+        updated = [order_id for order_id, *_ in events]
+        OrderItem.objects.filter(order_id__in=updated, shop=shop).update(status=status)
+        if status == 'canceled':
+            restock(updated, shop)
+
+        by_status = defaultdict(list)
+        for order_id, order_status in order_statuses(updated).items():
+            by_status[order_status].append(order_id)
+        now = timezone.now()
+        for order_status, ids in by_status.items():
+            Order.objects.filter(id__in=ids).update(status=order_status, updated_at=now)
+
+    batch_size = settings.ORDER_EVENTS_BATCH_SIZE
+    for start in range(0, len(events), batch_size):
+        notify_order_transitions.delay(events[start:start + batch_size])
+
+    updated_set = set(updated)
+    rejected = [order_id for order_id in order_ids if order_id not in updated_set]
+    return updated, rejected
+
+
+def restock(order_ids, shop):
+    """Возвращает на склад товар магазина из отмененных заказов. Вызывается внутри transaction.atomic()."""
+    returned = defaultdict(int)
+    for product_id, quantity in OrderItem.objects.filter(order_id__in=order_ids, shop=shop).values_list(
+        'product_id', 'quantity'
+    ):
+        returned[product_id] += quantity
+    products = Product.objects.select_for_update().in_bulk(returned)
+    for product_id, product in products.items():
+        product.quantity += returned[product_id]
+    Product.objects.bulk_update(products.values(), ['quantity'])
+    stats.apply_stock_changes(products, returned)
@@ -0,0 +1,39 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц в админке: на PostgreSQL количество строк
+    берется из оценки планировщика (EXPLAIN) вместо полного COUNT(*).
+    Точный COUNT выполняется, только если оценка меньше порога.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and connections[queryset.db].vendor == 'postgresql':
+            plan = json.loads(queryset.explain(format='json'))
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+            if estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class ShopOrderCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация ленты заказов магазина по (updated_at, id): страница
+    выбирается условием по индексу, без OFFSET и COUNT. Измененные заказы
+    перемещаются в конец ленты, поэтому опрос с последнего курсора или
+    с since возвращает только новые изменения.
+    """
+    ordering = ('updated_at', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,26 @@
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import ORJSONRenderer, orjson
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser на orjson, без orjson работает как стандартный парсер."""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if codecs.lookup(encoding).name != 'utf-8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,111 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import PriceHistory
+
+logger = logging.getLogger(__name__)
+
+TABLE = PriceHistory._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+CENTS = Decimal('0.01')
+INTERVALS = ('hour', 'day', 'week', 'month')
+
+
+def to_price(value):
+    """Цена из прайс-листа в том виде, в котором ее хранит DecimalField."""
+    return Decimal(str(value)).quantize(CENTS)
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(moment):
+    return month_start(month_start(moment) + timedelta(days=32))
+
+
+def _create_partition(cursor, name, start, end):
+    # Пока секции месяца нет, его изменения цен попадают в секцию DEFAULT, и
+    # PostgreSQL не создаст секцию поверх них: строки месяца переносятся в нее.
+    # Блокировка DEFAULT не дает новым строкам месяца попасть туда до переноса
+    bounds = [start.isoformat(), end.isoformat()]
+    cursor.execute(f'LOCK TABLE {DEFAULT_PARTITION} IN ACCESS EXCLUSIVE MODE')
+    cursor.execute(f'CREATE TEMPORARY TABLE {name}_moved (LIKE {TABLE})')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE changed_at >= %s AND changed_at < %s '
+        f'RETURNING *) INSERT INTO {name}_moved SELECT * FROM moved',
+        bounds
+    )
+    cursor.execute(f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)', bounds)
+    cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {name}_moved')
+    cursor.execute(f'DROP TABLE {name}_moved')
+
+
+def ensure_partitions(months_ahead=2, now=None):
+    """
+    Создает месячные секции таблицы истории цен на текущий и months_ahead
+    следующих месяцев, перенося в них строки, успевшие попасть в секцию
+    DEFAULT. Каждая секция создается в своей точке сохранения: ошибка
+    записывается в лог и не мешает остальным. На других СУБД ничего не
+    делает. Возвращает имена созданных секций.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    start = month_start(now or timezone.now())
+    created = []
+    for _ in range(months_ahead + 1):
+        end = next_month(start)
+        name = f'{TABLE}_y{start:%Y}m{start:%m}'
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SELECT to_regclass(%s)', [name])
+                if cursor.fetchone()[0] is None:
+                    _create_partition(cursor, name, start, end)
+                    created.append(name)
+        except DatabaseError:
+            logger.exception('Не удалось создать секцию %s истории цен', name)
+        start = end
+    return created
+
+
+def record_changes(previous, imported, changed_at=None):
+    """
+    Пишет одной пачкой изменения цен после импорта.
+    previous: {id товара: (цена, РРЦ)} до импорта, imported: {id товара: (цена, РРЦ)}
+    из прайс-листа. Новые товары попадают в историю с начальной ценой.
+    """
+    changed_at = changed_at or timezone.now()
+    entries = [
+        PriceHistory(product_id=product_id, price=price, price_rrc=price_rrc, changed_at=changed_at)
+        for product_id, (price, price_rrc) in imported.items()
+        if previous.get(product_id) != (price, price_rrc)
+    ]
+    PriceHistory.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def series(product, interval='day', date_from=None, date_to=None):
+    """
+    Прореженный ряд цен товара: одна точка на интервал со статистикой
+    изменений за интервал. Условие по changed_at позволяет PostgreSQL
+    читать только нужные месячные секции.
+    """
+    queryset = PriceHistory.objects.filter(product=product)
+    if date_from is not None:
+        queryset = queryset.filter(changed_at__gte=date_from)
+    if date_to is not None:
+        queryset = queryset.filter(changed_at__lt=date_to)
+    return queryset.annotate(period=Trunc('changed_at', interval)).values('period').annotate(
+        min_price=Min('price'),
+        max_price=Max('price'),
+        avg_price=Avg('price'),
+        min_price_rrc=Min('price_rrc'),
+        max_price_rrc=Max('price_rrc'),
+        changes=Count('id'),
+    ).order_by('period')
@@ -0,0 +1,349 @@
+import csv
+import hashlib
+import io
+import json
+import os
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import yaml
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .renderers import orjson
+
+from .models import PriceListImport, Product, Shop
+
+PRICE_LIMIT = Decimal(10) ** (
+    Product._meta.get_field('price').max_digits - Product._meta.get_field('price').decimal_places
+)
+# C-реализация загрузчика в несколько раз быстрее, если PyYAML собран с libyaml
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+json_loads = orjson.loads if orjson is not None else json.loads
+NAME_LENGTH = Product._meta.get_field('name').max_length
+MODEL_LENGTH = Product._meta.get_field('model').max_length
+
+
+class PriceListError(Exception):
+    """Прайс-лист не прошел проверку; errors - все найденные ошибки."""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def content_hash(file, full=True):
+    # полная и частичная загрузка одного файла - разные импорты
+    digest = hashlib.sha256(b'' if full else b'partial:')
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _check_price(value):
+    if isinstance(value, bool):
+        return 'должна быть числом'
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        return 'должна быть числом'
+    if not price.is_finite() or price < 0:
+        return 'должна быть неотрицательным числом'
+    if price.quantize(Decimal('0.01')) >= PRICE_LIMIT:
+        return f'должна быть меньше {PRICE_LIMIT}'
+    return None
+
+
+def validate(data):
+    """
+    Проверяет весь прайс-лист за один проход, не обращаясь к БД: структуру,
+    типы полей, цены и ссылки товаров на категории из самого прайс-листа.
+    Возвращает список ошибок (не больше PRICE_LIST_MAX_ERRORS), пустой для
+    корректного прайс-листа.
+    """
+    errors = []
+
+    def error(path, message):
+        errors.append(f'{path}: {message}')
+        return len(errors) >= settings.PRICE_LIST_MAX_ERRORS
+
+    if not isinstance(data, dict):
+        return ['прайс-лист должен быть словарем с ключами categories и goods']
+    categories = data.get('categories', [])
+    goods = data.get('goods', [])
+    if not isinstance(categories, list):
+        error('categories', 'должен быть списком')
+        categories = []
+    if not isinstance(goods, list):
+        error('goods', 'должен быть списком')
+        goods = []
+
+    category_ids = set()
+    for i, category in enumerate(categories):
+        path = f'categories[{i}]'
+        if not isinstance(category, dict):
+            stop = error(path, 'должна быть словарем')
+        elif not _is_int(category.get('id')) or category['id'] < 0:
+            stop = error(f'{path}.id', 'должен быть неотрицательным целым числом')
+        elif category['id'] in category_ids:
+            stop = error(f'{path}.id', f'категория {category["id"]} указана дважды')
+        elif not isinstance(category.get('name'), str) or not category['name'].strip():
+            stop = error(f'{path}.name', 'обязательное поле')
+        else:
+            category_ids.add(category['id'])
+            continue
+        if stop:
+            return errors
+
+    product_ids = set()
+    for i, item in enumerate(goods):
+        path = f'goods[{i}]'
+        if not isinstance(item, dict):
+            if error(path, 'должен быть словарем'):
+                return errors
+            continue
+        problems = []
+        product_id = item.get('id')
+        if not _is_int(product_id) or product_id < 0:
+            problems.append(('id', 'должен быть неотрицательным целым числом'))
+        elif product_id in product_ids:
+            problems.append(('id', f'товар {product_id} указан дважды'))
+        else:
+            product_ids.add(product_id)
+        if item.get('category') not in category_ids:
+            problems.append(('category', f'категории {item.get("category")} нет в разделе categories'))
+        name = item.get('name')
+        if not isinstance(name, str) or not name.strip():
+            problems.append(('name', 'обязательное поле'))
+        elif len(name) > NAME_LENGTH:
+            problems.append(('name', f'длиннее {NAME_LENGTH} символов'))
+        model = item.get('model')
+        if model is not None and (not isinstance(model, str) or len(model) > MODEL_LENGTH):
+            problems.append(('model', f'должна быть строкой не длиннее {MODEL_LENGTH} символов'))
+        for field in ('price', 'price_rrc'):
+            message = _check_price(item.get(field))
+            if message:
+                problems.append((field, message))
+        quantity = item.get('quantity', 0)
+        if not _is_int(quantity) or quantity < 0:
+            problems.append(('quantity', 'должно быть неотрицательным целым числом'))
+        parameters = item.get('parameters', {})
+        if not isinstance(parameters, dict) or any(
+            isinstance(value, (dict, list)) for value in parameters.values()
+        ):
+            problems.append(('parameters', 'должны быть словарем \'название: значение\''))
+        for field, message in problems:
+            if error(f'{path}.{field}', message):
+                return errors
+    return errors
+
+
+def parse_yaml(file):
+    """Прайс-лист в YAML с разделами categories и goods (формат выгрузки export_yaml)."""
+    return yaml.load(file, Loader=YamlLoader)
+
+
+def _flat_rows_to_data(rows):
+    """
+    Собирает прайс-лист из плоских строк товаров, в которых категория задана
+    колонками category и category_name. Разные названия одной категории
+    попадают в categories дважды, и проверка сообщит о них.
+    """
+    categories = {}
+    goods = []
+    for row in rows:
+        category_name = row.pop('category_name', None)
+        names = categories.setdefault(row.get('category'), [])
+        if category_name not in names:
+            names.append(category_name)
+        goods.append(row)
+    return {
+        'categories': [
+            {'id': category_id, 'name': name}
+            for category_id, names in categories.items() for name in names
+        ],
+        'goods': goods,
+    }
+
+
+def parse_jsonl(file):
+    """
+    JSON Lines: по товару в строке, поля как в goods YAML-прайс-листа плюс
+    category_name. Строки разбираются по мере чтения файла.
+    """
+    def rows():
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                try:
+                    yield json_loads(line)
+                except ValueError as exc:
+                    raise PriceListError([f'строка {number}: {exc}'])
+    return _flat_rows_to_data(rows())
+
+
+def _csv_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def parse_csv(file):
+    """
+    CSV с заголовком (формат выгрузки export_csv): id, category, category_name,
+    name, model, price, price_rrc, quantity и parameters в виде JSON.
+    """
+    def rows():
+        text = io.TextIOWrapper(getattr(file, 'file', file), encoding='utf-8-sig', newline='')
+        try:
+            yield from parse_rows(csv.DictReader(text))
+        finally:
+            # загруженный файл закрывает Django, а не обертка
+            text.detach()
+
+    def parse_rows(reader):
+        for row in reader:
+            parameters = row.get('parameters') or '{}'
+            try:
+                parameters = json_loads(parameters)
+            except ValueError:
+                raise PriceListError([f'строка {reader.line_num}.parameters: некорректный JSON'])
+            yield {
+                **row,
+                'id': _csv_int(row.get('id')),
+                'category': _csv_int(row.get('category')),
+                'quantity': _csv_int(row.get('quantity') or 0),
+                'parameters': parameters,
+            }
+    return _flat_rows_to_data(rows())
+
+
+def get_parser(filename):
+    """Парсер из PRICE_LIST_PARSERS по расширению файла или None."""
+    extension = os.path.splitext(filename)[1].lower()
+    path = settings.PRICE_LIST_PARSERS.get(extension)
+    return import_string(path) if path else None
+
+
+def parse(file):
+    """
+    Разбирает загруженный файл парсером, выбранным по расширению, и проверяет
+    результат, см. validate. Парсер - функция, принимающая бинарный файл и
+    возвращающая словарь с categories и goods; подключается в PRICE_LIST_PARSERS.
+    """
+    parser = get_parser(file.name)
+    if parser is None:
+        raise PriceListError([f'неподдерживаемый формат файла {file.name}'])
+    try:
+        data = parser(file)
+    except (UnicodeDecodeError, ValueError, yaml.YAMLError, csv.Error) as exc:
+        raise PriceListError([f'файл не разобран: {exc}'])
+    errors = validate(data)
+    if errors:
+        raise PriceListError(errors)
+    return data
+
+
+def _expire_stale(shop_id, now):
+    # Импорт, оборвавшийся по жесткому лимиту времени, больше не считается выполняющимся
+    PriceListImport.objects.filter(
+        shop_id=shop_id, status='running',
+        started_at__lt=now - timedelta(seconds=settings.PRICE_LIST_IMPORT_TIMEOUT)
+    ).update(status='failed', finished_at=now)
+
+
+def _duplicate_of(shop_id, digest, full, now):
+    in_flight = PriceListImport.objects.filter(
+        shop_id=shop_id, content_hash=digest, full=full, status__in=PriceListImport.IN_FLIGHT_STATUSES
+    ).first()
+    if in_flight is not None:
+        return in_flight
+    # Завершенный импорт считается дубликатом, только если после него магазин
+    # не загружал другой файл: повторная загрузка старого файла - это откат
+    latest = PriceListImport.objects.filter(shop_id=shop_id).exclude(
+        status='superseded'
+    ).order_by('-created_at').first()
+    if (
+        latest is not None and latest.content_hash == digest and latest.full == full
+        and latest.status == 'completed'
+        and latest.finished_at >= now - timedelta(seconds=settings.PRICE_LIST_DEDUP_SECONDS)
+    ):
+        return latest
+    return None
+
+
+def submit(shop, file, full=True):
+    """
+    Ставит прайс-лист в очередь импорта. Возвращает (импорт, создан ли новый).
+
+    Если такой же файл магазина уже в очереди, выполняется или был импортирован
+    не раньше PRICE_LIST_DEDUP_SECONDS назад, возвращается существующий импорт
+    и файл не разбирается. Некорректный файл отклоняется с PriceListError до
+    постановки в очередь. Полный (full) прайс-лист снимает с продажи товары
+    магазина, которых в нем нет, поэтому заменяет еще не начатые импорты
+    магазина; частичный только обновляет товары и встает в очередь за ними.
+    """
+    from .tasks import update_products_from_data
+
+    digest = content_hash(file, full)
+    now = timezone.now()
+    _expire_stale(shop.id, now)
+    duplicate = _duplicate_of(shop.id, digest, full, now)
+    if duplicate is not None:
+        return duplicate, False
+
+    data = parse(file)
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                if full:
+                    PriceListImport.objects.filter(shop=shop, status='queued').update(
+                        status='superseded', finished_at=now
+                    )
+                job = PriceListImport.objects.create(shop=shop, content_hash=digest, full=full)
+                transaction.on_commit(lambda: update_products_from_data.delay(data, shop.id, job.id, full))
+        except IntegrityError:
+            # Параллельная загрузка того же файла успела создать импорт. Если он
+            # уже завершился ошибкой или заменен, файл ставится в очередь заново
+            duplicate = _duplicate_of(shop.id, digest, full, timezone.now())
+            if duplicate is not None:
+                return duplicate, False
+            if attempt:
+                raise
+            continue
+        return job, True
+
+
+def claim(import_id, shop_id):
+    """
+    Переводит импорт в статус running. Возвращает False, если импорт заменен
+    новой загрузкой, и None, если у магазина уже выполняется другой импорт или
+    в очереди стоит более ранний: импорты магазина выполняются по порядку загрузки.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # блокировка магазина сериализует проверку выполняющихся импортов
+        Shop.objects.select_for_update().filter(id=shop_id).first()
+        _expire_stale(shop_id, now)
+        if PriceListImport.objects.filter(shop_id=shop_id).filter(
+            Q(status='running') | Q(status='queued', id__lt=import_id)
+        ).exists():
+            return None
+        return bool(
+            PriceListImport.objects.filter(id=import_id, status='queued')
+            .update(status='running', started_at=now)
+        )
+
+
+def finish(import_id, status, current='running'):
+    PriceListImport.objects.filter(id=import_id, status=current).update(
+        status=status, finished_at=timezone.now()
+    )
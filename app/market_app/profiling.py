@@ -0,0 +1,176 @@
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('market_app.queries')
+
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+# Служебные команды транзакций не считаются повторяющимися запросами
+_TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def normalize_sql(sql):
+    """Приводит SQL к шаблону: литералы и параметры заменяются на ?, списки IN сворачиваются."""
+    sql = _SAVEPOINT.sub('?', sql)
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryInspector:
+    """
+    Перехватывает запросы ко всем БД и группирует их по нормализованному SQL.
+    Используется как контекстный менеджер, в middleware и в тестах.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.patterns = defaultdict(lambda: {'count': 0, 'time': 0.0, 'sql': None})
+        self.slow = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.total_time += duration
+            pattern = self.patterns[normalize_sql(sql)]
+            pattern['count'] += 1
+            pattern['time'] += duration
+            if pattern['sql'] is None:
+                pattern['sql'] = sql
+            if duration * 1000 >= settings.QUERY_INSPECTOR_SLOW_MS:
+                self.slow.append((sql, duration))
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        self._stack = None
+
+    def repeated(self, threshold):
+        """Шаблоны, выполненные не меньше threshold раз: признак N+1."""
+        return sorted(
+            (
+                (sql, data['count']) for sql, data in self.patterns.items()
+                if data['count'] >= threshold and not sql.startswith(_TRANSACTION_CONTROL)
+            ),
+            key=lambda item: -item[1],
+        )
+
+    def report(self, threshold):
+        lines = [f'Запросов: {self.count}, время: {self.total_time * 1000:.1f} мс']
+        for sql, count in self.repeated(threshold):
+            lines.append(f'  повторяется {count} раз: {sql}')
+        for sql, duration in self.slow:
+            lines.append(f'  медленный ({duration * 1000:.1f} мс): {sql}')
+        return '\n'.join(lines)
+
+
+class QueryInspectorMiddleware:
+    """
+    В режиме разработки пишет в лог запросы, повторяющиеся внутри одного
+    HTTP-запроса (N+1), медленные запросы и превышение общего бюджета.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_INSPECTOR_ENABLED:
+            return self.get_response(request)
+        with QueryInspector() as inspector:
+            response = self.get_response(request)
+        threshold = settings.QUERY_INSPECTOR_REPEAT_THRESHOLD
+        if (
+            inspector.repeated(threshold)
+            or inspector.slow
+            or inspector.count > settings.QUERY_INSPECTOR_MAX_QUERIES
+        ):
+            logger.warning('%s %s\n%s', request.method, request.path, inspector.report(threshold))
+        response['X-Query-Count'] = str(inspector.count)
+        return response
+
+
+class QueryBudgetMixin:
+    """Проверки бюджета запросов для тестов."""
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, repeat_threshold=None):
+        if repeat_threshold is None:
+            repeat_threshold = settings.QUERY_INSPECTOR_REPEAT_THRESHOLD
+        with QueryInspector() as inspector:
+            yield inspector
+        errors = []
+        if inspector.count > max_queries:
+            errors.append(f'превышен бюджет запросов: {inspector.count} > {max_queries}')
+        if inspector.repeated(repeat_threshold):
+            errors.append(f'повторяющиеся запросы (порог {repeat_threshold})')
+        if errors:
+            self.fail('; '.join(errors) + '\n' + inspector.report(repeat_threshold))
+
+
+class SamplingProfiler:
+    """
+    Статистический профилировщик: фоновый поток раз в interval секунд снимает
+    стек профилируемого потока и считает одинаковые стеки. Накладные расходы
+    не зависят от числа вызовов функций, в отличие от cProfile.
+    Результат - folded stacks для flamegraph.pl и speedscope.
+    """
+
+    def __init__(self, interval=0.005, thread=None):
+        self.interval = interval
+        self.thread_id = (thread or threading.current_thread()).ident
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                name = getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+                stack.append(f'{frame.f_globals.get("__name__", "?")}:{name}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+
+    def write_folded(self, file):
+        """Пишет стеки строками 'функция;функция;... число_срезов'."""
+        for stack, count in self.stacks.most_common():
+            file.write(f'{stack} {count}\n')
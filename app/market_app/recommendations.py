@@ -0,0 +1,98 @@
+from datetime import timedelta
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .models import OrderItem, ProductRecommendations
+
+# Модуль нужен только воркеру: веб-процессы читают готовые ProductRecommendations
+# и не загружают numpy и scipy
+
+# заказы, которые покупатель оформил; корзины и отмененные заказы не учитываются
+SOLD_STATUSES = ('confirmed', 'in_progress', 'shipping', 'completed')
+
+
+def order_product_pairs(since=None, chunk_size=10000):
+    """Массив (n, 2) пар (заказ, товар) оформленных заказов с товарами в продаже."""
+    items = OrderItem.objects.filter(order__status__in=SOLD_STATUSES, product__is_active=True)
+    if since is not None:
+        items = items.filter(order__created_at__gte=since)
+    rows = items.order_by().values_list('order_id', 'product_id').iterator(chunk_size=chunk_size)
+    return np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+
+
+def co_occurrence(pairs):
+    """
+    Возвращает (id товаров, C), где C[i, j] - число заказов, в которых
+    куплены оба товара i и j (диагональ обнулена), в формате CSR.
+    """
+    orders, order_index = np.unique(pairs[:, 0], return_inverse=True)
+    products, product_index = np.unique(pairs[:, 1], return_inverse=True)
+    baskets = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.int32), (order_index, product_index)),
+        shape=(len(orders), len(products))
+    )
+    # повторные позиции одного товара в заказе считаются одной покупкой
+    baskets.data[:] = 1
+    matrix = (baskets.T @ baskets).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    return products, matrix
+
+
+def top_neighbours(products, matrix, top_k, min_support=1):
+    """
+    Для каждого товара с соседями отдает (id товара, [[id соседа, число
+    общих заказов], ...]) - не больше top_k соседей по убыванию числа заказов.
+    """
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        counts, columns = matrix.data[start:end], matrix.indices[start:end]
+        keep = counts >= min_support
+        counts, columns = counts[keep], columns[keep]
+        if not len(counts):
+            continue
+        if len(counts) > top_k:
+            # порог - число заказов k-го соседа; равные ему остаются до сортировки
+            threshold = -np.partition(-counts, top_k - 1)[top_k - 1]
+            keep = counts >= threshold
+            counts, columns = counts[keep], columns[keep]
+        neighbours = products[columns]
+        # при равном числе заказов порядок по id, чтобы результат был стабильным
+        order = np.lexsort((neighbours, -counts))[:top_k]
+        yield int(products[row]), [[int(neighbours[i]), int(counts[i])] for i in order]
+
+
+def build(top_k=None, min_support=None, days=None, batch_size=1000):
+    """
+    Пересчитывает рекомендации «покупают вместе» всех товаров по заказам за
+    последние days дней: корзины собираются в разреженную матрицу заказы ×
+    товары B, совместные покупки C = BᵀB считаются одним умножением, для
+    каждого товара сохраняются top_k соседей.
+    Рекомендации товаров, у которых больше нет соседей, удаляются.
+    Возвращает число товаров с рекомендациями.
+    """
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    min_support = min_support or settings.RECOMMENDATIONS_MIN_SUPPORT
+    days = days or settings.RECOMMENDATIONS_DAYS
+    started = timezone.now()
+    pairs = order_product_pairs(since=started - timedelta(days=days))
+    rows = []
+    if len(pairs):
+        products, matrix = co_occurrence(pairs)
+        rows = [
+            ProductRecommendations(product_id=product_id, neighbours=neighbours)
+            for product_id, neighbours in top_neighbours(products, matrix, top_k, min_support)
+        ]
+    with transaction.atomic():
+        ProductRecommendations.objects.bulk_create(
+            rows, batch_size=batch_size,
+            update_conflicts=True, unique_fields=['product'], update_fields=['neighbours', 'updated_at']
+        )
+        # auto_now проставляет время записи, поэтому старше started только устаревшие строки
+        ProductRecommendations.objects.filter(updated_at__lt=started).delete()
+    return len(rows)
@@ -0,0 +1,45 @@
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson.
+
+    datetime, date, time, Decimal и другие типы, которые orjson кодирует
+    по-своему, передаются в JSONEncoder DRF, поэтому вывод совпадает со
+    стандартным рендерером. Без orjson, при запросе отступов и для данных,
+    которые orjson не поддерживает (например, целые больше 64 бит),
+    используется стандартный рендерер.
+    """
+    if orjson is not None:
+        options = (
+            orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_NON_STR_KEYS
+        )
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if orjson is None or self.ensure_ascii or not self.compact or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Как и стандартный рендерер, экранируем \u2028 и \u2029
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
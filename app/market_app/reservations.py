@@ -0,0 +1,149 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Product, StockReservation
+from . import stats
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product, available):
+        super().__init__(f'Недостаточно товара на складе, в наличии {available}')
+        self.product = product
+        self.available = available
+
+
+class ProductUnavailable(Exception):
+    def __init__(self, product):
+        super().__init__(f'Товар «{product.name}» снят с продажи')
+        self.product = product.id
+
+
+def reservations_enabled():
+    return bool(settings.CART_RESERVATION_TTL)
+
+
+def hold(order_item, quantity):
+    """
+    Резервирует quantity единиц товара под позицию корзины на CART_RESERVATION_TTL
+    секунд. Остаток уменьшается атомарным условным UPDATE, поэтому при
+    конкуренции покупатели получают отказ сразу, а не на подтверждении заказа.
+    Вызывается внутри transaction.atomic().
+    """
+    reservation = StockReservation.objects.select_for_update().filter(order_item=order_item).first()
+    held = reservation.quantity if reservation is not None else 0
+    delta = quantity - held
+    products = Product.objects.filter(pk=order_item.product_id)
+    if delta > 0 and not products.filter(quantity__gte=delta).update(quantity=F('quantity') - delta):
+        available = products.values_list('quantity', flat=True).first() or 0
+        raise InsufficientStock(order_item.product_id, available + held)
+    if delta < 0:
+        products.update(quantity=F('quantity') - delta)
+
+    expires_at = timezone.now() + timedelta(seconds=settings.CART_RESERVATION_TTL)
+    if reservation is None:
+        StockReservation.objects.create(
+            order_item=order_item, product_id=order_item.product_id,
+            quantity=quantity, expires_at=expires_at
+        )
+    else:
+        reservation.quantity = quantity
+        reservation.expires_at = expires_at
+        reservation.save(update_fields=['quantity', 'expires_at'])
+
+
+def release(order_item):
+    """Снимает резерв позиции корзины и возвращает товар на склад."""
+    reservation = StockReservation.objects.select_for_update().filter(order_item=order_item).first()
+    if reservation is None:
+        return
+    Product.objects.filter(pk=reservation.product_id).update(
+        quantity=F('quantity') + reservation.quantity
+    )
+    reservation.delete()
+
+
+def commit(items):
+    """
+    Списывает товар по позициям подтверждаемого заказа. Зарезервированное
+    количество уже списано со склада, поэтому списывается только разница.
+    Строки товаров блокируются одним запросом, остатки обновляются одним
+    bulk_update. Вызывается внутри transaction.atomic().
+    """
+    reservations = StockReservation.objects.select_for_update().filter(order_item__in=items)
+    held = {reservation.order_item_id: reservation.quantity for reservation in reservations}
+    products = Product.objects.select_for_update().in_bulk({item.product_id for item in items})
+    sold = defaultdict(int)
+    for item in items:
+        product = products[item.product_id]
+        if not product.is_active:
+            raise ProductUnavailable(product)
+        needed = item.quantity - held.get(item.id, 0)
+        if needed > product.quantity:
+            raise InsufficientStock(product.id, product.quantity + held.get(item.id, 0))
+        product.quantity -= needed
+        sold[product.id] -= item.quantity
+    Product.objects.bulk_update(products.values(), ['quantity'])
+    stats.apply_stock_changes(products, sold)
+    StockReservation.objects.filter(order_item__in=items).delete()
+
+
+def withhold(product_ids):
+    """
+    Вычитает действующие резервы из остатков, только что записанных из
+    прайс-листа: прайс-лист сообщает весь остаток магазина, а товар в
+    резервах уже списан со склада. Если резервов больше, чем товара в
+    прайс-листе, уменьшаются самые новые: недостающее количество их позиции
+    проверят при подтверждении заказа. Вызывается внутри transaction.atomic()
+    после записи остатков, которая блокирует строки товаров.
+    """
+    reservations = defaultdict(list)
+    for reservation in (
+        StockReservation.objects.select_for_update().filter(product_id__in=product_ids).order_by('id')
+    ):
+        reservations[reservation.product_id].append(reservation)
+    if not reservations:
+        return
+    products = Product.objects.in_bulk(reservations)
+    trimmed, dropped = [], []
+    for product_id, held in reservations.items():
+        product = products[product_id]
+        for reservation in held:
+            kept = min(reservation.quantity, product.quantity)
+            product.quantity -= kept
+            if not kept:
+                dropped.append(reservation.id)
+            elif kept < reservation.quantity:
+                reservation.quantity = kept
+                trimmed.append(reservation)
+    Product.objects.bulk_update(products.values(), ['quantity'])
+    StockReservation.objects.bulk_update(trimmed, ['quantity'])
+    StockReservation.objects.filter(id__in=dropped).delete()
+
+
+def release_expired(batch_size=1000):
+    """Возвращает на склад товар из просроченных резервов. Возвращает количество снятых резервов."""
+    released = 0
+    now = timezone.now()
+    while True:
+        with transaction.atomic():
+            expired = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=now)
+                .values_list('id', 'product_id', 'quantity')[:batch_size]
+            )
+            if not expired:
+                return released
+            returned = defaultdict(int)
+            for _, product_id, quantity in expired:
+                returned[product_id] += quantity
+            products = Product.objects.select_for_update().in_bulk(returned)
+            for product_id, product in products.items():
+                product.quantity += returned[product_id]
+            Product.objects.bulk_update(products.values(), ['quantity'])
+            StockReservation.objects.filter(id__in=[row[0] for row in expired]).delete()
+        released += len(expired)
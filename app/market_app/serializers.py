@@ -1,9 +1,29 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+
+from django.conf import settings
 from rest_framework import serializers
-from django.db.models import F, Sum
 
-from .models import Product, Category, Order, OrderItem, Contact, Shop, User, ProductParameter
+from .models import (
+    Product, Category, Order, OrderItem, Contact, Shop, User, ProductParameter, CategoryStats,
+    ShopStats
+)
+from .metrics import serializer_timer
+from .pricelist import get_parser
+
 
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
 
+class TimedSerializerMixin:
+    """Учитывает время сериализации верхнего уровня в метриках запроса."""
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
 
 class ShopSerializer(serializers.ModelSerializer):
 
@@ -11,7 +31,7 @@ class ShopSerializer(serializers.ModelSerializer):
         model = Shop
         fields = ('name', )
 
-class CreateUserSerializer(serializers.ModelSerializer):
+class CreateUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=8)
     shop = ShopSerializer(required=False)
     role = serializers.CharField(required=False)
@@ -55,7 +75,7 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ('name',)
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     parameters = ProductParameterSerializer(many=True, required=False)
     category = CategorySerializer()
     shop = ShopSerializer()
@@ -63,6 +83,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
+        list_serializer_class = TimedListSerializer
         fields = (
             'id',
             'external_id',
@@ -81,18 +102,67 @@ class ProductSerializer(serializers.ModelSerializer):
 class PriceListUploadSerializer(serializers.Serializer):
 
     file = serializers.FileField()
+    # частичный прайс-лист обновляет только перечисленные товары, не снимая остальные с продажи
+    partial = serializers.BooleanField(default=False)
 
     def validate_file(self, value):
-        if not value.name.endswith('.yml') and not value.name.endswith('.yaml'):
+        if get_parser(value.name) is None:
             raise serializers.ValidationError('Неверное расширение файла')
         return value
 
-class ContactSerializer(serializers.ModelSerializer):
+class PriceHistoryQuerySerializer(serializers.Serializer):
+    interval = serializers.ChoiceField(choices=('hour', 'day', 'week', 'month'), default='day')
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False)
+
+class PriceHistoryPointSerializer(serializers.Serializer):
+    period = serializers.DateTimeField()
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    avg_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    min_price_rrc = serializers.DecimalField(max_digits=10, decimal_places=2)
+    max_price_rrc = serializers.DecimalField(max_digits=10, decimal_places=2)
+    changes = serializers.IntegerField()
+
+class CatalogueStatsSerializer(serializers.ModelSerializer):
+    avg_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    avg_price_rrc = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    price_to_rrc = serializers.DecimalField(max_digits=6, decimal_places=4, read_only=True)
+
+    class Meta:
+        fields = (
+            'products_count', 'total_quantity', 'stock_value', 'avg_price', 'avg_price_rrc',
+            'price_to_rrc', 'updated_at'
+        )
+
+class CategoryStatsSerializer(CatalogueStatsSerializer):
+    name = serializers.CharField(source='category.name')
+
+    class Meta(CatalogueStatsSerializer.Meta):
+        model = CategoryStats
+        fields = ('category', 'name') + CatalogueStatsSerializer.Meta.fields
+
+class ShopStatsSerializer(CatalogueStatsSerializer):
+    name = serializers.CharField(source='shop.name')
+
+    class Meta(CatalogueStatsSerializer.Meta):
+        model = ShopStats
+        fields = ('shop', 'name') + CatalogueStatsSerializer.Meta.fields
+
+class OrderTransitionSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False,
+        max_length=settings.ORDER_TRANSITION_MAX_BATCH
+    )
+    status = serializers.ChoiceField(choices=Order.SHOP_STATUSES)
+
+class ContactSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     building = serializers.CharField(required=False)
     flat = serializers.IntegerField(required=False)
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
     class Meta:
         model = Contact
+        list_serializer_class = TimedListSerializer
         fields = (
             'id',
             'user',
@@ -111,15 +181,132 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ('product', 'quantity', 'price')
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     order_items = OrderItemSerializer(many=True)
     total_price = serializers.SerializerMethodField()
     class Meta:
         model = Order
+        list_serializer_class = TimedListSerializer
         fields = ('id', 'status', 'created_at', 'updated_at', 'total_price', 'order_items')
 
     def get_total_price(self, obj):
-        total = obj.order_items.aggregate(
-            total=Sum(F('quantity') * F('product__price'))
-        )['total']
-        return float(total) if total else 0.0
\ No newline at end of file
+        # позиции заказа подгружаются во вью через prefetch_related,
+        # поэтому сумма считается без отдельного запроса на каждый заказ
+        total = sum(item.quantity * item.product.price for item in obj.order_items.all())
+        return float(total) if total else 0.0
+
+class ShopOrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Заказ в ленте магазина: только позиции этого магазина (shop_items)."""
+    order_items = OrderItemSerializer(many=True, source='shop_items')
+    user = serializers.EmailField(source='user.email')
+    shop_status = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        list_serializer_class = TimedListSerializer
+        fields = ('id', 'user', 'status', 'shop_status', 'created_at', 'updated_at', 'order_items')
+
+    def get_shop_status(self, obj) -> str:
+        # статус, в котором позиции магазина; у позиций магазина он общий
+        return obj.shop_items[0].status or obj.status
+
+
+class FastReadSerializer(ABC):
+    """
+    Быстрое представление списков только для чтения: словари строятся из
+    .values() без интроспекции полей DRF. Значения приводятся теми же полями
+    DRF, поэтому JSON совпадает с выводом обычного сериализатора.
+    Наследник задает values_fields и to_representation.
+    """
+    values_fields = ()
+
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+
+    @classmethod
+    def prepare(cls, queryset):
+        return queryset.prefetch_related(None).values(*cls.values_fields)
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return self.to_representation(list(self.rows))
+
+    @abstractmethod
+    def to_representation(self, rows):
+        """Список словарей ответа по строкам .values(*values_fields)."""
+
+
+class FastProductSerializer(FastReadSerializer):
+    """Выдает то же, что ProductSerializer(many=True)."""
+    values_fields = (
+        'id', 'external_id', 'image', 'name', 'model', 'category__name', 'shop__name',
+        'price', 'price_rrc', 'quantity'
+    )
+    decimal = serializers.DecimalField(max_digits=10, decimal_places=2).to_representation
+    image_storage = Product._meta.get_field('image').storage
+
+    def to_representation(self, rows):
+        parameters = defaultdict(list)
+        parameter_rows = ProductParameter.objects.filter(
+            product_id__in=[row['id'] for row in rows]
+        ).order_by('id').values_list('product_id', 'parameter__name', 'value')
+        for product_id, name, value in parameter_rows:
+            parameters[product_id].append({'name': name, 'value': value})
+
+        request = self.context.get('request')
+        decimal = self.decimal
+        result = []
+        for row in rows:
+            image = row['image']
+            if image:
+                image = self.image_storage.url(image)
+                if request is not None:
+                    image = request.build_absolute_uri(image)
+            else:
+                image = None
+            result.append({
+                'id': row['id'],
+                'external_id': row['external_id'],
+                'image': image,
+                'name': row['name'],
+                'model': row['model'],
+                'category': {'name': row['category__name']},
+                'shop': {'name': row['shop__name']},
+                'price': decimal(row['price']),
+                'price_rrc': decimal(row['price_rrc']),
+                'quantity': row['quantity'],
+                'parameters': parameters[row['id']],
+            })
+        return result
+
+
+class FastOrderSerializer(FastReadSerializer):
+    """Выдает то же, что OrderSerializer(many=True)."""
+    values_fields = ('id', 'status', 'created_at', 'updated_at')
+    decimal = serializers.DecimalField(max_digits=10, decimal_places=2).to_representation
+    datetime = serializers.DateTimeField().to_representation
+
+    def to_representation(self, rows):
+        items = defaultdict(list)
+        totals = defaultdict(int)
+        item_rows = OrderItem.objects.filter(
+            order_id__in=[row['id'] for row in rows]
+        ).order_by('id').values_list('order_id', 'product__name', 'quantity', 'product__price')
+        for order_id, name, quantity, price in item_rows:
+            items[order_id].append({'product': name, 'quantity': quantity, 'price': self.decimal(price)})
+            totals[order_id] += quantity * price
+
+        datetime = self.datetime
+        return [
+            {
+                'id': row['id'],
+                'status': row['status'],
+                'created_at': datetime(row['created_at']),
+                'updated_at': datetime(row['updated_at']),
+                'total_price': float(totals[row['id']]) if totals[row['id']] else 0.0,
+                'order_items': items[row['id']],
+            }
+            for row in rows
+        ]
@@ -1,6 +1,10 @@
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Product, User
+from rest_framework.authtoken.models import Token
+from .auth import TOKEN_CACHE_KEY
+from . import dictionaries
+from .models import Product, User, Parameter, Category, ShopCategory
 from .tasks import generate_thumbnails
 
 @receiver(post_save, sender=Product)
@@ -11,4 +15,18 @@ def process_product_image(sender, instance, **kwargs):
 @receiver(post_save, sender=User)
 def process_user_image(sender, instance, **kwargs):
     if instance.image:
-        generate_thumbnails.delay(instance.image.path)
\ No newline at end of file
+        generate_thumbnails.delay(instance.image.path)
+
+@receiver(post_delete, sender=Token)
+def drop_cached_token(sender, instance, **kwargs):
+    cache.delete(TOKEN_CACHE_KEY.format(instance.user_id))
+
+@receiver(post_save, sender=Parameter)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Parameter)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=ShopCategory)
+def invalidate_import_dictionaries(sender, created=False, **kwargs):
+    # новые записи словари импорта подхватят сами, устаревают только измененные и удаленные
+    if not created:
+        dictionaries.invalidate()
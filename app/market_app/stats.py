@@ -0,0 +1,99 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    BigIntegerField, Case, Count, DecimalField, ExpressionWrapper, F, Sum, Value, When
+)
+from django.utils import timezone
+
+from .models import CategoryStats, Product, ShopStats, StockReservation
+
+STATS_FIELDS = ('products_count', 'total_quantity', 'stock_value', 'price_sum', 'price_rrc_sum', 'updated_at')
+STATS_MODELS = {'category': CategoryStats, 'shop': ShopStats}
+
+
+def _value(quantity, price):
+    return ExpressionWrapper(F(quantity) * F(price), output_field=DecimalField(max_digits=18, decimal_places=2))
+
+
+def _aggregate(key, ids):
+    """Агрегаты товаров (с учетом резервов) в разрезе key для ключей ids или всех, если ids is None."""
+    # статистика каталога учитывает только товары в продаже
+    products = Product.objects.filter(is_active=True)
+    reserved = StockReservation.objects.filter(product__is_active=True)
+    if ids is not None:
+        products = products.filter(**{f'{key}_id__in': ids})
+        reserved = reserved.filter(**{f'product__{key}_id__in': ids})
+
+    rows = {}
+    for row in products.values(f'{key}_id').annotate(
+        products_count=Count('id'),
+        total_quantity=Sum('quantity'),
+        stock_value=Sum(_value('quantity', 'price')),
+        price_sum=Sum('price'),
+        price_rrc_sum=Sum('price_rrc'),
+    ).order_by():
+        rows[row.pop(f'{key}_id')] = row
+    for row in reserved.values(f'product__{key}_id').annotate(
+        reserved_quantity=Sum('quantity'), reserved_value=Sum(_value('quantity', 'product__price'))
+    ).order_by():
+        stats = rows.get(row[f'product__{key}_id'])
+        if stats is not None:
+            stats['total_quantity'] += row['reserved_quantity']
+            stats['stock_value'] += row['reserved_value']
+    return rows
+
+
+def refresh(shop_ids=None, category_ids=None):
+    """
+    Пересчитывает статистику указанных магазинов и категорий (всех, если
+    передано None) одним сгруппированным запросом на каждый разрез.
+    Используется импортом прайс-листа и периодической задачей.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        for key, ids in (('shop', shop_ids), ('category', category_ids)):
+            model = STATS_MODELS[key]
+            if ids is not None and not ids:
+                continue
+            rows = _aggregate(key, ids)
+            stale = model.objects.all() if ids is None else model.objects.filter(pk__in=ids)
+            stale.exclude(pk__in=list(rows)).delete()
+            model.objects.bulk_create(
+                [model(**{f'{key}_id': pk}, **row, updated_at=now) for pk, row in rows.items()],
+                update_conflicts=True, unique_fields=[key], update_fields=STATS_FIELDS
+            )
+
+
+def apply_stock_changes(products, changes):
+    """
+    Инкрементально меняет остатки в статистике при продаже и отмене заказа.
+    products: {id: Product}, changes: {id товара: изменение количества}.
+    Выполняет по одному UPDATE на таблицу статистики магазинов и категорий.
+    """
+    deltas = {key: defaultdict(lambda: [0, Decimal(0)]) for key in STATS_MODELS}
+    for product_id, quantity in changes.items():
+        product = products.get(product_id)
+        if product is None or not product.is_active:
+            continue
+        for key in STATS_MODELS:
+            delta = deltas[key][getattr(product, f'{key}_id')]
+            delta[0] += quantity
+            delta[1] += quantity * product.price
+    now = timezone.now()
+    for key, model in STATS_MODELS.items():
+        changed = {pk: delta for pk, delta in deltas[key].items() if delta[0]}
+        if not changed:
+            continue
+        model.objects.filter(pk__in=changed).update(
+            total_quantity=F('total_quantity') + Case(
+                *(When(pk=pk, then=Value(quantity)) for pk, (quantity, _) in changed.items()),
+                output_field=BigIntegerField()
+            ),
+            stock_value=F('stock_value') + Case(
+                *(When(pk=pk, then=Value(value)) for pk, (_, value) in changed.items()),
+                output_field=DecimalField(max_digits=18, decimal_places=2)
+            ),
+            updated_at=now,
+        )
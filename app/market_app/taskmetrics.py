@@ -0,0 +1,157 @@
+import logging
+import time
+
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun
+from django.conf import settings
+from django_redis import get_redis_connection
+from kombu.exceptions import ChannelError, OperationalError
+from redis.exceptions import RedisError
+
+
+logger = logging.getLogger(__name__)
+
+# Ожидание в очереди: от секунд для уведомлений до десятков минут для импорта
+WAIT_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0)
+
+METRICS_KEY = 'celery:task_metrics'
+FIELDS = ('count', 'wait_count', 'wait_sum', 'runtime_sum', 'failures')
+
+_started = {}
+
+
+def _labels(task):
+    delivery_info = task.request.delivery_info or {}
+    return delivery_info.get('routing_key') or settings.CELERY_TASK_DEFAULT_QUEUE, task.name
+
+
+def _increment(fields):
+    try:
+        client = get_redis_connection()
+        pipeline = client.pipeline(transaction=False)
+        for field, value in fields.items():
+            pipeline.hincrbyfloat(METRICS_KEY, field, value)
+        pipeline.execute()
+    except (NotImplementedError, RedisError):
+        # Метрики не должны влиять на выполнение задач
+        logger.warning('Не удалось записать метрики задач', exc_info=True)
+
+
+@before_task_publish.connect
+def mark_published(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+@task_prerun.connect
+def task_started(task_id=None, task=None, **kwargs):
+    if task.request.is_eager:
+        return
+    _started[task_id] = time.perf_counter()
+    queue, name = _labels(task)
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at is None:
+        return
+    wait = max(time.time() - published_at, 0.0)
+    fields = {f'{queue}|{name}|wait_count': 1, f'{queue}|{name}|wait_sum': wait}
+    for i, bound in enumerate(WAIT_BUCKETS):
+        if wait <= bound:
+            fields[f'{queue}|{name}|wait_bucket_{i}'] = 1
+            break
+    _increment(fields)
+
+
+@task_postrun.connect
+def task_finished(task_id=None, task=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is None:
+        return
+    queue, name = _labels(task)
+    _increment({
+        f'{queue}|{name}|count': 1,
+        f'{queue}|{name}|runtime_sum': time.perf_counter() - started,
+    })
+
+
+@task_failure.connect
+def task_failed(sender=None, **kwargs):
+    if sender is None or sender.request.is_eager:
+        return
+    queue, name = _labels(sender)
+    _increment({f'{queue}|{name}|failures': 1})
+
+
+def snapshot():
+    """Метрики задач всех воркеров в разрезе очереди и задачи."""
+    raw = get_redis_connection().hgetall(METRICS_KEY)
+    series = {}
+    for field, value in raw.items():
+        queue, name, metric = field.decode().split('|')
+        labels = series.setdefault((queue, name), {
+            **{key: 0.0 for key in FIELDS}, 'buckets': [0] * len(WAIT_BUCKETS),
+        })
+        if metric.startswith('wait_bucket_'):
+            labels['buckets'][int(metric.rsplit('_', 1)[1])] = int(float(value))
+        else:
+            labels[metric] = float(value)
+    return series
+
+
+def queue_depths(app):
+    """Количество сообщений, ожидающих в каждой очереди брокера."""
+    depths = {}
+    with app.connection_for_read() as connection:
+        channel = connection.default_channel
+        for queue in app.conf.task_queues:
+            try:
+                depths[queue.name] = channel.queue_declare(queue=queue.name, passive=True).message_count
+            except ChannelError:
+                # Очередь еще не создана: в нее ничего не отправляли
+                depths[queue.name] = 0
+    return depths
+
+
+def render_prometheus(app):
+    """Глубина очередей и задержка задач в текстовом формате Prometheus."""
+    if app.conf.task_always_eager:
+        return ''
+    lines = []
+    try:
+        depths = queue_depths(app)
+    except OperationalError:
+        logger.warning('Брокер недоступен, глубина очередей не собрана', exc_info=True)
+    else:
+        lines += [
+            '# HELP market_celery_queue_depth Сообщений в очереди',
+            '# TYPE market_celery_queue_depth gauge',
+        ]
+        lines += [f'market_celery_queue_depth{{queue="{queue}"}} {depth}' for queue, depth in depths.items()]
+
+    try:
+        series = snapshot()
+    except (NotImplementedError, RedisError):
+        logger.warning('Не удалось прочитать метрики задач', exc_info=True)
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    lines += [
+        '# HELP market_celery_task_wait_seconds Время от отправки задачи до начала выполнения',
+        '# TYPE market_celery_task_wait_seconds histogram',
+    ]
+    for (queue, name), values in series.items():
+        labels = f'queue="{queue}",task="{name}"'
+        cumulative = 0
+        for bound, count in zip(WAIT_BUCKETS, values['buckets']):
+            cumulative += count
+            lines.append(f'market_celery_task_wait_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'market_celery_task_wait_seconds_bucket{{{labels},le="+Inf"}} {int(values["wait_count"])}')
+        lines.append(f'market_celery_task_wait_seconds_sum{{{labels}}} {values["wait_sum"]}')
+        lines.append(f'market_celery_task_wait_seconds_count{{{labels}}} {int(values["wait_count"])}')
+
+    for metric, name, description in (
+        ('count', 'market_celery_tasks_total', 'Выполненных задач'),
+        ('runtime_sum', 'market_celery_task_runtime_seconds_total', 'Суммарное время выполнения задач'),
+        ('failures', 'market_celery_task_failures_total', 'Задач, завершившихся ошибкой'),
+    ):
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        for (queue, task), values in series.items():
+            lines.append(f'{name}{{queue="{queue}",task="{task}"}} {values[metric]}')
+    return '\n'.join(lines) + '\n'
@@ -1,49 +1,128 @@
 from celery import shared_task
-from django.core.mail import send_mail
+from django.conf import settings
+from django.core.mail import send_mail, send_mass_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from easy_thumbnails.files import generate_all_aliases
 from easy_thumbnails.exceptions import InvalidImageFormatError
 
 from market_api_service.settings import EMAIL_HOST_USER
-from .models import Category, Product, ShopCategory, ProductParameter, Parameter
+from .models import Product, ProductParameter, Order
+from .dictionaries import ImportDictionaries
+from .reservations import release_expired, withhold
+from . import pricehistory, pricelist, stats
 
 
-@shared_task
-def update_products_from_data(data, shop_id):
-    
+@shared_task(bind=True)
+def update_products_from_data(self, data, shop_id, import_id=None, full=True):
+    """
+    Импорт прайс-листа магазина. Полный прайс-лист (full) снимает с продажи
+    товары магазина, которых в нем нет; частичный только обновляет товары.
+    """
+    if import_id is None:
+        # загрузки через API проверяются до постановки в очередь
+        errors = pricelist.validate(data)
+        if errors:
+            raise pricelist.PriceListError(errors)
+        return _import_products(data, shop_id, full)
+
+    claimed = pricelist.claim(import_id, shop_id)
+    if claimed is None:
+        # другой импорт магазина еще выполняется или раньше встал в очередь и
+        # обновляет те же товары. Выполняющимся дольше
+        # PRICE_LIST_IMPORT_TIMEOUT импорт не считается, поэтому
+        # повторов хватает, чтобы его дождаться, а затем импорт отклоняется
+        max_retries = settings.PRICE_LIST_IMPORT_TIMEOUT // settings.PRICE_LIST_IMPORT_RETRY_DELAY + 1
+        if self.request.retries >= max_retries:
+            pricelist.finish(import_id, 'failed', current='queued')
+            return
+        raise self.retry(countdown=settings.PRICE_LIST_IMPORT_RETRY_DELAY, max_retries=max_retries)
+    if not claimed:
+        # заменен более новой загрузкой
+        return
+    try:
+        _import_products(data, shop_id, full)
+    except Exception:
+        pricelist.finish(import_id, 'failed')
+        raise
+    pricelist.finish(import_id, 'completed')
+
+PRODUCT_IMPORT_FIELDS = (
+    'category', 'model', 'name', 'price', 'price_rrc', 'quantity', 'is_active', 'seen_at'
+)
+
+def _import_products(data, shop_id, full=True):
+    started = timezone.now()
+    dictionaries = ImportDictionaries()
     # Импорт категорий
-    for category in data.get('categories', []):
-        cat = Category.objects.get_or_create(name=category['name'])[0]
-        external_id = category.get('id')
-        ShopCategory.objects.get_or_create(shop_id=shop_id, category_id=cat.id, external_id=external_id)  
+    category_mapping = dictionaries.shop_category_ids(shop_id, data.get('categories', []))
 
     # Импорт товаров
     products = data.get('goods', [])
-    for item in products:
-        category_external_id = item.get('category')
-        category_id = Category.objects.filter(shop_categories__external_id=category_external_id).first().id
-        parameters = item.get('parameters', {})
-
-        product = Product.objects.update_or_create(
-            external_id=item['id'],
-            defaults={
-                'category_id': category_id,
-                'shop_id': shop_id,
-                'model': item.get('model', ''),
-                'name': item.get('name'),
-                'price': item.get('price'),
-                'price_rrc': item.get('price_rrc'),
-                'quantity': item.get('quantity', 0)
-            }
-        )[0]
-
-        # Импорт параметров
-        for key, value in parameters.items():
-            parameter=Parameter.objects.get_or_create(name=key)[0]
-            ProductParameter.objects.update_or_create(
-                product=product,
-                parameter=parameter,
-                defaults={'value': value}
+    parameter_ids = dictionaries.parameter_ids(
+        {key for item in products for key in item.get('parameters', {})}
+    )
+    previous = {}
+    imported = {}
+    category_ids = set()
+    for offset in range(0, len(products), settings.IMPORT_CHUNK_SIZE):
+        chunk = products[offset:offset + settings.IMPORT_CHUNK_SIZE]
+        # цены до импорта, для записи изменений в историю
+        for product_id, price, price_rrc, category_id in Product.objects.filter(
+            shop_id=shop_id, external_id__in=[item['id'] for item in chunk]
+        ).values_list('id', 'price', 'price_rrc', 'category_id'):
+            previous[product_id] = (price, price_rrc)
+            category_ids.add(category_id)
+
+        with transaction.atomic():
+            # Товары и их параметры обновляются одним upsert на пачку по уникальным
+            # (shop, external_id) и (product, parameter)
+            rows = Product.objects.bulk_create(
+                [
+                    Product(
+                        shop_id=shop_id,
+                        external_id=item['id'],
+                        category_id=category_mapping[item.get('category')],
+                        model=item.get('model', ''),
+                        name=item.get('name'),
+                        price=item.get('price'),
+                        price_rrc=item.get('price_rrc'),
+                        quantity=item.get('quantity', 0),
+                        is_active=True,
+                        seen_at=started,
+                    )
+                    for item in chunk
+                ],
+                update_conflicts=True, unique_fields=['shop', 'external_id'], update_fields=PRODUCT_IMPORT_FIELDS
             )
+            # upsert перезаписал остатки вместе с зарезервированным в корзинах товаром
+            withhold([product.id for product in rows])
+            ProductParameter.objects.bulk_create(
+                [
+                    ProductParameter(product=product, parameter_id=parameter_ids[key], value=value)
+                    for product, item in zip(rows, chunk)
+                    for key, value in item.get('parameters', {}).items()
+                ],
+                update_conflicts=True, unique_fields=['product', 'parameter'], update_fields=['value']
+            )
+        for product, item in zip(rows, chunk):
+            category_ids.add(product.category_id)
+            imported[product.id] = (
+                pricehistory.to_price(item.get('price')), pricehistory.to_price(item.get('price_rrc'))
+            )
+
+    if full:
+        # товары, не обновленные этим импортом, снимаются с продажи одним UPDATE
+        delisted = Product.objects.filter(
+            Q(seen_at__lt=started) | Q(seen_at__isnull=True), shop_id=shop_id, is_active=True
+        )
+        category_ids.update(delisted.order_by().values_list('category_id', flat=True).distinct())
+        delisted.update(is_active=False)
+
+    pricehistory.record_changes(previous, imported)
+    # статистика пересчитывается только для затронутых магазина и категорий
+    stats.refresh(shop_ids=[shop_id], category_ids=category_ids)
 
 @shared_task
 def send_email(subject, user_email, message):
@@ -55,6 +134,21 @@ def send_email(subject, user_email, message):
             fail_silently=False,
         )
 
+@shared_task
+def notify_order_transitions(events):
+    """Уведомляет покупателей о смене статуса пачки заказов через одно SMTP-соединение."""
+    labels = dict(Order.STATUS_CHOICES)
+    messages = [
+        (
+            'Статус заказа изменен',
+            f'Статус вашего заказа №{order_id} изменен: {labels[source]} → {labels[status]}.\n',
+            EMAIL_HOST_USER,
+            [user_email],
+        )
+        for order_id, user_email, source, status in events
+    ]
+    return send_mass_mail(messages, fail_silently=False)
+
 @shared_task
 def generate_thumbnails(image_path):
     try:
@@ -62,3 +156,21 @@ def generate_thumbnails(image_path):
         return f"Thumbnails generated for {image_path}"
     except InvalidImageFormatError:
         return f"Invalid image format for {image_path}"
+
+@shared_task
+def release_expired_reservations():
+    return release_expired()
+
+@shared_task
+def maintain_price_history_partitions():
+    return pricehistory.ensure_partitions(settings.PRICE_HISTORY_PARTITIONS_AHEAD)
+
+@shared_task
+def refresh_catalogue_stats():
+    stats.refresh()
+
+@shared_task
+def build_recommendations():
+    # numpy и scipy загружаются только в воркере, который строит рекомендации
+    from .recommendations import build
+    return build()
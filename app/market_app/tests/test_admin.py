@@ -0,0 +1,34 @@
+from django.test import TestCase
+from model_bakery import baker
+
+from market_app.models import User, Product, Order
+from market_app.profiling import QueryBudgetMixin
+
+
+class AdminChangelistTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='securepassword'
+        )
+        self.client.force_login(self.admin)
+
+    def test_product_changelist_without_n_plus_one(self):
+        baker.make(Product, _quantity=5)
+        with self.assertQueryBudget(10):
+            response = self.client.get('/admin/market_app/product/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_product_search(self):
+        phone = baker.make(Product, name='Смартфон', category__name='Телефоны')
+        by_category = baker.make(Product, name='Чехол', category__name='Смартфоны')
+        baker.make(Product, name='Ноутбук', category__name='Ноутбуки')
+        response = self.client.get('/admin/market_app/product/', {'q': 'Смартфон'})
+        self.assertEqual(response.status_code, 200)
+        found = {product.id for product in response.context['cl'].result_list}
+        self.assertEqual(found, {phone.id, by_category.id})
+
+    def test_order_changelist_without_n_plus_one(self):
+        baker.make(Order, _quantity=5)
+        with self.assertQueryBudget(10):
+            response = self.client.get('/admin/market_app/order/')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,68 @@
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+
+from market_app import dictionaries
+from market_app.models import Shop, Product, Parameter, ShopCategory
+from market_app.tasks import update_products_from_data
+
+
+def pricelist(size, categories=("Смартфоны", "Аксессуары")):
+    return {
+        "categories": [{"id": i, "name": name} for i, name in enumerate(categories)],
+        "goods": [
+            {"id": i, "category": i % len(categories), "name": f"Товар {i}", "price": 100, "price_rrc": 120,
+             "quantity": 1, "parameters": {"Цвет": "черный", "Память": f"{i} ГБ", "Вес": i}}
+            for i in range(size)
+        ],
+    }
+
+
+def dictionary_queries(queries):
+    tables = ('"market_app_parameter"', '"market_app_category"', '"market_app_shopcategory"')
+    return [query["sql"] for query in queries if any(table in query["sql"] for table in tables)]
+
+
+class ImportDictionariesTests(TestCase):
+    def test_lookups_do_not_depend_on_size(self):
+        shop = baker.make(Shop)
+        with CaptureQueriesContext(connection) as queries:
+            update_products_from_data(pricelist(30), shop.id)
+        # поиск и создание категорий, связей с магазином и параметров (плюс чтение id созданных)
+        self.assertEqual(len(dictionary_queries(queries)), 7)
+        self.assertEqual(Parameter.objects.count(), 3)
+        self.assertEqual(
+            set(ShopCategory.objects.values_list("external_id", "category__name")),
+            {(0, "Смартфоны"), (1, "Аксессуары")},
+        )
+        self.assertEqual(Product.objects.get(external_id=3).category.name, "Аксессуары")
+
+    def test_category_ids_are_scoped_to_shop(self):
+        other, shop = baker.make(Shop, _quantity=2)
+        update_products_from_data(pricelist(1, categories=("Ноутбуки",)), other.id)
+        Product.objects.all().delete()
+        update_products_from_data(pricelist(1, categories=("Смартфоны",)), shop.id)
+        self.assertEqual(Product.objects.get().category.name, "Смартфоны")
+
+
+class ProcessDictionariesTests(TransactionTestCase):
+    def setUp(self):
+        dictionaries.clear()
+        self.addCleanup(dictionaries.clear)
+        self.shop = baker.make(Shop)
+
+    def test_shared_between_imports(self):
+        update_products_from_data(pricelist(5), self.shop.id)
+        with CaptureQueriesContext(connection) as queries:
+            update_products_from_data(pricelist(5), self.shop.id)
+        self.assertEqual(dictionary_queries(queries), [])
+
+        # переименование сбрасывает словари всех процессов
+        parameter = Parameter.objects.get(name="Цвет")
+        parameter.name = "Цвет корпуса"
+        parameter.save()
+        with CaptureQueriesContext(connection) as queries:
+            update_products_from_data(pricelist(5), self.shop.id)
+        self.assertTrue(dictionary_queries(queries))
+        self.assertEqual(Parameter.objects.filter(name="Цвет").count(), 1)
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+
+import yaml
+from django.test import override_settings
+from model_bakery import baker
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from market_app.models import (
+    User, Shop, Category, ShopCategory, Product, Parameter, ProductParameter
+)
+
+
+@override_settings(CATALOGUE_EXPORT_CHUNK_SIZE=2)
+class CatalogueExportTests(APITestCase):
+    url = "/api/v1/export-pricelist/"
+
+    def setUp(self):
+        self.owner = baker.make(User, role="shop")
+        self.shop = baker.make(Shop, user=self.owner, name="Связной")
+        self.category = baker.make(Category, name="Смартфоны")
+        baker.make(ShopCategory, shop=self.shop, category=self.category, external_id=224)
+        color = baker.make(Parameter, name="Цвет")
+        self.products = [
+            baker.make(
+                Product, shop=self.shop, category=self.category, external_id=4216292 + i,
+                name=f"Смартфон {i}", model="apple/iphone", price=1000 + i, price_rrc=1200, quantity=i
+            )
+            for i in range(5)
+        ]
+        for product in self.products:
+            baker.make(ProductParameter, product=product, parameter=color, value="черный")
+        baker.make(Product)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.owner)}")
+
+    def download(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_yaml_matches_pricelist_format(self):
+        data = yaml.safe_load(self.download())
+        self.assertEqual(data["shop"], "Связной")
+        self.assertEqual(data["categories"], [{"id": 224, "name": "Смартфоны"}])
+        self.assertEqual(len(data["goods"]), 5)
+        self.assertEqual(data["goods"][1], {
+            "id": 4216293, "category": 224, "model": "apple/iphone", "name": "Смартфон 1",
+            "price": 1001.0, "price_rrc": 1200.0, "quantity": 1, "parameters": {"Цвет": "черный"},
+        })
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.download(file_format="csv"))))
+        self.assertEqual([int(row["id"]) for row in rows], [p.external_id for p in self.products])
+        self.assertEqual(json.loads(rows[0]["parameters"]), {"Цвет": "черный"})
+
+    def test_empty_catalogue(self):
+        Product.objects.filter(shop=self.shop).delete()
+        self.assertEqual(yaml.safe_load(self.download())["goods"], [])
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(self.url, {"file_format": "xml"}).status_code, 400)
+
+    def test_only_for_shops(self):
+        client_user = baker.make(User, role="client")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=client_user)}")
+        self.assertEqual(self.client.get(self.url).status_code, 403)
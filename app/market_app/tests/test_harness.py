@@ -0,0 +1,98 @@
+import io
+import tempfile
+import time
+
+from django.core.mail import send_mail
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from market_app import dictionaries
+from market_app.harness import Harness, SMTPSink, load_requests
+from market_app.models import Contact, Order
+from market_app.profiling import SamplingProfiler
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class SMTPSinkTests(SimpleTestCase):
+    def test_receives_mail_through_smtp_backend(self):
+        with SMTPSink() as sink, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=sink.host, EMAIL_PORT=sink.port, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        ):
+            send_mail('Тема', 'Текст', 'shop@localhost', ['user@example.com'])
+        self.assertEqual(sink.messages, 1)
+
+
+class LoadRequestsTests(SimpleTestCase):
+    def test_invalid_record(self):
+        with self.assertRaisesMessage(ValueError, 'строка 3: обязательны строковые поля method и path'):
+            load_requests(io.StringIO('{"method": "GET", "path": "/api/v1/products/"}\n\n{"path": "/"}\n'))
+
+
+class SamplingProfilerTests(SimpleTestCase):
+    def test_folded_stacks(self):
+        with SamplingProfiler(interval=0.001) as profiler:
+            busy_loop(0.1)
+        stack = profiler.stacks.most_common(1)[0][0]
+        self.assertTrue(stack.endswith(f'{__name__}:busy_loop'))
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], QUERY_INSPECTOR_ENABLED=False
+)
+class HarnessTests(TransactionTestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        # импорт вне транзакции пополняет словари процесса id, которые удалит очистка БД
+        self.addCleanup(dictionaries.clear)
+
+    def test_run_mix(self):
+        harness = Harness(seed=1, catalogue_size=10, import_size=5)
+        with SMTPSink() as sink, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=sink.host, EMAIL_PORT=sink.port, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        ):
+            scenarios = harness.run({'browse': 1, 'checkout': 1, 'import': 1}, 6)
+        self.assertEqual(harness.errors, {})
+        self.assertEqual(sum(scenarios.values()), 6)
+        self.assertEqual(Order.objects.filter(status='confirmed').count(), scenarios['checkout'])
+        self.assertEqual(len(harness.timings['сценарий browse']), scenarios['browse'])
+        self.assertIn('задача update_products_from_data', harness.timings)
+        # приветственные письма и подтверждения заказов
+        self.assertEqual(sink.messages, 1 + sum(scenarios.values()) - scenarios['browse'] + scenarios['checkout'])
+
+    def test_replay_recorded_requests(self):
+        records = load_requests(io.StringIO(
+            '{"method": "GET", "path": "/api/v1/products/", "body": {"page": 1}}\n'
+            '{"method": "GET", "path": "/api/v1/products/999999/", "status": 404}\n'
+            '{"method": "POST", "path": "/api/v1/contacts/", "role": "client", "body": '
+            '{"city": "Москва", "street": "Тверская", "house": "1", "phone": "+70000000000"}}\n'
+        ))
+        harness = Harness(seed=1, catalogue_size=10, import_size=5)
+        with SMTPSink() as sink, override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=sink.host, EMAIL_PORT=sink.port, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        ):
+            self.assertEqual(harness.replay(records, 2), {'запись': 6})
+        self.assertEqual(harness.errors, {})
+        self.assertEqual(len(harness.timings['запись: GET /api/v1/products/{id}/']), 2)
+        # запросы роли выполняются от одного пользователя стенда
+        self.assertEqual(Contact.objects.values('user').distinct().count(), 1)
+        self.assertEqual(Contact.objects.count(), 2)
+
+    @override_settings(PERF_HARNESS=False)
+    def test_command_requires_local_settings(self):
+        with self.assertRaises(CommandError):
+            call_command('perf_harness', '--iterations', '1')
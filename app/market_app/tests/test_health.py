@@ -0,0 +1,25 @@
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase
+
+
+class HealthCheckTests(TestCase):
+    def test_healthy(self):
+        response = self.client.get("/health/")
+        self.assertEqual(response.status_code, 200)
+        checks = response.json()["checks"]
+        self.assertEqual(checks["default"]["status"], "ok")
+        self.assertEqual(checks["cache"]["status"], "ok")
+
+    def test_database_unavailable(self):
+        with mock.patch("django.db.backends.utils.CursorWrapper.execute", side_effect=DatabaseError), \
+                self.assertLogs("market_app.views", "ERROR"):
+            response = self.client.get("/health/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["checks"]["default"], {"status": "error"})
+
+    def test_details_only_for_allowed_addresses(self):
+        response = self.client.get("/health/", REMOTE_ADDR="10.0.0.5")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ok"})
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient, APITestCase
+from rest_framework.authtoken.models import Token
+from model_bakery import baker
+
+from market_api_service.sentry import AdaptiveTracesSampler
+from market_app import metrics
+from market_app.metrics import DURATION_BUCKETS
+from market_app.models import User, Product
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class MetricsMiddlewareTests(APITestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        self.client = APIClient()
+        self.user = baker.make(User, role="client", is_active=True)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def test_request_metrics_exported(self):
+        baker.make(Product, _quantity=2)
+        self.client.get("/api/v1/products/")
+
+        snapshot = metrics.registry.snapshot()
+        series = snapshot[("ProductList", "list", "GET")]
+        self.assertEqual(series["count"], 1)
+        self.assertGreater(series["db_queries"], 0)
+        self.assertGreater(series["serializer_time"], 0)
+
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'market_http_requests_total{view="ProductList",action="list",method="GET"} 1', body
+        )
+        self.assertIn('market_http_request_duration_seconds_bucket{view="ProductList"', body)
+        self.assertNotIn('view="metrics_view"', body)
+
+    def test_metrics_forbidden_for_remote_clients(self):
+        response = self.client.get("/metrics/", REMOTE_ADDR="10.0.0.5")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get("/metrics/", HTTP_X_FORWARDED_FOR="127.0.0.1", REMOTE_ADDR="10.0.0.5")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TRUSTED_PROXIES=("10.0.0.2",))
+    def test_metrics_behind_trusted_proxy(self):
+        response = self.client.get("/metrics/", HTTP_X_FORWARDED_FOR="127.0.0.1", REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            "/metrics/", HTTP_X_FORWARDED_FOR="127.0.0.1, 10.0.0.5", REMOTE_ADDR="10.0.0.2"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+@skipUnless(fakeredis, 'требуется fakeredis')
+class SharedMetricsTests(SimpleTestCase):
+    """Два реестра - как два процесса gunicorn с общим Redis."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        patcher = mock.patch("market_app.metrics.get_redis_connection", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_snapshot_sums_processes(self):
+        request = SimpleNamespace(db_queries=2, db_time=0.01, cache_hits=1, cache_misses=0, serializer_time=0.0)
+        first, second = metrics.MetricsRegistry(), metrics.MetricsRegistry()
+        with override_settings(METRICS_FLUSH_INTERVAL=0):
+            first.observe(("ProductList", "list", "GET"), 0.02, request)
+        with override_settings(METRICS_FLUSH_INTERVAL=60):
+            second.observe(("ProductList", "list", "GET"), 0.3, request)
+            # приращения второго процесса еще не записаны
+            self.assertEqual(first.snapshot()[("ProductList", "list", "GET")]["count"], 1)
+            series = second.snapshot()[("ProductList", "list", "GET")]
+        self.assertEqual(series["count"], 2)
+        self.assertEqual(series["db_queries"], 4)
+        self.assertEqual(series["buckets"][DURATION_BUCKETS.index(0.025)], 1)
+        self.assertEqual(series["buckets"][DURATION_BUCKETS.index(0.5)], 1)
+        self.assertAlmostEqual(series["duration"], 0.32)
+
+
+class AdaptiveTracesSamplerTests(SimpleTestCase):
+    def test_rate_drops_under_load(self):
+        sampler = AdaptiveTracesSampler(base_rate=0.5, target_per_second=1, window=10)
+        started = sampler._window_started
+        with mock.patch("market_api_service.sentry.time.monotonic", return_value=started + 1):
+            for _ in range(99):
+                self.assertEqual(sampler({}), 0.5)
+        # 100 запросов за 10 секунд: 10 запросов/с при цели в 1 трассировку/с
+        with mock.patch("market_api_service.sentry.time.monotonic", return_value=started + 10):
+            self.assertAlmostEqual(sampler({}), 0.1)
+
+    def test_parent_decision_and_ignored_paths(self):
+        sampler = AdaptiveTracesSampler(base_rate=0.5, target_per_second=1, ignored_paths=("/metrics/",))
+        self.assertEqual(sampler({"parent_sampled": True}), 1.0)
+        self.assertEqual(sampler({"wsgi_environ": {"PATH_INFO": "/metrics/"}}), 0.0)
+        self.assertEqual(sampler({"wsgi_environ": {"PATH_INFO": "/api/v1/products/"}}), 0.5)
@@ -0,0 +1,155 @@
+from django.core import mail
+from model_bakery import baker
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from market_app.models import User, Shop, Product, Order, OrderItem
+from market_app.profiling import QueryBudgetMixin
+
+
+class ShopOrderTransitionTests(QueryBudgetMixin, APITestCase):
+    url = "/api/v1/shop/orders/transition/"
+
+    def setUp(self):
+        self.owner = baker.make(User, role="shop")
+        self.shop = baker.make(Shop, user=self.owner)
+        self.product = baker.make(Product, shop=self.shop, quantity=10)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.owner)}")
+
+    def make_order(self, status="confirmed", product=None, quantity=1):
+        order = baker.make(Order, status=status, user=baker.make(User))
+        baker.make(OrderItem, order=order, product=product or self.product, quantity=quantity)
+        return order
+
+    def test_bulk_transition(self):
+        orders = [self.make_order() for _ in range(5)]
+        ids = [order.id for order in orders]
+        with self.assertQueryBudget(9):
+            response = self.client.post(self.url, {"order_ids": ids, "status": "in_progress"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data["updated"]), ids)
+        self.assertEqual(response.data["rejected"], [])
+        self.assertEqual(Order.objects.filter(id__in=ids, status="in_progress").count(), 5)
+        # одна пачка уведомлений на все заказы
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertIn("Подтвержден → Собирается", mail.outbox[0].body)
+
+    def test_invalid_transitions_are_rejected(self):
+        confirmed = self.make_order()
+        shipping = self.make_order(status="shipping")
+        basket = self.make_order(status="basket")
+        response = self.client.post(
+            self.url, {"order_ids": [confirmed.id, shipping.id, basket.id], "status": "shipping"}, format="json"
+        )
+        self.assertEqual(response.data["updated"], [])
+        self.assertEqual(response.data["rejected"], [confirmed.id, shipping.id, basket.id])
+
+    def test_orders_of_other_shops_are_rejected(self):
+        foreign = self.make_order(product=baker.make(Product, quantity=10))
+        own = self.make_order()
+        response = self.client.post(
+            self.url, {"order_ids": [foreign.id, own.id], "status": "in_progress"}, format="json"
+        )
+        self.assertEqual(response.data["updated"], [own.id])
+        self.assertEqual(response.data["rejected"], [foreign.id])
+
+    def test_two_shop_order(self):
+        other_owner = baker.make(User, role="shop")
+        other_product = baker.make(Product, shop=baker.make(Shop, user=other_owner), quantity=10)
+        other_client = self.client_class()
+        other_client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=other_owner)}")
+        order = self.make_order(quantity=2)
+        baker.make(OrderItem, order=order, product=other_product, quantity=3)
+
+        def advance(client, status):
+            response = client.post(self.url, {"order_ids": [order.id], "status": status}, format="json")
+            self.assertEqual(response.data["updated"], [order.id])
+            order.refresh_from_db()
+            return order.status
+
+        # заказ в самом раннем статусе среди позиций магазинов
+        self.assertEqual(advance(self.client, "in_progress"), "confirmed")
+        self.assertEqual(advance(other_client, "in_progress"), "in_progress")
+        self.assertEqual(advance(self.client, "shipping"), "in_progress")
+        # отмена одним магазином возвращает на склад только его товар
+        self.assertEqual(advance(other_client, "canceled"), "shipping")
+        other_product.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity, other_product.quantity), (10, 13))
+        self.assertEqual(advance(self.client, "completed"), "completed")
+        self.assertEqual(
+            set(order.order_items.values_list("shop_id", "status")),
+            {(self.shop.id, "completed"), (other_product.shop_id, "canceled")},
+        )
+
+        response = other_client.post(self.url, {"order_ids": [order.id], "status": "completed"}, format="json")
+        self.assertEqual(response.data["rejected"], [order.id])
+        feed = other_client.get("/api/v1/shop/orders/").data["results"][0]
+        self.assertEqual((feed["status"], feed["shop_status"]), ("completed", "canceled"))
+
+    def test_cancel_returns_stock(self):
+        order = self.make_order(quantity=3)
+        response = self.client.post(self.url, {"order_ids": [order.id], "status": "canceled"}, format="json")
+        self.assertEqual(response.data["updated"], [order.id])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 13)
+
+    def test_client_cannot_transition(self):
+        client_user = baker.make(User, role="client")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=client_user)}")
+        response = self.client.post(
+            self.url, {"order_ids": [self.make_order().id], "status": "in_progress"}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_unknown_status(self):
+        response = self.client.post(
+            self.url, {"order_ids": [self.make_order().id], "status": "confirmed"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ShopOrderFeedTests(QueryBudgetMixin, APITestCase):
+    url = "/api/v1/shop/orders/"
+
+    def setUp(self):
+        self.owner = baker.make(User, role="shop")
+        self.shop = baker.make(Shop, user=self.owner)
+        self.product = baker.make(Product, shop=self.shop)
+        self.foreign_product = baker.make(Product)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.owner)}")
+
+    def make_order(self, status="confirmed"):
+        order = baker.make(Order, status=status)
+        baker.make(OrderItem, order=order, product=self.product, quantity=1)
+        baker.make(OrderItem, order=order, product=self.foreign_product, quantity=2)
+        return order
+
+    def test_order_item_shop_is_denormalized(self):
+        order = self.make_order()
+        self.assertEqual(
+            set(order.order_items.values_list("shop_id", flat=True)),
+            {self.shop.id, self.foreign_product.shop_id}
+        )
+
+    def test_feed_contains_only_shop_items(self):
+        orders = [self.make_order() for _ in range(3)]
+        self.make_order(status="basket")
+        with self.assertQueryBudget(4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order["id"] for order in response.data["results"]], [order.id for order in orders])
+        self.assertEqual(response.data["results"][0]["order_items"], [
+            {"product": self.product.name, "quantity": 1, "price": str(self.product.price)}
+        ])
+
+    def test_cursor_pagination_and_since(self):
+        orders = [self.make_order() for _ in range(3)]
+        response = self.client.get(self.url, {"page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(response.data["next"])
+        self.assertEqual([order["id"] for order in response.data["results"]], [orders[2].id])
+        self.assertIsNone(response.data["next"])
+
+        response = self.client.get(self.url, {"since": orders[1].updated_at.isoformat()})
+        self.assertEqual([order["id"] for order in response.data["results"]], [orders[1].id, orders[2].id])
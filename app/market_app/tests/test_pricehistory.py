@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.db import DatabaseError, connection
+from django.test import TestCase
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from market_app.models import Shop, Product, PriceHistory
+from market_app import pricehistory
+from market_app.pricehistory import ensure_partitions
+from market_app.tasks import update_products_from_data
+
+
+class PriceHistoryImportTests(TestCase):
+    def setUp(self):
+        self.shop = baker.make(Shop)
+
+    def pricelist(self, price, price_rrc=1500):
+        return {
+            "categories": [{"id": 224, "name": "Смартфоны"}],
+            "goods": [
+                {"id": 4216292, "category": 224, "name": "Смартфон", "price": price, "price_rrc": price_rrc,
+                 "quantity": 14, "parameters": {}},
+                {"id": 4216313, "category": 224, "name": "Смартфон 2", "price": 1000, "price_rrc": 1200,
+                 "quantity": 5, "parameters": {}},
+            ],
+        }
+
+    def test_only_changes_are_recorded(self):
+        update_products_from_data(self.pricelist(1100), self.shop.id)
+        self.assertEqual(PriceHistory.objects.count(), 2)
+
+        update_products_from_data(self.pricelist(1100.0), self.shop.id)
+        self.assertEqual(PriceHistory.objects.count(), 2)
+
+        update_products_from_data(self.pricelist(1099.9), self.shop.id)
+        update_products_from_data(self.pricelist(1099.9, price_rrc=1400), self.shop.id)
+        product = Product.objects.get(external_id=4216292)
+        self.assertEqual(
+            list(product.price_history.order_by("id").values_list("price", "price_rrc")),
+            [(Decimal("1100"), Decimal("1500")), (Decimal("1099.9"), Decimal("1500")),
+             (Decimal("1099.9"), Decimal("1400"))]
+        )
+
+    @skipUnless(connection.vendor != "postgresql", "на PostgreSQL секции создаются")
+    def test_partitions_only_on_postgresql(self):
+        self.assertEqual(ensure_partitions(), [])
+
+
+@skipUnless(connection.vendor == "postgresql", "секции есть только на PostgreSQL")
+class PricePartitionTests(TestCase):
+    def setUp(self):
+        # месяцы, секций которых еще нет: задача их пока не создавала
+        self.now = pricehistory.month_start(timezone.now() + timedelta(days=366))
+        self.product = baker.make(Product)
+
+    def count(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {table}")
+            return cursor.fetchone()[0]
+
+    def test_rows_moved_out_of_default(self):
+        baker.make(PriceHistory, product=self.product, price=100, price_rrc=150, changed_at=self.now)
+        self.assertEqual(self.count(pricehistory.DEFAULT_PARTITION), 1)
+
+        created = ensure_partitions(0, now=self.now)
+        self.assertEqual(created, [f"{pricehistory.TABLE}_y{self.now:%Y}m{self.now:%m}"])
+        self.assertEqual(self.count(created[0]), 1)
+        self.assertEqual(self.count(pricehistory.DEFAULT_PARTITION), 0)
+        self.assertEqual(PriceHistory.objects.get().price, 100)
+
+    def test_failed_month_does_not_block_later_ones(self):
+        original = pricehistory._create_partition
+        calls = []
+
+        def create_partition(cursor, name, start, end):
+            calls.append(name)
+            if len(calls) == 1:
+                raise DatabaseError("секция не создана")
+            original(cursor, name, start, end)
+
+        with mock.patch("market_app.pricehistory._create_partition", side_effect=create_partition), \
+                self.assertLogs("market_app.pricehistory", "ERROR"):
+            created = ensure_partitions(2, now=self.now)
+        self.assertEqual(created, calls[1:])
+        self.assertEqual(len(created), 2)
+
+
+class PriceHistoryEndpointTests(APITestCase):
+    def setUp(self):
+        self.product = baker.make(Product)
+        start = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=3)
+        for hours, price in ((0, 100), (2, 120), (4, 110), (24, 90)):
+            baker.make(
+                PriceHistory, product=self.product, price=price, price_rrc=150,
+                changed_at=start + timedelta(hours=hours)
+            )
+        self.start = start
+
+    def test_daily_series(self):
+        response = self.client.get(f"/api/v1/products/{self.product.id}/price_history/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        first = response.data[0]
+        self.assertEqual(
+            (first["min_price"], first["max_price"], first["avg_price"], first["changes"]),
+            ("100.00", "120.00", "110.00", 3)
+        )
+
+    def test_date_range_and_interval(self):
+        date_from = (self.start + timedelta(hours=1)).astimezone(dt_timezone.utc).isoformat()
+        response = self.client.get(
+            f"/api/v1/products/{self.product.id}/price_history/", {"interval": "hour", "date_from": date_from}
+        )
+        self.assertEqual([point["min_price"] for point in response.data], ["120.00", "110.00", "90.00"])
+
+    def test_unknown_interval(self):
+        response = self.client.get(f"/api/v1/products/{self.product.id}/price_history/", {"interval": "year"})
+        self.assertEqual(response.status_code, 400)
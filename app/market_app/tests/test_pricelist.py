@@ -0,0 +1,337 @@
+from decimal import Decimal
+from unittest import mock
+
+import yaml
+from celery.exceptions import Retry
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from market_app import pricelist
+from market_app.export import export_csv
+from market_app.models import (
+    User, Shop, Product, PriceListImport, Contact, ShopStats, ProductParameter, PriceHistory
+)
+from market_app.tasks import update_products_from_data
+
+PRICE_LIST = """
+categories:
+  - id: 224
+    name: Смартфоны
+goods:
+  - id: 1
+    category: 224
+    name: Смартфон
+    price: {price}
+    price_rrc: 1200
+    quantity: 5
+"""
+
+
+class PriceListSubmitTests(APITestCase):
+    url = "/api/v1/upload-pricelist/"
+
+    def setUp(self):
+        # лимит загрузок прайс-листов хранится в кеше
+        cache.clear()
+        self.owner = baker.make(User, role="shop")
+        self.shop = baker.make(Shop, user=self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.owner)}")
+
+    def upload(self, price):
+        content = PRICE_LIST.format(price=price).encode()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {"file": SimpleUploadedFile("shop.yaml", content)})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_same_file_imported_once(self):
+        first = self.upload(1000)
+        self.assertEqual(first["import_status"], "queued")
+        self.assertEqual(PriceListImport.objects.get().status, "completed")
+        with mock.patch("market_app.tasks.update_products_from_data.delay") as delay:
+            second = self.upload(1000)
+        delay.assert_not_called()
+        self.assertEqual(second["import_id"], first["import_id"])
+        self.assertEqual(PriceListImport.objects.count(), 1)
+
+    def test_reupload_after_other_file_is_imported(self):
+        first = self.upload(1000)
+        self.upload(1100)
+        self.assertEqual(Product.objects.get().price, 1100)
+        self.assertNotEqual(self.upload(1000)["import_id"], first["import_id"])
+        self.assertEqual(Product.objects.get().price, 1000)
+
+    def test_newer_upload_supersedes_queued(self):
+        with mock.patch("market_app.tasks.update_products_from_data.delay") as delay:
+            old = self.upload(1000)
+            self.assertEqual(self.upload(1000)["import_id"], old["import_id"])
+            new = self.upload(1100)
+        self.assertEqual(delay.call_count, 2)
+        self.assertEqual(PriceListImport.objects.get(id=old["import_id"]).status, "superseded")
+
+        for args in (call.args for call in delay.call_args_list):
+            update_products_from_data(*args)
+        self.assertEqual(Product.objects.get().price, 1100)
+        self.assertEqual(PriceListImport.objects.get(id=new["import_id"]).status, "completed")
+
+    def test_partial_upload_queues_behind_full(self):
+        partial = PRICE_LIST.format(price=900).replace("id: 1\n", "id: 2\n").encode()
+        with mock.patch("market_app.tasks.update_products_from_data.delay") as delay:
+            full = self.upload(1000)["import_id"]
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    self.url, {"file": SimpleUploadedFile("shop.yaml", partial), "partial": "true"}
+                )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(PriceListImport.objects.values_list("id", "status")),
+            {full: "queued", response.data["import_id"]: "queued"}
+        )
+
+        # частичный импорт ждет полного, загруженного раньше
+        first, second = (call.args for call in delay.call_args_list)
+        self.assertIsNone(pricelist.claim(second[2], self.shop.id))
+        update_products_from_data(*first)
+        update_products_from_data(*second)
+        self.assertEqual(set(PriceListImport.objects.values_list("status", flat=True)), {"completed"})
+        self.assertEqual(
+            dict(Product.objects.values_list("external_id", "price")), {1: Decimal(1000), 2: Decimal(900)}
+        )
+
+    def test_running_import_blocks_next(self):
+        running = baker.make(PriceListImport, shop=self.shop, status="running", started_at="2026-01-01T00:00Z")
+        queued = baker.make(PriceListImport, shop=self.shop, status="queued", content_hash="other")
+        with self.settings(PRICE_LIST_IMPORT_TIMEOUT=10 ** 9):
+            self.assertIsNone(pricelist.claim(queued.id, self.shop.id))
+        # оборванный импорт не блокирует очередь
+        self.assertTrue(pricelist.claim(queued.id, self.shop.id))
+        running.refresh_from_db()
+        self.assertEqual(running.status, "failed")
+
+    def test_retries_while_running_are_bounded(self):
+        baker.make(PriceListImport, shop=self.shop, status="running", started_at=timezone.now())
+        queued = baker.make(PriceListImport, shop=self.shop, status="queued", content_hash="other")
+        args = (yaml.safe_load(PRICE_LIST.format(price=1000)), self.shop.id, queued.id)
+        with self.settings(PRICE_LIST_IMPORT_TIMEOUT=60, PRICE_LIST_IMPORT_RETRY_DELAY=30):
+            with self.assertRaises(Retry):
+                update_products_from_data.apply(args, retries=2, throw=True)
+            # третий повтор - последний: импорт отклоняется
+            update_products_from_data.apply(args, retries=3, throw=True)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "failed")
+        self.assertFalse(Product.objects.exists())
+
+    def test_concurrent_duplicate_finished(self):
+        content = PRICE_LIST.format(price=1000).encode()
+        lookups = []
+
+        def duplicate_of(shop_id, digest, full, now):
+            lookups.append(digest)
+            if len(lookups) == 1:
+                # параллельная загрузка того же файла ставит импорт в очередь...
+                PriceListImport.objects.create(shop=self.shop, content_hash=digest, status="running")
+                return None
+            # ...и завершается ошибкой до повторной проверки
+            PriceListImport.objects.filter(status="running").update(status="failed")
+            return original(shop_id, digest, full, now)
+
+        original = pricelist._duplicate_of
+        with mock.patch("market_app.pricelist._duplicate_of", side_effect=duplicate_of), \
+                mock.patch("market_app.tasks.update_products_from_data.delay"):
+            job, created = pricelist.submit(self.shop, SimpleUploadedFile("shop.yaml", content))
+        self.assertTrue(created)
+        self.assertEqual(job.status, "queued")
+        self.assertEqual(len(lookups), 2)
+
+
+class PriceListValidationTests(APITestCase):
+    url = "/api/v1/upload-pricelist/"
+
+    def setUp(self):
+        # лимит загрузок прайс-листов хранится в кеше
+        cache.clear()
+        self.owner = baker.make(User, role="shop")
+        baker.make(Shop, user=self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.owner)}")
+
+    def test_all_errors_reported_before_import(self):
+        data = {
+            "categories": [{"id": 224, "name": "Смартфоны"}, {"id": 224, "name": "Дубль"}],
+            "goods": [
+                {"id": 1, "category": 224, "name": "Смартфон", "price": 100, "price_rrc": 120, "quantity": 1},
+                {"id": 2, "category": 999, "name": "Смартфон 2", "price": "дорого", "price_rrc": 120},
+                {"id": 1, "category": 224, "name": "", "price": 1e10, "price_rrc": -1, "quantity": 1.5},
+            ],
+        }
+        self.assertEqual(pricelist.validate(data), [
+            "categories[1].id: категория 224 указана дважды",
+            "goods[1].category: категории 999 нет в разделе categories",
+            "goods[1].price: должна быть числом",
+            "goods[2].id: товар 1 указан дважды",
+            "goods[2].name: обязательное поле",
+            "goods[2].price: должна быть меньше 100000000",
+            "goods[2].price_rrc: должна быть неотрицательным числом",
+            "goods[2].quantity: должно быть неотрицательным целым числом",
+        ])
+        with self.assertRaises(pricelist.PriceListError):
+            update_products_from_data(data, self.owner.shop.id)
+        self.assertFalse(Product.objects.exists())
+
+    def test_error_limit(self):
+        goods = [{"id": i, "category": 1, "name": "Товар", "price": 1, "price_rrc": 1} for i in range(10)]
+        with self.settings(PRICE_LIST_MAX_ERRORS=3):
+            self.assertEqual(len(pricelist.validate({"goods": goods})), 3)
+
+    def test_upload_rejected(self):
+        for content in (b"goods: [1, 2", b"- 1\n- 2", PRICE_LIST.format(price="null").encode()):
+            with mock.patch("market_app.tasks.update_products_from_data.delay") as delay:
+                response = self.client.post(self.url, {"file": SimpleUploadedFile("shop.yaml", content)})
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(response.data["errors"])
+            delay.assert_not_called()
+        self.assertFalse(PriceListImport.objects.exists())
+
+
+class PriceListFormatTests(APITestCase):
+    url = "/api/v1/upload-pricelist/"
+
+    def setUp(self):
+        cache.clear()
+        self.owner = baker.make(User, role="shop")
+        self.shop = baker.make(Shop, user=self.owner)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.owner)}")
+
+    def upload(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {"file": SimpleUploadedFile(name, content.encode())})
+
+    def test_jsonl(self):
+        response = self.upload("shop.jsonl", (
+            '{"id": 1, "category": 224, "category_name": "Смартфоны", "name": "Смартфон", '
+            '"price": 1000, "price_rrc": 1200, "quantity": 5, "parameters": {"Цвет": "черный"}}\n'
+            '\n'
+            '{"id": 2, "category": 224, "category_name": "Смартфоны", "name": "Смартфон 2", '
+            '"price": 900.5, "price_rrc": 1000, "quantity": 1}\n'
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Product.objects.get(external_id=2).price, Decimal("900.50"))
+        self.assertEqual(Product.objects.get(external_id=1).parameters.get().value, "черный")
+
+    def test_csv_export_round_trip(self):
+        self.upload("shop.yaml", PRICE_LIST.format(price=1000))
+        exported = "".join(export_csv(self.shop))
+        Product.objects.all().delete()
+        cache.clear()
+        response = self.upload("shop.csv", exported.replace("1000.00", "1100.00"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Product.objects.get().price, Decimal("1100"))
+
+    def test_errors_point_to_rows(self):
+        response = self.upload("shop.csv", (
+            "id,category,category_name,name,price,price_rrc,quantity\n"
+            "1,224,Смартфоны,Смартфон,1000,1200,5\n"
+            "x,224,Телефоны,Смартфон 2,1000,1200,много\n"
+        ))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"], [
+            "categories[1].id: категория 224 указана дважды",
+            "goods[1].id: должен быть неотрицательным целым числом",
+            "goods[1].quantity: должно быть неотрицательным целым числом",
+        ])
+        response = self.upload("shop.jsonl", '{"id": 1}\n{"id": \n')
+        self.assertEqual(response.data["errors"][0][:9], "строка 2:")
+
+    def test_unknown_extension(self):
+        self.assertEqual(self.upload("shop.xml", "<shop/>").status_code, 400)
+
+
+class DelistingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = baker.make(Shop)
+        self.buyer = baker.make(User)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.buyer)}")
+
+    def feed(self, *ids):
+        return {
+            "categories": [{"id": 224, "name": "Смартфоны"}],
+            "goods": [
+                {"id": i, "category": 224, "name": f"Смартфон {i}", "price": 100, "price_rrc": 120, "quantity": 5}
+                for i in ids
+            ],
+        }
+
+    def active(self):
+        return set(Product.objects.filter(is_active=True).values_list("external_id", flat=True))
+
+    def test_full_feed_delists_missing(self):
+        update_products_from_data(self.feed(1, 2, 3), self.shop.id)
+        other = baker.make(Product, external_id=100)
+        update_products_from_data(self.feed(1, 2), self.shop.id)
+        self.assertEqual(self.active(), {1, 2, 100})
+        self.assertEqual(ShopStats.objects.get(shop=self.shop).products_count, 2)
+
+        delisted = Product.objects.get(external_id=3)
+        response = self.client.get("/api/v1/products/")
+        self.assertEqual({row["id"] for row in response.data["results"]}, {
+            *Product.objects.filter(external_id__in=(1, 2)).values_list("id", flat=True), other.id
+        })
+        self.assertEqual(self.client.get(f"/api/v1/products/{delisted.id}/").status_code, 404)
+        response = self.client.post(f"/api/v1/products/{delisted.id}/add_to_cart/", {"quantity": 1})
+        self.assertEqual(response.status_code, 404)
+
+        update_products_from_data(self.feed(3), self.shop.id, full=False)
+        self.assertEqual(self.active(), {1, 2, 3, 100})
+
+    def test_delisted_product_cannot_be_ordered(self):
+        update_products_from_data(self.feed(1, 2), self.shop.id)
+        product = Product.objects.get(external_id=1)
+        self.client.post(f"/api/v1/products/{product.id}/add_to_cart/", {"quantity": 1})
+        update_products_from_data(self.feed(2), self.shop.id)
+        response = self.client.post(
+            "/api/v1/orders/confirm_order/", {"address_id": baker.make(Contact, user=self.buyer).id}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], "Товар «Смартфон 1» снят с продажи")
+
+
+class ImportUpsertTests(APITestCase):
+    def feed(self, size, price=100, color="черный"):
+        return {
+            "categories": [{"id": 224, "name": "Смартфоны"}],
+            "goods": [
+                {"id": i, "category": 224, "name": f"Смартфон {i}", "price": price, "price_rrc": 120,
+                 "quantity": 5, "parameters": {"Цвет": color}}
+                for i in range(size)
+            ],
+        }
+
+    def test_same_external_id_in_two_shops(self):
+        first, second = baker.make(Shop, _quantity=2)
+        update_products_from_data(self.feed(2, price=100), first.id)
+        update_products_from_data(self.feed(2, price=200), second.id)
+        self.assertEqual(
+            sorted(Product.objects.values_list("shop_id", "external_id", "price")),
+            [(first.id, 0, 100), (first.id, 1, 100), (second.id, 0, 200), (second.id, 1, 200)],
+        )
+
+    def test_upsert_per_chunk(self):
+        shop = baker.make(Shop)
+        update_products_from_data(self.feed(5), shop.id)
+        with self.settings(IMPORT_CHUNK_SIZE=2), CaptureQueriesContext(connection) as queries:
+            update_products_from_data(self.feed(5, price=150, color="белый"), shop.id)
+        writes = [
+            query["sql"] for query in queries
+            if query["sql"].startswith("INSERT") and '"market_app_product' in query["sql"]
+        ]
+        # по upsert товаров и параметров на каждую из трех пачек
+        self.assertEqual(len(writes), 6)
+        self.assertEqual(Product.objects.filter(price=150).count(), 5)
+        self.assertEqual(set(ProductParameter.objects.values_list("value", flat=True)), {"белый"})
+        self.assertEqual(PriceHistory.objects.filter(price=150).count(), 5)
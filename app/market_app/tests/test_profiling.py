@@ -0,0 +1,23 @@
+from django.test import TestCase
+from model_bakery import baker
+
+from market_app.models import Product
+from market_app.profiling import QueryInspector, normalize_sql
+
+
+class QueryInspectorTests(TestCase):
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id = 15 AND name = 'x''y' AND pk IN (%s, %s, %s)"),
+            "SELECT * FROM t WHERE id = ? AND name = ? AND pk IN (...)",
+        )
+
+    def test_repeated_queries_detected(self):
+        products = baker.make(Product, _quantity=3)
+        with QueryInspector() as inspector:
+            for product in Product.objects.filter(id__in=[p.id for p in products]):
+                product.category.name
+        self.assertEqual(inspector.count, 4)
+        repeated = inspector.repeated(3)
+        self.assertEqual(len(repeated), 1)
+        self.assertIn("market_app_category", repeated[0][0])
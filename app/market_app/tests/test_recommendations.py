@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.test import APITestCase
+
+from market_app.models import Order, OrderItem, Product, ProductRecommendations
+from market_app.recommendations import build
+
+
+class RecommendationsTests(APITestCase):
+    def setUp(self):
+        self.products = baker.make(Product, _quantity=5)
+
+    def sell(self, *products, status="confirmed"):
+        order = baker.make(Order, status=status)
+        for product in products:
+            baker.make(OrderItem, order=order, product=product)
+        return order
+
+    def neighbours(self, product):
+        return ProductRecommendations.objects.get(product=product).neighbours
+
+    def test_top_neighbours_by_shared_orders(self):
+        a, b, c, d, _ = self.products
+        for _ in range(3):
+            self.sell(a, b)
+        self.sell(a, c, d)
+        self.sell(a, c)
+        self.sell(a, d)
+        self.assertEqual(build(top_k=2, min_support=1), 4)
+        # при равном числе заказов раньше идет товар с меньшим id
+        self.assertEqual(self.neighbours(a), [[b.id, 3], [c.id, 2]])
+        self.assertEqual(self.neighbours(b), [[a.id, 3]])
+
+    def test_min_support_and_excluded_orders(self):
+        a, b, c, d, e = self.products
+        self.sell(a, b)
+        self.sell(a, b)
+        self.sell(a, c)
+        self.sell(a, c, status="basket")
+        self.sell(a, c, status="canceled")
+        self.sell(a, d)
+        self.sell(a, d)
+        Product.objects.filter(id=d.id).update(is_active=False)
+        old = self.sell(a, e)
+        self.sell(a, e)
+        Order.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=400))
+        build(min_support=2, days=365)
+        self.assertEqual(self.neighbours(a), [[b.id, 2]])
+        self.assertFalse(ProductRecommendations.objects.filter(product__in=[c, d, e]).exists())
+
+    def test_stale_rows_are_removed(self):
+        a, b, c, *_ = self.products
+        order = self.sell(a, b)
+        self.sell(a, b)
+        build(min_support=2)
+        order.delete()
+        self.sell(a, c)
+        self.sell(a, c)
+        build(min_support=2)
+        self.assertEqual(self.neighbours(a), [[c.id, 2]])
+        self.assertFalse(ProductRecommendations.objects.filter(product=b).exists())
+
+    def test_endpoint_returns_products_in_rank_order(self):
+        a, b, c, d, _ = self.products
+        ProductRecommendations.objects.create(product=a, neighbours=[[c.id, 5], [b.id, 3], [d.id, 1]])
+        Product.objects.filter(id=d.id).update(is_active=False)
+        with self.assertNumQueries(3):
+            response = self.client.get(f"/api/v1/products/{a.id}/recommendations/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product["id"] for product in response.json()], [c.id, b.id])
+
+    def test_endpoint_without_recommendations(self):
+        a, b, *_ = self.products
+        response = self.client.get(f"/api/v1/products/{a.id}/recommendations/")
+        self.assertEqual((response.status_code, response.json()), (200, []))
+        Product.objects.filter(id=b.id).update(is_active=False)
+        self.assertEqual(self.client.get(f"/api/v1/products/{b.id}/recommendations/").status_code, 404)
@@ -0,0 +1,64 @@
+import datetime
+import io
+import uuid
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from market_app.parsers import ORJSONParser
+from market_app.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    data = {
+        'count': 2,
+        'results': [
+            ReturnDict({
+                'price': '1000.50',
+                'raw_price': Decimal('1000.50'),
+                'name': 'Смартфон Apple',
+                'created_at': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+                'local': timezone.localtime(datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)),
+                'date': datetime.date(2024, 5, 1),
+                'time': datetime.time(12, 30, 15, 123456),
+                'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+                'lazy': gettext_lazy('Заказ'),
+                'parameters': [{'name': 'Цвет', 'value': 'черный'}],
+                'total_price': 12.5,
+                'empty': None,
+            }, serializer=None),
+        ],
+        5: 'int key',
+    }
+
+    def test_output_matches_json_renderer(self):
+        self.assertEqual(ORJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_indent_falls_back_to_json_renderer(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(
+            ORJSONRenderer().render(self.data, media_type),
+            JSONRenderer().render(self.data, media_type),
+        )
+
+    def test_big_integers(self):
+        data = {'value': 2 ** 70}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class ORJSONParserTests(SimpleTestCase):
+    def test_parse(self):
+        body = '{"quantity": 2, "name": "телефон", "price": 10.5}'.encode()
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body))
+        )
+
+    def test_invalid_json(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"quantity": NaN}'))
@@ -0,0 +1,120 @@
+from unittest import mock, skipUnless
+
+from cachalot.settings import cachalot_settings
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from model_bakery import baker
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from market_api_service.routers import ReplicaRouter, use_replica
+from market_app.models import User, Product, Contact
+
+
+@override_settings(REPLICA_DATABASES=["replica_0"])
+class ReplicaRouterTests(SimpleTestCase):
+    def test_reads_go_to_primary_by_default(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(Product))
+
+    def test_reads_inside_use_replica(self):
+        with use_replica():
+            self.assertEqual(ReplicaRouter().db_for_read(Product), "replica_0")
+            self.assertEqual(ReplicaRouter().db_for_write(Product), "default")
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(ReplicaRouter().allow_migrate("default", "market_app"))
+        self.assertFalse(ReplicaRouter().allow_migrate("replica_0", "market_app"))
+
+
+@override_settings(REPLICA_DATABASES=["replica_0"])
+class ReplicaRoutingTests(APITestCase):
+    """Реплика подменяется основной БД, проверяется только выбор маршрута."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = baker.make(User)
+        self.product = baker.make(Product, quantity=5)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user)}")
+        patcher = mock.patch("market_api_service.routers.choose_replica", return_value="default")
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_catalogue_reads_use_replica(self):
+        self.client.get("/api/v1/products/")
+        self.client.get(f"/api/v1/products/{self.product.id}/")
+        self.client.get("/api/v1/orders/")
+        self.assertTrue(self.choose_replica.called)
+
+    def test_writes_use_primary_and_stick(self):
+        self.client.post(f"/api/v1/products/{self.product.id}/add_to_cart/", {"quantity": 1})
+        self.client.post("/api/v1/orders/confirm_order/", {"address_id": baker.make(Contact, user=self.user).id})
+        self.assertFalse(self.choose_replica.called)
+        # сразу после записи пользователь читает свои данные с основной БД
+        self.client.get("/api/v1/orders/")
+        self.assertFalse(self.choose_replica.called)
+
+        cache.clear()
+        self.client.get("/api/v1/orders/")
+        self.assertTrue(self.choose_replica.called)
+
+    def test_admin_changelist_uses_replica(self):
+        admin = baker.make(User, is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.get("/admin/market_app/product/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.choose_replica.called)
+
+
+@skipUnless(settings.REPLICA_DATABASES, "реплики не настроены")
+class ReplicaDatabaseTests(APITransactionTestCase):
+    """
+    Запускается с настроенной репликой, например вторым алиасом SQLite с TEST MIRROR.
+    Реплика читает через отдельное соединение, поэтому данные должны быть закоммичены.
+    """
+    databases = {"default", *settings.REPLICA_DATABASES}
+
+    def test_product_list_reads_from_replica(self):
+        baker.make(Product)
+        with CaptureQueriesContext(connections[settings.REPLICA_DATABASES[0]]) as queries:
+            response = self.client.get("/api/v1/products/")
+        self.assertEqual(response.data["count"], 1)
+        self.assertTrue(queries.captured_queries)
+
+
+@override_settings(REPLICA_DATABASES=["replica_cache"])
+class ReplicaCacheTests(APITransactionTestCase):
+    """
+    Реплика - второе соединение с тестовой БД. cachalot перечитывает
+    настройки с этим алиасом, как при запуске с POSTGRES_REPLICA_HOSTS.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        connections.settings["replica_cache"] = dict(connections["default"].settings_dict)
+        cls.databases = {"default", "replica_cache"}
+        cachalot_settings.reload()
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica_cache"].close()
+        del connections["replica_cache"]
+        del connections.settings["replica_cache"]
+        cls.databases = {"default"}
+        cachalot_settings.reload()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_replica_reads_see_writes_on_primary(self):
+        baker.make(Product)
+        with CaptureQueriesContext(connections["replica_cache"]) as queries:
+            self.assertEqual(self.client.get("/api/v1/products/").data["count"], 1)
+        self.assertTrue(queries.captured_queries)
+
+        baker.make(Product)
+        self.assertEqual(self.client.get("/api/v1/products/").data["count"], 2)
@@ -0,0 +1,129 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+from model_bakery import baker
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from market_app.models import User, Product, Order, OrderItem, Contact, StockReservation
+from market_app.reservations import release_expired
+from market_app.tasks import update_products_from_data
+
+
+class StockReservationTests(APITestCase):
+    def setUp(self):
+        self.product = baker.make(Product, quantity=5)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user)}')
+        return client
+
+    def add_to_cart(self, client, quantity):
+        return client.post(f"/api/v1/products/{self.product.id}/add_to_cart/", {"quantity": quantity})
+
+    def test_hold_reduces_available_stock(self):
+        first = self.client_for(baker.make(User))
+        second = self.client_for(baker.make(User))
+
+        self.assertEqual(self.add_to_cart(first, 4).status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 1)
+
+        response = self.add_to_cart(second, 2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["message"], "Недостаточно товара на складе, в наличии 1")
+
+        # Уменьшение количества в корзине возвращает разницу на склад
+        self.assertEqual(self.add_to_cart(first, 2).status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 3)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+
+    def test_remove_from_cart_releases_hold(self):
+        client = self.client_for(baker.make(User))
+        self.add_to_cart(client, 3)
+        client.post(f"/api/v1/products/{self.product.id}/remove_from_cart/")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_confirm_order_consumes_hold(self):
+        user = baker.make(User)
+        client = self.client_for(user)
+        self.add_to_cart(client, 3)
+        contact = baker.make(Contact, user=user)
+        response = client.post("/api/v1/orders/confirm_order/", {"address_id": contact.id})
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 2)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_release_expired(self):
+        cart = baker.make(Order, status="basket")
+        item = baker.make(OrderItem, order=cart, product=self.product, quantity=2)
+        Product.objects.filter(pk=self.product.pk).update(quantity=3)
+        baker.make(
+            StockReservation, order_item=item, product=self.product, quantity=2,
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(release_expired(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+    @override_settings(CART_RESERVATION_TTL=0)
+    def test_without_reservations(self):
+        client = self.client_for(baker.make(User))
+        self.assertEqual(self.add_to_cart(client, 4).status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 5)
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class ReservationImportTests(APITestCase):
+    """Остаток из прайс-листа не учитывает товар, зарезервированный в корзинах."""
+
+    def setUp(self):
+        self.product = baker.make(Product, external_id=1, quantity=5)
+        self.user = baker.make(User)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user)}")
+        self.client.post(f"/api/v1/products/{self.product.id}/add_to_cart/", {"quantity": 3})
+
+    def import_quantity(self, quantity):
+        update_products_from_data({
+            "categories": [{"id": 1, "name": "Смартфоны"}],
+            "goods": [{"id": 1, "category": 1, "name": "Смартфон", "price": 100, "price_rrc": 120,
+                       "quantity": quantity}],
+        }, self.product.shop_id)
+        self.product.refresh_from_db()
+
+    def confirm(self):
+        contact = baker.make(Contact, user=self.user)
+        return self.client.post("/api/v1/orders/confirm_order/", {"address_id": contact.id})
+
+    def test_import_then_confirm(self):
+        self.import_quantity(10)
+        self.assertEqual(self.product.quantity, 7)
+        self.assertEqual(self.confirm().status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 7)
+
+    def test_import_then_expire(self):
+        self.import_quantity(10)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(release_expired(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 10)
+
+    def test_import_below_reserved(self):
+        self.import_quantity(2)
+        self.assertEqual(self.product.quantity, 0)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+        self.assertEqual(self.confirm().status_code, 400)
+
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        release_expired()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 2)
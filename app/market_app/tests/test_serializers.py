@@ -0,0 +1,43 @@
+import json
+from decimal import Decimal
+
+from django.test import TestCase
+from model_bakery import baker
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from market_app.models import Product, ProductParameter, Order, OrderItem
+from market_app.serializers import (
+    ProductSerializer, OrderSerializer, FastProductSerializer, FastOrderSerializer
+)
+
+
+def render(data):
+    return json.loads(JSONRenderer().render(data))
+
+
+class FastReadSerializerTests(TestCase):
+    def setUp(self):
+        self.context = {'request': APIRequestFactory().get('/api/v1/products/')}
+
+    def test_products_match_model_serializer(self):
+        products = baker.make(Product, price=Decimal('10.5'), price_rrc=Decimal('12'), _quantity=3)
+        baker.make(Product, model=None)
+        for product in products:
+            baker.make(ProductParameter, product=product, _quantity=2)
+        queryset = Product.objects.order_by('id')
+
+        expected = ProductSerializer(queryset, many=True, context=self.context).data
+        fast = FastProductSerializer(FastProductSerializer.prepare(queryset), context=self.context).data
+        self.assertEqual(render(fast), render(expected))
+
+    def test_orders_match_model_serializer(self):
+        orders = baker.make(Order, status='in_progress', _quantity=2)
+        baker.make(Order, status='completed')
+        for order in orders:
+            baker.make(OrderItem, order=order, quantity=3, product__price=Decimal('99.99'), _quantity=2)
+        queryset = Order.objects.order_by('id')
+
+        expected = OrderSerializer(queryset, many=True, context=self.context).data
+        fast = FastOrderSerializer(FastOrderSerializer.prepare(queryset), context=self.context).data
+        self.assertEqual(render(fast), render(expected))
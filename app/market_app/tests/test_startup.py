@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from model_bakery import baker
+
+from market_app import views
+from market_app.models import Category, CategoryStats, Product
+from market_app.throttling import RedisAnonRateThrottle
+from market_app.warmup import hot_paths, warm
+
+SCHEMA = {"openapi": "3.0.3", "info": {"title": "Market API", "version": "1.0.0"}, "paths": {}}
+
+
+class OpenAPISchemaTests(TestCase):
+    def setUp(self):
+        views._openapi_schemas.clear()
+        self.addCleanup(views._openapi_schemas.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "openapi.json")
+        with open(self.path, "w") as file:
+            json.dump(SCHEMA, file)
+
+    def test_precomputed_schema(self):
+        with override_settings(OPENAPI_SCHEMA_FILE=self.path):
+            response = self.client.get("/api/v1/schema/", HTTP_ACCEPT="application/vnd.oai.openapi+json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), SCHEMA)
+            # схема и ее представление читаются один раз на процесс
+            os.remove(self.path)
+            response = self.client.get("/api/v1/schema/")
+        self.assertEqual(response["Content-Type"], "application/vnd.oai.openapi; charset=utf-8")
+        self.assertIn(b"title: Market API", response.content)
+
+    def test_generated_without_file(self):
+        with override_settings(OPENAPI_SCHEMA_FILE=self.path + ".missing"), \
+                self.assertLogs("market_app.views", "WARNING"):
+            response = self.client.get("/api/v1/schema/", HTTP_ACCEPT="application/vnd.oai.openapi+json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("/api/v1/products/", json.loads(response.content)["paths"])
+
+
+class WarmupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        phones, cases = baker.make(Category, name="Смартфоны"), baker.make(Category, name="Чехлы")
+        baker.make(Product, category=phones, _quantity=3)
+        CategoryStats.objects.create(category=phones, products_count=3)
+        CategoryStats.objects.create(category=cases, products_count=0)
+
+    def test_hot_paths(self):
+        self.assertEqual(hot_paths(pages=2, categories=5), [
+            "/api/v1/products/",
+            "/api/v1/products/?page=2",
+            "/api/v1/stats/categories/",
+            "/api/v1/products/?category=%D0%A1%D0%BC%D0%B0%D1%80%D1%82%D1%84%D0%BE%D0%BD%D1%8B",
+        ])
+
+    def test_warm_does_not_use_throttle(self):
+        paths = hot_paths(pages=1)
+        with mock.patch.object(RedisAnonRateThrottle, "THROTTLE_RATES", {"anon": "1/minute"}):
+            self.assertEqual([status for _, status, _ in warm(paths * 2)], [200] * len(paths) * 2)
+            self.assertEqual(self.client.get("/api/v1/products/").status_code, 200)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("warm_cache", "--pages", "1", stdout=out)
+        self.assertEqual(out.getvalue().count("200"), 3)
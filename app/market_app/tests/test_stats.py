@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from model_bakery import baker
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase
+
+from market_app.models import User, Shop, Contact, Product, CategoryStats, ShopStats
+from market_app.stats import refresh
+from market_app.tasks import update_products_from_data
+
+
+class CatalogueStatsTests(APITestCase):
+    def setUp(self):
+        self.owner = baker.make(User, role="shop")
+        self.shop = baker.make(Shop, user=self.owner, name="Связной")
+        update_products_from_data({
+            "categories": [{"id": 224, "name": "Смартфоны"}],
+            "goods": [
+                {"id": 1, "category": 224, "name": "Смартфон 1", "price": 100, "price_rrc": 120, "quantity": 10},
+                {"id": 2, "category": 224, "name": "Смартфон 2", "price": 300, "price_rrc": 280, "quantity": 2},
+            ],
+        }, self.shop.id)
+        self.product = Product.objects.get(external_id=1)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user)}")
+        return client
+
+    def assertStats(self, stats, products_count, total_quantity, stock_value):
+        stats.refresh_from_db()
+        self.assertEqual(
+            (stats.products_count, stats.total_quantity, stats.stock_value),
+            (products_count, total_quantity, Decimal(stock_value))
+        )
+
+    def test_import_refreshes_stats(self):
+        stats = ShopStats.objects.get(shop=self.shop)
+        self.assertStats(stats, 2, 12, "1600")
+        self.assertEqual(stats.avg_price, Decimal("200"))
+        self.assertEqual(stats.avg_price_rrc, Decimal("200"))
+        self.assertEqual(CategoryStats.objects.get().products_count, 2)
+
+    def test_sale_and_cancel_update_stats(self):
+        buyer = baker.make(User)
+        client = self.client_for(buyer)
+        client.post(f"/api/v1/products/{self.product.id}/add_to_cart/", {"quantity": 3})
+        stats = ShopStats.objects.get(shop=self.shop)
+        # резерв не меняет остаток в статистике
+        self.assertStats(stats, 2, 12, "1600")
+
+        client.post("/api/v1/orders/confirm_order/", {"address_id": baker.make(Contact, user=buyer).id})
+        self.assertStats(stats, 2, 9, "1300")
+        self.assertStats(CategoryStats.objects.get(), 2, 9, "1300")
+
+        order_id = buyer.order_set.get().id
+        self.client_for(self.owner).post(
+            "/api/v1/shop/orders/transition/", {"order_ids": [order_id], "status": "canceled"}, format="json"
+        )
+        self.assertStats(stats, 2, 12, "1600")
+
+    def test_full_refresh_matches_incremental(self):
+        buyer = baker.make(User)
+        client = self.client_for(buyer)
+        client.post(f"/api/v1/products/{self.product.id}/add_to_cart/", {"quantity": 4})
+        client.post("/api/v1/orders/confirm_order/", {"address_id": baker.make(Contact, user=buyer).id})
+        client.post(f"/api/v1/products/{self.product.id}/add_to_cart/", {"quantity": 1})
+        incremental = ShopStats.objects.values("total_quantity", "stock_value").get()
+        refresh()
+        self.assertEqual(ShopStats.objects.values("total_quantity", "stock_value").get(), incremental)
+
+    def test_removed_products_drop_stats(self):
+        Product.objects.all().delete()
+        refresh(shop_ids=[self.shop.id])
+        self.assertFalse(ShopStats.objects.exists())
+
+    def test_endpoints(self):
+        response = self.client.get("/api/v1/stats/categories/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["name"], "Смартфоны")
+        self.assertEqual(response.data["results"][0]["price_to_rrc"], "1.0000")
+
+        self.assertEqual(self.client.get("/api/v1/stats/shops/").status_code, 401)
+        response = self.client_for(self.owner).get("/api/v1/stats/shops/")
+        self.assertEqual([row["name"] for row in response.data["results"]], ["Связной"])
+        response = self.client_for(baker.make(User, role="shop")).get("/api/v1/stats/shops/")
+        self.assertEqual(response.data["results"], [])
@@ -0,0 +1,75 @@
+import time
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+from celery import Celery
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from market_api_service.celery import app as celery_app
+from market_app import taskmetrics
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class TaskRoutingTests(SimpleTestCase):
+    def route(self, name):
+        return celery_app.amqp.router.route({}, name)
+
+    def test_user_facing_tasks_separated_from_imports(self):
+        self.assertEqual(self.route("market_app.tasks.send_email")["queue"].name, "notifications")
+        self.assertEqual(self.route("market_app.tasks.update_products_from_data")["queue"].name, "imports")
+        self.assertEqual(self.route("market_app.tasks.generate_thumbnails")["queue"].name, "media")
+        self.assertEqual(self.route("market_app.tasks.refresh_catalogue_stats")["queue"].name, "default")
+        self.assertEqual(self.route("market_app.tasks.send_email")["priority"], 0)
+
+    def test_time_limits(self):
+        task = celery_app.tasks["market_app.tasks.update_products_from_data"]
+        self.assertEqual(task.soft_time_limit, 30 * 60)
+        self.assertEqual(celery_app.tasks["market_app.tasks.send_email"].time_limit, 60)
+
+    def test_queue_depths(self):
+        app = Celery(broker="memory://", set_as_current=False)
+        app.conf.task_queues = settings.CELERY_TASK_QUEUES
+        app.send_task("market_app.tasks.send_email", queue="notifications")
+        app.send_task("market_app.tasks.send_email", queue="notifications")
+        depths = taskmetrics.queue_depths(app)
+        self.assertEqual(depths["notifications"], 2)
+        self.assertEqual(depths["imports"], 0)
+
+
+@skipUnless(fakeredis, 'требуется fakeredis')
+class TaskLatencyMetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        patcher = mock.patch("market_app.taskmetrics.get_redis_connection", return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_task(self, queue, wait):
+        task = SimpleNamespace(name="market_app.tasks.send_email", request=SimpleNamespace(
+            is_eager=False, delivery_info={"routing_key": queue}, published_at=time.time() - wait,
+        ))
+        taskmetrics.task_started(task_id="1", task=task)
+        taskmetrics.task_finished(task_id="1", task=task)
+
+    def test_wait_and_runtime_recorded(self):
+        self.run_task("notifications", 2)
+        self.run_task("notifications", 0)
+        values = taskmetrics.snapshot()[("notifications", "market_app.tasks.send_email")]
+        self.assertEqual(values["count"], 2)
+        self.assertEqual(values["wait_count"], 2)
+        self.assertGreaterEqual(values["wait_sum"], 2)
+
+        broker_app = SimpleNamespace(conf=SimpleNamespace(task_always_eager=False))
+        with mock.patch("market_app.taskmetrics.queue_depths", return_value={"notifications": 3}):
+            body = taskmetrics.render_prometheus(broker_app)
+        self.assertIn('market_celery_queue_depth{queue="notifications"} 3', body)
+        self.assertIn(
+            'market_celery_task_wait_seconds_bucket{queue="notifications",'
+            'task="market_app.tasks.send_email",le="5.0"} 2', body
+        )
+        self.assertIn('market_celery_tasks_total{queue="notifications",task="market_app.tasks.send_email"} 2.0', body)
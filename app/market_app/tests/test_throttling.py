@@ -0,0 +1,58 @@
+from unittest import mock, skipUnless
+
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from market_app.throttling import RedisScopedRateThrottle
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class CartView(APIView):
+    throttle_scope = 'cart'
+
+
+@skipUnless(fakeredis, 'требуется fakeredis[lua]')
+class RedisSlidingWindowThrottleTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        patcher = mock.patch(
+            'market_app.throttling.get_redis_connection', return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = APIRequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+        self.request.user = mock.Mock(is_authenticated=True, pk=1)
+        self.now = 1000.0
+
+    def make_throttle(self):
+        throttle = RedisScopedRateThrottle()
+        throttle.THROTTLE_RATES = {'cart': '3/minute'}
+        throttle.timer = lambda: self.now
+        return throttle
+
+    def test_limit_within_window(self):
+        results = [self.make_throttle().allow_request(self.request, CartView()) for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_previous_window_is_weighted(self):
+        for _ in range(3):
+            self.make_throttle().allow_request(self.request, CartView())
+        # Начало следующего окна: предыдущее еще учитывается почти полностью
+        self.now = 1020.0
+        self.assertFalse(self.make_throttle().allow_request(self.request, CartView()))
+        # Ближе к концу окна вес предыдущего падает, и запросы снова проходят
+        self.now = 1070.0
+        throttle = self.make_throttle()
+        self.assertTrue(throttle.allow_request(self.request, CartView()))
+
+    def test_wait(self):
+        for _ in range(3):
+            self.make_throttle().allow_request(self.request, CartView())
+        throttle = self.make_throttle()
+        self.assertFalse(throttle.allow_request(self.request, CartView()))
+        self.assertEqual(throttle.wait(), 20.0)
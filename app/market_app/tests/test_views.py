@@ -1,14 +1,19 @@
 from rest_framework.test import APIClient, APITestCase
 from rest_framework.authtoken.models import Token
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from model_bakery import baker
 
 from market_app.models import User, Product, Order, OrderItem, Contact
+from market_app.profiling import QueryBudgetMixin
 
 
-class UserTests(APITestCase):
+class UserTests(QueryBudgetMixin, APITestCase):
     def setUp(self):
         self.client = APIClient()
+        # токены кешируются по id пользователя, а id переиспользуются между тестами
+        cache.clear()
 
     def test_create_user(self):
         data = {
@@ -17,7 +22,8 @@ class UserTests(APITestCase):
             "password": "securepassword",
             "role": "client"
         }
-        response = self.client.post("/api/v1/register/", data)
+        with self.assertQueryBudget(4):
+            response = self.client.post("/api/v1/register/", data)
         self.assertEqual(response.status_code, 201)
         self.assertTrue(User.objects.filter(username="testuser").exists())
 
@@ -25,13 +31,42 @@ class UserTests(APITestCase):
         user = baker.make(User, username="testuser", is_active=True)
         user.set_password("securepassword")
         user.save()
-        data = {"username": user.username, "password": "securepassword"}
-        response = self.client.post("/api/v1/login/", data)
+        data = {"email": user.email, "password": "securepassword"}
+        with self.assertQueryBudget(5):
+            response = self.client.post("/api/v1/login/", data)
         self.assertEqual(response.status_code, 200)
         self.assertIn("token", response.data)
 
+    def test_user_login_reuses_token(self):
+        user = baker.make(User, is_active=True)
+        user.set_password("securepassword")
+        user.save()
+        data = {"email": user.email, "password": "securepassword"}
+        first = self.client.post("/api/v1/login/", data)
+        second = self.client.post("/api/v1/login/", data)
+        self.assertEqual(first.data["token"], second.data["token"])
+        self.assertEqual(Token.objects.filter(user=user).count(), 1)
+
+    def test_user_login_wrong_password(self):
+        user = baker.make(User, is_active=True)
+        user.set_password("securepassword")
+        user.save()
+        data = {"email": user.email, "password": "wrongpassword"}
+        response = self.client.post("/api/v1/login/", data)
+        self.assertEqual(response.status_code, 401)
+
+    # мест для проверки пароля в процессе нет, как если бы все были заняты
+    @override_settings(LOGIN_HASHING_WORKERS=0, LOGIN_HASHING_TIMEOUT=0.01)
+    def test_user_login_overloaded(self):
+        user = baker.make(User, is_active=True)
+        user.set_password("securepassword")
+        user.save()
+        data = {"email": user.email, "password": "securepassword"}
+        response = self.client.post("/api/v1/login/", data)
+        self.assertEqual(response.status_code, 503)
 
-class ProductTests(APITestCase):
+
+class ProductTests(QueryBudgetMixin, APITestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = baker.make(User, role="client", is_active=True)
@@ -41,22 +76,35 @@ class ProductTests(APITestCase):
     def test_add_to_cart(self):
         product = baker.make(Product, quantity=10)
         data = {"quantity": 2}
-        response = self.client.post(f"/api/v1/products/{product.id}/add_to_cart/", data)
+        with self.assertQueryBudget(17):
+            response = self.client.post(f"/api/v1/products/{product.id}/add_to_cart/", data)
         self.assertEqual(response.status_code, 201)
         self.assertTrue(Order.objects.filter(user=self.user, status="basket").exists())
         self.assertTrue(OrderItem.objects.filter(order__user=self.user, product=product).exists())
 
+    def test_product_list(self):
+        products = baker.make(Product, _quantity=3)
+        for product in products:
+            baker.make("market_app.ProductParameter", product=product, _quantity=2)
+
+        with self.assertQueryBudget(5):
+            response = self.client.get("/api/v1/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(len(response.data["results"][0]["parameters"]), 2)
+
     def test_remove_from_cart(self):
         product = baker.make(Product, quantity=10)
         cart = baker.make(Order, user=self.user, status="basket")
         baker.make(OrderItem, order=cart, product=product, quantity=5)
 
-        response = self.client.post(f"/api/v1/products/{product.id}/remove_from_cart/")
+        with self.assertQueryBudget(9):
+            response = self.client.post(f"/api/v1/products/{product.id}/remove_from_cart/")
         self.assertEqual(response.status_code, 200)
         self.assertFalse(OrderItem.objects.filter(order=cart, product=product).exists())
 
 
-class OrderTests(APITestCase):
+class OrderTests(QueryBudgetMixin, APITestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = baker.make(User, role="client", is_active=True)
@@ -67,7 +115,8 @@ class OrderTests(APITestCase):
         cart = baker.make(Order, user=self.user, status="basket")
         baker.make(OrderItem, order=cart, _quantity=3)
 
-        response = self.client.get("/api/v1/orders/show_cart/")
+        with self.assertQueryBudget(4):
+            response = self.client.get("/api/v1/orders/show_cart/")
         self.assertEqual(response.status_code, 200)
         self.assertIn("order_items", response.data)
 
@@ -78,9 +127,24 @@ class OrderTests(APITestCase):
         baker.make(OrderItem, order=cart, product=product, quantity=5)
 
         data = {"address_id": contact.id}
-        response = self.client.post("/api/v1/orders/confirm_order/", data)
+        with self.assertQueryBudget(13):
+            response = self.client.post("/api/v1/orders/confirm_order/", data)
         self.assertEqual(response.status_code, 200)
         cart.refresh_from_db()
         product.refresh_from_db()
         self.assertEqual(cart.status, "confirmed")
         self.assertEqual(product.quantity, 5)
+
+    def test_confirm_order_several_products(self):
+        contact = baker.make(Contact, user=self.user)
+        cart = baker.make(Order, user=self.user, status="basket")
+        products = baker.make(Product, quantity=10, _quantity=3)
+        for product in products:
+            baker.make(OrderItem, order=cart, product=product, quantity=4)
+
+        with self.assertQueryBudget(13):
+            response = self.client.post("/api/v1/orders/confirm_order/", {"address_id": contact.id})
+        self.assertEqual(response.status_code, 200)
+        for product in products:
+            product.refresh_from_db()
+            self.assertEqual(product.quantity, 6)
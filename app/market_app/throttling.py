@@ -0,0 +1,97 @@
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.throttling import (
+    SimpleRateThrottle, UserRateThrottle, AnonRateThrottle, ScopedRateThrottle
+)
+
+
+# Скользящее окно на двух счетчиках: текущее окно и предыдущее,
+# вес предыдущего убывает линейно по мере прохождения текущего.
+# Стоимость запроса постоянна и не зависит от лимита, а атомарность
+# скрипта исключает гонки между процессами gunicorn.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * (window - elapsed) / window + current >= limit then
+    return 0
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], window * 2)
+return 1
+"""
+
+
+# Ключ окружения WSGI, которым помечаются запросы, выполняемые внутри процесса
+# (прогрев кеша). Клиент не может его передать: HTTP-заголовки попадают
+# в окружение только с префиксом HTTP_.
+INTERNAL_REQUEST = 'market.internal_request'
+
+
+class RedisSlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Троттлинг на атомарных операциях Redis (Lua-скрипт со скользящим окном).
+
+    Если кеш настроен не на Redis (например, в тестах),
+    используется стандартный алгоритм DRF. Запросы, помеченные
+    INTERNAL_REQUEST, не ограничиваются.
+    """
+    cache_alias = 'default'
+    _scripts = {}
+
+    def get_script(self, client):
+        script = self._scripts.get(id(client))
+        if script is None:
+            script = self._scripts[id(client)] = client.register_script(SLIDING_WINDOW_SCRIPT)
+        return script
+
+    def allow_request(self, request, view):
+        self.elapsed = None
+        if self.rate is None or request.META.get(INTERNAL_REQUEST):
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        try:
+            client = get_redis_connection(self.cache_alias)
+        except NotImplementedError:
+            return super().allow_request(request, view)
+
+        now = self.timer()
+        window_start = int(now // self.duration) * self.duration
+        self.elapsed = now - window_start
+        keys = [f'{self.key}:{window_start}', f'{self.key}:{window_start - self.duration}']
+        try:
+            allowed = self.get_script(client)(
+                keys=keys, args=[self.num_requests, self.duration, self.elapsed], client=client
+            )
+        except RedisError:
+            # Недоступность Redis не должна блокировать API
+            return True
+        return bool(allowed)
+
+    def wait(self):
+        if self.elapsed is None:
+            return super().wait()
+        return self.duration - self.elapsed
+
+
+class RedisUserRateThrottle(UserRateThrottle, RedisSlidingWindowThrottle):
+    pass
+
+
+class RedisAnonRateThrottle(AnonRateThrottle, RedisSlidingWindowThrottle):
+    pass
+
+
+class RedisScopedRateThrottle(ScopedRateThrottle, RedisSlidingWindowThrottle):
+    """Лимиты по областям, заданным во вью через атрибут throttle_scope."""
+    pass
+
+
+class LoginRateThrottle(RedisAnonRateThrottle):
+    scope = 'login'
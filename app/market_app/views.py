@@ -1,27 +1,102 @@
-import yaml
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.db import DatabaseError, connections, transaction
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.core.mail import send_mail
 from rest_framework.views import APIView
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.viewsets import GenericViewSet, ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.mixins import ListModelMixin
 from rest_framework.generics import RetrieveUpdateAPIView
-from rest_framework.decorators import api_view, action
+from rest_framework.decorators import api_view, action, throttle_classes
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated 
-from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from rest_framework.exceptions import MethodNotAllowed
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, OpenApiParameter
+from drf_spectacular.renderers import (
+    OpenApiJsonRenderer, OpenApiJsonRenderer2, OpenApiYamlRenderer, OpenApiYamlRenderer2
+)
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.types import OpenApiTypes
 
+from market_api_service import routers
+from market_api_service.celery import app as celery_app
 from market_api_service.settings import EMAIL_HOST_USER
 from .permissions import IsShopOwner, IsOwner, IsOwnerOrAdminOrReadOnly
-from .models import (Product, Order, OrderItem, Contact, User)
+from .models import (
+    Product, Order, OrderItem, Contact, User, CategoryStats, ShopStats, ProductRecommendations
+)
 from .serializers import (
     CreateUserSerializer, PriceListUploadSerializer, ProductSerializer,
-    ContactSerializer, OrderSerializer
+    ContactSerializer, OrderSerializer, FastProductSerializer, FastOrderSerializer,
+    OrderTransitionSerializer, ShopOrderSerializer, PriceHistoryQuerySerializer,
+    PriceHistoryPointSerializer, CategoryStatsSerializer, ShopStatsSerializer
 )
-from .tasks import update_products_from_data, send_email
-from .filters import ProductFilter
+from .tasks import send_email
+from .auth import authenticate_for_token, LoginOverloaded
+from .throttling import LoginRateThrottle
+from .filters import ProductFilter, ShopOrderFilter
+from .pagination import ShopOrderCursorPagination
+from . import metrics, orders, pricehistory, pricelist, reservations, taskmetrics
+from .export import EXPORT_FORMATS
+
+logger = logging.getLogger(__name__)
+
+# Схема OpenAPI и ее представления по форматам, общие для процесса
+_openapi_schemas = {}
+
+class FastListMixin:
+    """
+    list() через быстрый сериализатор только для чтения (read_serializer_class).
+    Формат ответа тот же, что у serializer_class, который используется
+    для остальных действий и для схемы API.
+    """
+    read_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.read_serializer_class.prepare(self.filter_queryset(self.get_queryset()))
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.read_serializer_class(page, context=context)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.read_serializer_class(queryset, context=context)
+        return Response(serializer.data)
+
+class ReplicaReadMixin:
+    """
+    Действия из replica_actions читают с реплик БД. После успешного
+    изменяющего запроса пользователь на REPLICA_STICKY_SECONDS закрепляется
+    за основной БД, чтобы сразу видеть свои изменения.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        # маршрут чтений сбрасывается после запроса, даже если вью упала с ошибкой
+        token = routers.set_replica_reads(False)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            routers.reset_replica_reads(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions and not routers.is_sticky(request.user):
+            routers.set_replica_reads(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            routers.stick_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
 
 @extend_schema(
     request=CreateUserSerializer,
@@ -90,9 +165,11 @@ class UserRetrieveUpdate(RetrieveUpdateAPIView):
     responses={
         status.HTTP_200_OK: {'type': 'object', 'properties': {'token': {'type': 'string'}}},
         status.HTTP_401_UNAUTHORIZED: {'type': 'object', 'properties': {'error': {'type': 'string'}}},
+        status.HTTP_503_SERVICE_UNAVAILABLE: {'type': 'object', 'properties': {'error': {'type': 'string'}}},
     },
 )
 @api_view(['POST'])
+@throttle_classes([LoginRateThrottle])
 def user_login(request):
     """
     post:
@@ -101,14 +178,18 @@ def user_login(request):
     Responses:
         200: Успешная аутентификация, возвращает токен.
         401: Переданы некорректные данные.
+        503: Сервис перегружен, повторите попытку позже.
     """
     data = request.data
-    email = data.get('email')
-    password = data.get('password')
-    user = User.objects.filter(email=email).first()
-    if user is not None and user.check_password(password):
-        token, _ = Token.objects.get_or_create(user=user)
-        return Response({'token': token.key}, status=status.HTTP_200_OK)
+    try:
+        token = authenticate_for_token(data.get('email'), data.get('password'))
+    except LoginOverloaded:
+        return Response(
+            {'error': 'Сервис перегружен, повторите попытку позже'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    if token is not None:
+        return Response({'token': token}, status=status.HTTP_200_OK)
     return Response(
         {'error': 'Некорректный логин или пароль'},
         status=status.HTTP_401_UNAUTHORIZED
@@ -144,7 +225,7 @@ class ContactList(ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user)
 
-class ProductList(ModelViewSet):
+class ProductList(ReplicaReadMixin, FastListMixin, ModelViewSet):
     """
     Набор представлений для управления товарами.
 
@@ -164,40 +245,61 @@ class ProductList(ModelViewSet):
     remove_from_cart:
     Удалить товар из корзины пользователя.
 
+    price_history:
+    История цены товара, прореженная по интервалам (interval: hour, day,
+    week, month). По умолчанию за последние PRICE_HISTORY_DEFAULT_DAYS дней.
+
+    recommendations:
+    Товары, которые чаще всего покупают вместе с этим, по убыванию числа
+    общих заказов. Пересчитываются задачей build_recommendations.
+
     Ответы:
         200: Запрос выполнен успешно.
         400: Неверный запрос.
         404: Товар не найден.
     """
-    queryset = Product.objects.all()
+    queryset = Product.objects.filter(is_active=True).select_related('category', 'shop').prefetch_related(
+        'parameters__parameter'
+    ).order_by('id')
     serializer_class = ProductSerializer
+    read_serializer_class = FastProductSerializer
     permission_classes = [IsOwnerOrAdminOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProductFilter
+    # лимит по области задается для действий с корзиной в декораторах action
+    throttle_scope = None
+    replica_actions = ('list', 'retrieve', 'price_history', 'recommendations')
 
     # запрещаю метод POST, потому что загрузка товаров осуществляется через прайс-лист
     def create(self, request, *args, **kwargs):
         raise MethodNotAllowed('POST')
 
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], description='Добавить товар в корзину')
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], throttle_scope='cart', description='Добавить товар в корзину')
     def add_to_cart(self, request, pk=None):
-        product = get_object_or_404(Product, pk=pk)
+        product = get_object_or_404(Product, pk=pk, is_active=True)
         quantity = int(request.data.get('quantity', 1))
-        if quantity > product.quantity:
+        if not reservations.reservations_enabled() and quantity > product.quantity:
             return Response(
                 {'message': f'Недостаточно товара на складе, в наличии {product.quantity}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        cart, created = Order.objects.get_or_create(user=request.user, status='basket')
-        if created:
-            cart.save()
-        OrderItem.objects.update_or_create(order=cart, product=product, defaults={'quantity': quantity})
+        try:
+            with transaction.atomic():
+                cart = Order.objects.get_or_create(user=request.user, status='basket')[0]
+                item = OrderItem.objects.update_or_create(
+                    order=cart, product=product, defaults={'quantity': quantity}
+                )[0]
+                # товар резервируется под позицию корзины на CART_RESERVATION_TTL секунд
+                if reservations.reservations_enabled():
+                    reservations.hold(item, quantity)
+        except reservations.InsufficientStock as exc:
+            return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(
             {'message': 'Товар добавлен в корзину'},
             status=status.HTTP_201_CREATED
         )
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], description='Удалить товар из корзины')
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], throttle_scope='cart', description='Удалить товар из корзины')
     def remove_from_cart(self, request, pk=None):
         product = get_object_or_404(Product, pk=pk)
         try: 
@@ -214,13 +316,47 @@ class ProductList(ModelViewSet):
                 {'message': 'Товар не найден в корзине'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        item.delete()
+        with transaction.atomic():
+            reservations.release(item)
+            item.delete()
         return Response(
             {'message': 'Товар удален из корзины'},
             status=status.HTTP_200_OK
         )
 
-class OrderViewSet(ReadOnlyModelViewSet):
+    @extend_schema(parameters=[PriceHistoryQuerySerializer], responses=PriceHistoryPointSerializer(many=True))
+    @action(detail=True, methods=['get'], description='История цены товара')
+    def price_history(self, request, pk=None):
+        product = get_object_or_404(Product, pk=pk)
+        query = PriceHistoryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        date_from = params.get('date_from')
+        if date_from is None:
+            date_from = timezone.now() - timedelta(days=settings.PRICE_HISTORY_DEFAULT_DAYS)
+        points = pricehistory.series(product, params['interval'], date_from, params.get('date_to'))
+        return Response(PriceHistoryPointSerializer(points, many=True).data, status=status.HTTP_200_OK)
+
+    @extend_schema(responses=ProductSerializer(many=True))
+    @action(detail=True, methods=['get'], description='Товары, которые покупают вместе с этим')
+    def recommendations(self, request, pk=None):
+        neighbours = ProductRecommendations.objects.filter(
+            product_id=pk, product__is_active=True
+        ).values_list('neighbours', flat=True).first()
+        if neighbours is None:
+            # рекомендаций еще нет или товар не найден
+            get_object_or_404(Product, pk=pk, is_active=True)
+            neighbours = []
+        rank = {product_id: i for i, (product_id, _) in enumerate(neighbours)}
+        # соседи, снятые с продажи после пересчета, отбрасываются фильтром queryset
+        rows = sorted(
+            self.read_serializer_class.prepare(self.queryset.filter(id__in=rank)),
+            key=lambda row: rank[row['id']]
+        )
+        serializer = self.read_serializer_class(rows, context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class OrderViewSet(ReplicaReadMixin, FastListMixin, ReadOnlyModelViewSet):
     """
     Набор представлений для просмотра и управления заказами пользователя.
     Требуется авторизация.
@@ -243,17 +379,23 @@ class OrderViewSet(ReadOnlyModelViewSet):
         400: Неверный запрос.
         404: Ресурс не найден.
     """
-    queryset = Order.objects.all()
+    queryset = Order.objects.order_by('id')
     serializer_class = OrderSerializer
+    read_serializer_class = FastOrderSerializer
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list',)
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user).exclude(status='basket')
+        return self.queryset.filter(user=self.request.user).exclude(status='basket').prefetch_related(
+            'order_items__product'
+        )
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], description='Показать корзину')
     def show_cart(self, request):
         try:
-            cart = Order.objects.get(user=request.user, status='basket')
+            cart = Order.objects.prefetch_related('order_items__product').get(
+                user=request.user, status='basket'
+            )
         except Order.DoesNotExist:
             return Response(
                 {'message': 'Корзина пуста'},
@@ -299,21 +441,14 @@ class OrderViewSet(ReadOnlyModelViewSet):
                 {'message': 'Корзина пуста'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        products = Product.objects.filter(orderitem__order=cart)
-
-        for product in products:
-            order_quantity = product.orderitem_set.get(order=cart).quantity
-            fact_quantity = product.quantity
-            if order_quantity > fact_quantity:
-                return Response(
-                    {'message': f'Недостаточно товара на складе, в наличии {fact_quantity}'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            product.quantity -= order_quantity
-            product.save()
+        try:
+            with transaction.atomic():
+                reservations.commit(list(cart.order_items.all()))
+                cart.status = 'confirmed'
+                cart.save()
+        except (reservations.InsufficientStock, reservations.ProductUnavailable) as exc:
+            return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        cart.status = 'confirmed'
-        cart.save()
         send_email.delay(
             subject='Подтверждение заказа',
             message=f'Ваш заказ №{cart.id} был успешно подтвержден и находится в обработке.\n',
@@ -324,30 +459,261 @@ class OrderViewSet(ReadOnlyModelViewSet):
             status=status.HTTP_200_OK
         )
 
+class ShopOrderViewSet(ListModelMixin, GenericViewSet):
+    """
+    Заказы магазина. Доступно только для владельцев магазина.
+
+    list:
+    Лента заказов с товарами магазина, упорядоченная по времени изменения.
+    Пагинация курсором (next/previous), фильтры:
+        - since: заказы, измененные начиная с указанного времени (ISO 8601).
+        - status: статус заказа.
+
+    transition:
+    Перевести пачку заказов в новый статус. Переводятся только заказы,
+    все товары которых принадлежат магазину и для которых переход допустим:
+    confirmed → in_progress → shipping → completed, отмена возможна до передачи
+    в доставку. Остальные id возвращаются в списке rejected.
+
+    Ответы:
+        200: Запрос выполнен успешно.
+        400: Неверный запрос.
+    """
+    queryset = Order.objects.all()
+    serializer_class = ShopOrderSerializer
+    permission_classes = [IsAuthenticated, IsShopOwner]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ShopOrderFilter
+    pagination_class = ShopOrderCursorPagination
+
+    def get_queryset(self):
+        return orders.shop_feed(self.request.user.shop)
+
+    @extend_schema(
+        request=OrderTransitionSerializer,
+        responses={
+            status.HTTP_200_OK: {
+                'type': 'object',
+                'properties': {
+                    'updated': {'type': 'array', 'items': {'type': 'integer'}},
+                    'rejected': {'type': 'array', 'items': {'type': 'integer'}},
+                },
+            },
+        },
+    )
+    @action(detail=False, methods=['post'], serializer_class=OrderTransitionSerializer, description='Сменить статус заказов')
+    def transition(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated, rejected = orders.transition(
+            request.user.shop, serializer.validated_data['order_ids'], serializer.validated_data['status']
+        )
+        return Response({'updated': updated, 'rejected': rejected}, status=status.HTTP_200_OK)
+
+class CategoryStatsViewSet(ReadOnlyModelViewSet):
+    """
+    Статистика каталога по категориям: количество товаров, остаток и его
+    стоимость, средняя цена и РРЦ. Читается из предрассчитанной таблицы.
+
+    list:
+    Получить статистику всех категорий.
+
+    retrieve:
+    Получить статистику категории по ее ID.
+    """
+    queryset = CategoryStats.objects.select_related('category').order_by('category_id')
+    serializer_class = CategoryStatsSerializer
+
+class ShopStatsViewSet(ReadOnlyModelViewSet):
+    """
+    Статистика каталога по магазинам. Администратору доступны все магазины,
+    поставщику - только свой. Требуется авторизация.
+
+    list:
+    Получить статистику магазинов.
+
+    retrieve:
+    Получить статистику магазина по его ID.
+    """
+    queryset = ShopStats.objects.select_related('shop').order_by('shop_id')
+    serializer_class = ShopStatsSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return self.queryset
+        return self.queryset.filter(shop__user=self.request.user)
+
 class PriceListUploadView(APIView):
     """
     Загрузить прайс-лист для обновления товаров.
     Доступно только для владельцев магазина.
 
     post:
-    Обрабатывает переданный YML-файл и обновляет каталог товаров магазина.
+    Ставит переданный файл в очередь импорта каталога магазина. Форматы:
+    YAML (.yml, .yaml), JSON Lines (.jsonl) и CSV (.csv). Повторная
+    загрузка того же файла не запускает второй импорт, а возвращает существующий.
+    Товары магазина, которых нет в прайс-листе, снимаются с продажи, если не
+    передан partial=true; такой полный файл заменяет еще не начатые импорты
+    магазина, а частичный встает в очередь за ними.
 
     Ответы:
-        200: Файл для импорта отправлен.
-        400: Произошли ошибки валидации.
+        200: Файл для импорта отправлен (import_id, import_status).
+        400: Произошли ошибки валидации; для прайс-листа возвращаются все
+             найденные ошибки (errors) с путем к полю.
     """
     permission_classes = [IsAuthenticated, IsShopOwner]
+    throttle_scope = 'import'
+
     def post(self, request, *args, **kwargs):
         serializer = PriceListUploadSerializer(data=request.data)
         if serializer.is_valid():
             file = serializer.validated_data['file']
-            shop = request.user.shop
-            shop_id = shop.id
+            try:
+                job, created = pricelist.submit(
+                    request.user.shop, file, full=not serializer.validated_data['partial']
+                )
+            except pricelist.PriceListError as exc:
+                return Response({"errors": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                "status": "Файл для импорта отправлен" if created else "Такой файл уже импортирован или импортируется",
+                "import_id": job.id,
+                "import_status": job.status,
+            }, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            # Обработка и обновление продуктов из YML
-            file_data = file.read().decode("utf-8")
-            data = yaml.safe_load(file_data)
 
-            update_products_from_data.delay(data, shop_id)
-            return Response({"status": "Файл для импорта отправлен"}, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+class CatalogueExportView(APIView):
+    """
+    Выгрузить каталог магазина.
+    Доступно только для владельцев магазина.
+
+    get:
+    Возвращает товары магазина потоком в формате прайс-листа (file_format=yaml,
+    по умолчанию) или CSV (file_format=csv). Товары читаются из БД пачками,
+    поэтому расход памяти не зависит от размера каталога.
+
+    Ответы:
+        200: Файл каталога.
+        400: Неизвестный формат.
+    """
+    permission_classes = [IsAuthenticated, IsShopOwner]
+    throttle_scope = 'export'
+
+    @extend_schema(
+        parameters=[OpenApiParameter('file_format', str, enum=list(EXPORT_FORMATS), default='yaml')],
+        responses={(status.HTTP_200_OK, 'application/x-yaml'): str, (status.HTTP_200_OK, 'text/csv'): str},
+    )
+    def get(self, request, *args, **kwargs):
+        file_format = request.query_params.get('file_format', 'yaml')
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'message': f'Неизвестный формат, доступны: {", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        export, content_type, extension = EXPORT_FORMATS[file_format]
+        response = StreamingHttpResponse(export(request.user.shop), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="catalogue.{extension}"'
+        return response
+
+
+class OpenAPISchemaView(APIView):
+    """
+    Схема OpenAPI, формат выбирается по заголовку Accept (YAML по умолчанию, JSON).
+
+    Схема читается из OPENAPI_SCHEMA_FILE, собранного при сборке образа, и
+    отрисовывается один раз на процесс. Если файла нет, она генерируется
+    drf-spectacular при первом запросе.
+    """
+    renderer_classes = [OpenApiYamlRenderer, OpenApiYamlRenderer2, OpenApiJsonRenderer, OpenApiJsonRenderer2]
+    permission_classes = spectacular_settings.SERVE_PERMISSIONS
+    # схема одна для всех, запрос не должен тратить лимит пользователя
+    throttle_classes = []
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        key = (settings.OPENAPI_SCHEMA_FILE, renderer.media_type)
+        body = _openapi_schemas.get(key)
+        if body is None:
+            body = _openapi_schemas[key] = renderer.render(
+                self.get_schema(request), renderer.media_type, self.get_renderer_context()
+            )
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        return HttpResponse(body, content_type=content_type)
+
+    def get_schema(self, request):
+        path = settings.OPENAPI_SCHEMA_FILE
+        schema = _openapi_schemas.get(path)
+        if schema is None:
+            if os.path.exists(path):
+                with open(path, 'rb') as file:
+                    schema = json.load(file)
+            else:
+                logger.warning('Файл схемы OpenAPI %s не найден, схема генерируется', path)
+                schema = spectacular_settings.DEFAULT_GENERATOR_CLASS().get_schema(
+                    request=request, public=spectacular_settings.SERVE_PUBLIC
+                )
+            _openapi_schemas[path] = schema
+        return schema
+
+
+def _client_address(request):
+    address = request.META.get('REMOTE_ADDR')
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded and address in settings.METRICS_TRUSTED_PROXIES:
+        # адрес, с которого к прокси пришел запрос; остальное мог подставить клиент
+        return forwarded.rsplit(',', 1)[-1].strip()
+    return address
+
+
+def metrics_view(request):
+    """Метрики запросов всех процессов и очередей Celery в текстовом формате Prometheus, доступны только с локальных адресов."""
+    if _client_address(request) not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render_prometheus() + taskmetrics.render_prometheus(celery_app), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+metrics_view.skip_metrics = True
+
+
+def health_view(request):
+    """
+    Проверка готовности для балансировщика: основная БД, реплики и кеш.
+    Балансировщику достаточно статуса ответа; результаты проверок, время
+    проверочного запроса и состояние пула соединений БД возвращаются только
+    адресам из METRICS_ALLOWED_IPS, как и метрики.
+    """
+    checks = {}
+    healthy = True
+    for alias in ('default', *settings.REPLICA_DATABASES):
+        connection = connections[alias]
+        started = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError:
+            logger.exception('Проверка БД %s не пройдена', alias)
+            checks[alias] = {'status': 'error'}
+            healthy = False
+            continue
+        checks[alias] = {'status': 'ok', 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            checks[alias]['pool'] = pool.get_stats()
+    try:
+        cache.set('health_check', 1, 5)
+        checks['cache'] = {'status': 'ok' if cache.get('health_check') == 1 else 'error'}
+    except Exception:
+        logger.exception('Проверка кеша не пройдена')
+        checks['cache'] = {'status': 'error'}
+    healthy = healthy and checks['cache']['status'] == 'ok'
+    body = {'status': 'ok' if healthy else 'error'}
+    if _client_address(request) in settings.METRICS_ALLOWED_IPS:
+        body['checks'] = checks
+    return JsonResponse(body, status=200 if healthy else 503)
+
+health_view.skip_metrics = True
@@ -0,0 +1,58 @@
+import logging
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.test import Client
+
+from .models import CategoryStats
+from .throttling import INTERNAL_REQUEST
+
+
+logger = logging.getLogger(__name__)
+
+
+def hot_paths(pages=None, categories=None):
+    """
+    Самые запрашиваемые страницы: первые страницы списка товаров, статистика
+    категорий и первые страницы самых крупных категорий.
+    """
+    pages = settings.WARM_CACHE_PAGES if pages is None else pages
+    categories = settings.WARM_CACHE_CATEGORIES if categories is None else categories
+    paths = ['/api/v1/products/'] + [f'/api/v1/products/?page={page}' for page in range(2, pages + 1)]
+    paths.append('/api/v1/stats/categories/')
+    names = CategoryStats.objects.filter(products_count__gt=0).order_by('-products_count').values_list(
+        'category__name', flat=True
+    )[:categories]
+    paths += [f'/api/v1/products/?{urlencode({"category": name})}' for name in names]
+    return paths
+
+
+def request_host():
+    """Хост для запросов внутри процесса: они должны пройти проверку ALLOWED_HOSTS."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def warm(paths):
+    """
+    Выполняет GET-запросы внутри процесса через весь стек Django. Возвращает
+    [(путь, статус, мс), ...]. Первый запрос загружает модули представлений,
+    маршруты и открывает соединения с БД и Redis, остальные заполняют кеш
+    запросов cachalot в Redis. cachalot кеширует только основную БД: если
+    настроены реплики, чтения каталога идут на них и в кеш не попадают.
+    """
+    # Прогрев не должен расходовать лимиты частоты запросов с локального адреса
+    client = Client(HTTP_HOST=request_host(), **{INTERNAL_REQUEST: True})
+    results = []
+    for path in paths:
+        started = time.perf_counter()
+        try:
+            status = client.get(path).status_code
+        except Exception:
+            logger.exception('Прогрев %s не выполнен', path)
+            status = None
+        results.append((path, status, (time.perf_counter() - started) * 1000))
+    return results